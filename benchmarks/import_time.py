@@ -0,0 +1,68 @@
+"""Benchmark the time it takes to import run_output.
+
+Each repeat imports run_output in a fresh interpreter with -X importtime and
+reports the median cumulative import time of run_output along with the
+slowest packages it imports.
+
+Command line arguments:
+repeat: Number of fresh interpreters to time. Default is 5.
+top: Number of slowest packages to report. Default is 10.
+"""
+
+# Standard imports
+import argparse
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).parent.parent
+
+def create_args():
+    """Create and return argparser with arguments."""
+
+    arg_parser = argparse.ArgumentParser(description="Time the import of run_output.")
+    arg_parser.add_argument("-r",
+                            "--repeat",
+                            type=int,
+                            default=5,
+                            help="Number of fresh interpreters to time")
+    arg_parser.add_argument("-t",
+                            "--top",
+                            type=int,
+                            default=10,
+                            help="Number of slowest packages to report")
+    return arg_parser
+
+def time_import():
+    """Import run_output in a fresh interpreter and return import times.
+
+    Returns a dictionary of package name to cumulative import time in
+    microseconds for run_output and the packages it imports directly.
+    """
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import run_output"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth > 1: continue    # Nested import
+        times[name.strip()] = int(cumulative)
+    return times
+
+def main():
+    args = create_args().parse_args()
+
+    runs = [ time_import() for _ in range(args.repeat) ]
+    total = statistics.median(run["run_output"] for run in runs)
+    print(f"run_output: {total / 1e3:.1f} ms (median of {args.repeat})")
+
+    names = { name for run in runs for name in run if name != "run_output" }
+    medians = { name: statistics.median(run.get(name, 0) for run in runs) for name in names }
+    for name in sorted(medians, key=medians.get, reverse=True)[:args.top]:
+        print(f"  {name}: {medians[name] / 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark reading module input variables with and without auto-masking.
+
+Writes a directory of per-reach files shaped like FLPE algorithm output (a
+time series and a few scalars with fill values) and times reading every
+variable of every file with masked arrays filled afterwards against
+AbstractModule.read_var, which reads without masking.
+
+Command line arguments:
+files: Number of per-reach files to read. Default is 2000.
+nt: Number of time steps per file. Default is 100.
+repeat: Number of times to read the files. Default is 5.
+"""
+
+# Standard imports
+import argparse
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Local imports
+from output.modules.AbstractModule import AbstractModule
+
+FILL = AbstractModule.FILL["f8"]
+VARIABLES = ("A0", "n", "Q_u")
+
+def create_args():
+    """Create and return argparser with arguments."""
+
+    arg_parser = argparse.ArgumentParser(description="Time the read of module input files.")
+    arg_parser.add_argument("-f",
+                            "--files",
+                            type=int,
+                            default=2000,
+                            help="Number of per-reach files to read")
+    arg_parser.add_argument("-n",
+                            "--nt",
+                            type=int,
+                            default=100,
+                            help="Number of time steps per file")
+    arg_parser.add_argument("-r",
+                            "--repeat",
+                            type=int,
+                            default=5,
+                            help="Number of times to read the files")
+    return arg_parser
+
+def write_files(input_dir, num_files, nt):
+    """Write per-reach files with about 10% of values missing and return paths."""
+
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(num_files):
+        path = input_dir / f"{i}_flpe.nc"
+        with Dataset(path, 'w') as ds:
+            ds.createDimension("nt", nt)
+            q = ds.createVariable("Q", "f8", ("nt",), fill_value=FILL)
+            q[:] = np.ma.masked_array(rng.random(nt), mask=rng.random(nt) < 0.1)
+            for name in VARIABLES:
+                var = ds.createVariable(name, "f8", fill_value=FILL)
+                var.assignValue(rng.random() if rng.random() > 0.1 else FILL)
+        paths.append(path)
+    return paths
+
+def read_masked(ds):
+    """Read file variables as masked arrays and fill them."""
+
+    data = [ ds["Q"][:].filled(FILL) ]
+    data.extend(ds[name][:].filled(np.nan) for name in VARIABLES)
+    return data
+
+def read_unmasked(ds):
+    """Read file variables without masking."""
+
+    data = [ AbstractModule.read_var(ds["Q"], FILL) ]
+    data.extend(AbstractModule.read_var(ds[name], np.nan) for name in VARIABLES)
+    return data
+
+def time_read(paths, read):
+    """Return seconds taken to open and read every file."""
+
+    start = time.perf_counter()
+    for path in paths:
+        with Dataset(path, 'r') as ds:
+            read(ds)
+    return time.perf_counter() - start
+
+def main():
+    args = create_args().parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = write_files(Path(temp_dir), args.files, args.nt)
+        for path in paths:
+            with Dataset(path, 'r') as ds:
+                for masked, unmasked in zip(read_masked(ds), read_unmasked(ds)):
+                    np.testing.assert_array_equal(masked, unmasked)
+
+        for label, read in (("masked", read_masked), ("read_var", read_unmasked)):
+            seconds = statistics.median(time_read(paths, read) for _ in range(args.repeat))
+            print(f"{label}: {seconds * 1e3:.1f} ms for {args.files} files (median of {args.repeat})")
+
+if __name__ == "__main__":
+    main()
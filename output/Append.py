@@ -10,39 +10,38 @@ Functions
 ---------
 get_cont_data(cont_json)
     extract and return the continent data needs to be extracted for
-get_continent_sos_data(sos_cur)
-    return a dictionary of continents with associated identifier data
 write_reaches(prior_sos, result_sos)
     write reach_id variable and associated dimension to the SoS
 write_nodes(prior_sos, result_sos)
     write node_id and reach_id variables with associated dimension to the SoS
+read_time_coverage(sos)
+    return time coverage start and end of a results file
+shard_rows(num_reaches, shard, num_shards)
+    return the priors reach rows of a shard
+write_time_coverage(sos, min_time, max_time)
+    write time coverage attributes to a results file
 """
 
 # Standard imports
+from concurrent.futures import ProcessPoolExecutor
 import datetime
 from dateutil import relativedelta
 import json
+import multiprocessing
+import os
+import shutil
 import uuid
 
 # Third-party imports
 from netCDF4 import Dataset
 import numpy as np
-import xarray as xr
 
 # Local imports
-from output.modules.Hivdi import Hivdi
-from output.modules.Metroman import Metroman
-from output.modules.Moi import Moi
-from output.modules.Momma import Momma
-from output.modules.Neobam import Neobam
-from output.modules.Offline import Offline
-from output.modules.Postdiagnostics import Postdiagnostics
-from output.modules.Prediagnostics import Prediagnostics
-from output.modules.Priors import Priors
-from output.modules.Sad import Sad
-from output.modules.Sic4dvar import Sic4dvar
-from output.modules.Swot import Swot
-from output.modules.Validation import Validation
+from output.MetadataPlan import MetadataPlan
+from output.ModuleContext import ModuleContext
+from output.Patch import Patch
+from output.PriorSoS import PriorSoS
+from output.Registry import create_module, UnknownModuleError
 
 class Append:
     """
@@ -60,10 +59,22 @@ class Append:
         list of AbstractModule objects to execute result storage ops for
     MODULES_LIST: list
         list of string module names to create objects for
+    PATCH_SUFFIX: str
+        string suffix for the partial results file of a patch run
+    partial_label: str
+        label of the partial results file and its cache files (None if not partial)
     PRIORS_SUFFIX: str
         string suffix for priors file name
+    prior_sos: PriorSoS
+        shared handle on the continent's priors SoS
+    results_file: Path
+        path to results file patched by a patch run (None if not patching)
     RESULTS_SUFFIX: str
         string suffix for output file name
+    shard: tuple
+        shard number and number of shards of a shard run (None if not sharding)
+    SHARD_TIME_ATTRS: tuple
+        global attributes that hold the SWOT time range of a shard results file
     sos_nrids: nd.array
         array of SOS reach identifiers on the node-level
     sos_nids: nd.array
@@ -72,6 +83,8 @@ class Append:
         array of SoS reach identifiers associated with continent
     sos_cur: Path
         path to the current SoS
+    swot: Swot
+        SWOT module object that tracks the time coverage of the results
     sos_new: Path
         path to new SoS directory
     VERS_LENGTH: int
@@ -84,20 +97,38 @@ class Append:
         variable length int data type for NEtCDF ragged arrays
     vlen_s: VLType
         variable length string data type for NEtCDF ragged arrays
+    workers: int
+        number of processes that append modules to their own module files (0 appends in this process)
         
     Methods
     -------
     append_data():
         append data to the SoS
-    create_modules(flpe_dir, moi_dir, postd_dir, off_dir, val_dir)
+    create_modules(run_type, input_dir, diag_dir, flpe_dir, moi_dir, off_dir, val_dir, options)
         create and stores a list of AbstractModule objects
     create_new_version()
         create new version of the SoS
+    merge_shards(num_shards)
+        merge the partial results files of shards into the results file
+    module_file(module)
+        return path to the module file a module is appended to by a worker
+    patch_results()
+        write results of the selected reaches to the rows of the results file
+    select_reaches(reach_ids)
+        restrict the run to reaches that patch an existing results file
+    select_shard(shard, num_shards)
+        restrict the run to the reaches of a shard
+    shard_file(shard, num_shards)
+        return path to the partial results file of a shard
+    update_time_coverage(time_range=None)
+        update time coverage for results
     """
 
 
     PRIORS_SUFFIX = "sword_v16_SOS_priors"
     RESULTS_SUFFIX = "sword_v16_SOS_results"
+    PATCH_SUFFIX = "patch"
+    SHARD_TIME_ATTRS = ("swot_time_min", "swot_time_max")
     # PRIORS_SUFFIX = "sword_v11_SOS_priors"
     # RESULTS_SUFFIX = "sword_v11_SOS_results"
     VERS_LENGTH = 4
@@ -127,15 +158,20 @@ class Append:
         self.cont = get_cont_data(cont_json, index)
         self.sos_cur = input_dir / "sos"
         self.sos_file = output_dir / "sos" / f"{list(self.cont.keys())[0]}_{self.RESULTS_SUFFIX}.nc"
-        sos_data = get_continent_sos_data(self.sos_cur, list(self.cont.keys())[0], self.PRIORS_SUFFIX)
-        self.sos_rids = sos_data["reaches"]
-        self.sos_nrids = sos_data["node_reaches"]
-        self.sos_nids = sos_data["nodes"]
+        self.results_file = None
+        self.partial_label = None
+        self.shard = None
         self.logger = logger
+        self.prior_sos = PriorSoS(self.sos_cur, list(self.cont.keys())[0], self.PRIORS_SUFFIX, logger)
+        self.sos_rids = self.prior_sos.reach_ids
+        self.sos_nrids = self.prior_sos.node_reach_ids
+        self.sos_nids = self.prior_sos.node_ids
         with open(metadata_json) as jf:
-            self.metadata_json = json.load(jf)
+            self.metadata_json = MetadataPlan(json.load(jf))
         self.modules_list = modules
         self.modules = []
+        self.swot = None
+        self.workers = 0
         # with open(input_dir.joinpath("passes.json")) as jf:
         #     self.pass_no = np.array(list(json.load(jf).keys()),dtype=np.int64)
         self.version = "9999"
@@ -149,20 +185,18 @@ class Append:
         
         # Create directory and file
         self.sos_file.parent.mkdir(parents=True, exist_ok=True)
-        continent = self.sos_file.name.split('_')[0]        
-        prior_sos = Dataset(self.sos_cur / f"{continent}_{self.PRIORS_SUFFIX}.nc")
+        prior_sos = self.prior_sos
+        prior_atts = prior_sos.global_atts
         result_sos = Dataset(self.sos_file, 'w')
         
         # Global attributes
-        global_atts = self.metadata_json["global_attributes"]            
-        for name, value in global_atts.items():
-            setattr(result_sos, name, value)
+        result_sos.setncatts(self.metadata_json.attrs("global_attributes"))
             
         global_atts_extra = self.metadata_json["global_attributes_extra"]
         
         # Name, Version and UUID    
-        result_sos.continent = prior_sos.continent
-        result_sos.run_type = prior_sos.run_type
+        result_sos.continent = prior_atts["continent"]
+        result_sos.run_type = prior_atts["run_type"]
         result_sos.product_version = prior_sos.product_version
         result_sos.date_created = self.run_date.strftime('%Y-%m-%dT%H:%M:%S')
         result_sos.uuid = str(uuid.uuid4())
@@ -170,20 +204,20 @@ class Append:
         # History, source, comment, references
         result_sos.history = f"{self.run_date.strftime('%Y-%m-%dT%H:%M:%S')}: SoS version {prior_sos.product_version} created by Confluence version {global_atts_extra['confluence_version']}"
         result_sos.source = f"Module results: {', '.join(self.modules_list)}"
-        result_sos.comment = f"{prior_sos.run_type.capitalize()} SoS version includes results from modules: {', '.join(self.modules_list)} and cycle pass observations plus time data from SWOT shapefiles"
+        result_sos.comment = f"{prior_atts['run_type'].capitalize()} SoS version includes results from modules: {', '.join(self.modules_list)} and cycle pass observations plus time data from SWOT shapefiles"
         
         # Geospatial coverage
         try:
-            result_sos.geospatial_lat_min = prior_sos.geospatial_lat_min
-            result_sos.geospatial_lat_max = prior_sos.geospatial_lat_max
-            result_sos.geospatial_lon_min = prior_sos.geospatial_lon_min
-            result_sos.geospatial_lon_max = prior_sos.geospatial_lon_max
-        except:
+            result_sos.geospatial_lat_min = prior_atts["geospatial_lat_min"]
+            result_sos.geospatial_lat_max = prior_atts["geospatial_lat_max"]
+            result_sos.geospatial_lon_min = prior_atts["geospatial_lon_min"]
+            result_sos.geospatial_lon_max = prior_atts["geospatial_lon_max"]
+        except KeyError:
             print('Geospatial data not present in sos...')
 
         # # Global dimensions
-        result_sos.createDimension("num_reaches", prior_sos["reaches"]["reach_id"][:].shape[0])             
-        result_sos.createDimension("num_nodes", prior_sos["nodes"]["node_id"][:].shape[0])
+        result_sos.createDimension("num_reaches", prior_sos.reach_ids.shape[0])
+        result_sos.createDimension("num_nodes", prior_sos.node_ids.shape[0])
         # result_sos.createDimension("num_observations", self.pass_no.shape[0])
         
         # # Global variable(s)
@@ -198,27 +232,225 @@ class Append:
 
         # Node and reach group
         write_reaches(prior_sos, result_sos, self.metadata_json)
-        
-        # netCDF4 library is not reading in node_ids - use xarray
-        ds = xr.open_dataset(self.sos_cur / f"{continent}_{self.PRIORS_SUFFIX}.nc",
-                             group="nodes", drop_variables="river_name")
-        node_ids = ds["node_id"].data
-        ds.close()
-        write_nodes(prior_sos, result_sos, self.metadata_json, node_ids)
-
-        prior_sos.close()
+        write_nodes(prior_sos, result_sos, self.metadata_json)
+
         result_sos.close()
         self.logger.info(f"Created new SoS results file: {self.sos_file.name}.")
 
+    def select_reaches(self, reach_ids):
+        """Restrict the run to reaches that patch an existing results file.
+
+        Modules only extract the files of the selected reaches and write
+        them to a partial results file that patch_results writes to the
+        rows of the results file.
+
+        Parameters
+        ----------
+        reach_ids: nd.array
+            reach identifiers to reprocess
+
+        Raises
+        ------
+        FileNotFoundError
+            if there is no results file to patch
+        ValueError
+            if none of the reaches are in the SoS
+        """
+
+        if not self.sos_file.exists():
+            raise FileNotFoundError(f"No results file to patch: {self.sos_file}.")
+        reach_ids = np.asarray(reach_ids, dtype=np.int64)
+        rows = self.prior_sos.index.reach_rows(reach_ids)
+        for reach_id in reach_ids[rows < 0]:
+            self.logger.warning(f"Reach {reach_id} is not in the SoS; skipping.")
+        if not (rows >= 0).any():
+            raise ValueError("None of the requested reaches are in the SoS.")
+
+        self.results_file = self.sos_file
+        self.__select(rows[rows >= 0], self.PATCH_SUFFIX)
+        self.logger.info(f"Patching {self.sos_rids.shape[0]} reaches of {self.results_file.name}.")
+
+    def select_shard(self, shard, num_shards):
+        """Restrict the run to the reaches of a shard.
+
+        Shards are consecutive slices of the priors reach order so that
+        merge_shards writes every shard as one block of rows. Nodes whose
+        reach is not in the priors SoS belong to the last shard. The results
+        are written to the shard's partial results file.
+
+        Parameters
+        ----------
+        shard: int
+            shard number (0 to num_shards - 1)
+        num_shards: int
+            number of shards the continent is split into
+        """
+
+        if not 0 <= shard < num_shards:
+            raise ValueError(f"Shard {shard} is not between 0 and {num_shards - 1}.")
+        self.shard = (shard, num_shards)
+        self.__select(shard_rows(self.sos_rids.shape[0], shard, num_shards), f"shard{shard}of{num_shards}",
+                      orphan_nodes=shard == num_shards - 1)
+        self.logger.info(f"Shard {shard} of {num_shards} has {self.sos_rids.shape[0]} reaches.")
+
+    def __select(self, rows, label, orphan_nodes=False):
+        """Restrict the run to priors reach rows and write a partial results file.
+
+        Parameters
+        ----------
+        rows: nd.array
+            priors reach rows to process
+        label: str
+            suffix of the partial results file name
+        orphan_nodes: bool
+            also process the nodes whose reach is not in the priors SoS
+        """
+
+        self.prior_sos = self.prior_sos.select(rows, orphan_nodes)
+        self.sos_rids = self.prior_sos.reach_ids
+        self.sos_nrids = self.prior_sos.node_reach_ids
+        self.sos_nids = self.prior_sos.node_ids
+        self.partial_label = label
+        self.sos_file = self.sos_file.with_name(f"{self.sos_file.stem}_{label}.nc")
+
+    def shard_file(self, shard, num_shards):
+        """Return path to the partial results file of a shard.
+
+        Parameters
+        ----------
+        shard: int
+            shard number
+        num_shards: int
+            number of shards the continent is split into
+        """
+
+        return self.sos_file.with_name(f"{self.sos_file.stem}_shard{shard}of{num_shards}.nc")
+
+    def merge_shards(self, num_shards):
+        """Merge the partial results files of shards into the results file.
+
+        Called after create_new_version. The rows of each shard are copied
+        to their block of rows and variables are created from the first
+        shard's definitions so the results file is the one a single job
+        writes. Shard files are removed once merged.
+
+        Parameters
+        ----------
+        num_shards: int
+            number of shards the continent was split into
+
+        Raises
+        ------
+        FileNotFoundError
+            if the partial results file of a shard is missing
+        """
+
+        shard_files = [ self.shard_file(shard, num_shards) for shard in range(num_shards) ]
+        missing = [ shard_file.name for shard_file in shard_files if not shard_file.exists() ]
+        if missing: raise FileNotFoundError(f"Missing shard results files: {', '.join(missing)}.")
+
+        times = []
+        with Dataset(self.sos_file, 'a') as results:
+            for shard, shard_file in enumerate(shard_files):
+                selection = self.prior_sos.select(shard_rows(self.sos_rids.shape[0], shard, num_shards),
+                                                  orphan_nodes=shard == num_shards - 1)
+                patch = Patch(selection.reach_rows, selection.node_rows)
+                with Dataset(shard_file, 'r') as partial:
+                    patch.check(partial, results)
+                    patch.copy_group(partial, results)
+                    if self.SHARD_TIME_ATTRS[0] in partial.ncattrs():
+                        times.extend(partial.getncattr(name) for name in self.SHARD_TIME_ATTRS)
+                self.logger.info(f"Merged {shard_file.name} into {self.sos_file.name}.")
+        self.update_time_coverage((min(times), max(times)) if times else (None, None))
+        for shard_file in shard_files: shard_file.unlink()
+
+    def patch_results(self):
+        """Write results of the selected reaches to the rows of the results file.
+
+        The history attribute records the reaches and modules and the time
+        coverage is extended to the time coverage of the selected reaches.
+        The partial results file is removed.
+        """
+
+        modules = ', '.join(module.__class__.__name__.lower() for module in self.modules)
+        reaches = ', '.join(str(reach_id) for reach_id in self.sos_rids[:10])
+        if self.sos_rids.shape[0] > 10: reaches += f" and {self.sos_rids.shape[0] - 10} more"
+        history = f"{datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S')}: Reaches {reaches} patched with results from modules: {modules}"
+        Patch(self.prior_sos.reach_rows, self.prior_sos.node_rows).apply(self.sos_file, self.results_file, history)
+
+        with Dataset(self.sos_file, 'r') as partial, Dataset(self.results_file, 'a') as results:
+            times = [ time for sos in (partial, results) for time in read_time_coverage(sos) ]
+            if times: write_time_coverage(results, min(times), max(times))
+
+        self.sos_file.unlink()
+        self.sos_file = self.results_file
+        self.partial_label = None
+        self.logger.info(f"Patched {self.sos_rids.shape[0]} reaches of {self.sos_file.name}.")
+
     def append_data(self):
-        """Append data to the SoS by executing module storage operations."""
+        """Append data to the SoS by executing module storage operations.
         
-        for module in self.modules:
-            module.append_module(self.metadata_json)
-            self.logger.info(f"Appended {module.__class__.__name__} data to {self.sos_file.name}.")
+        With more than one worker each module is appended by a worker
+        process to its own copy of the new SoS and the module groups are
+        merged into the SoS once every module is done.
+        """
+        
+        if self.workers > 1 and len(self.modules) > 1:
+            self.__append_parallel()
+        else:
+            for module in self.modules:
+                module.append_module(self.metadata_json)
+                self.logger.info(f"Appended {module.__class__.__name__} data to {self.sos_file.name}.")
+        self.prior_sos.close()
+
+    def module_file(self, module):
+        """Return path to the module file a module is appended to by a worker.
+
+        Parameters
+        ----------
+        module: AbstractModule
+            module to append
+        """
+
+        return self.sos_file.with_name(f"{self.sos_file.stem}_{module.__class__.__name__.lower()}.nc")
+
+    def __append_parallel(self):
+        """Append modules in worker processes and merge their module files.
+
+        Module files are copies of the new SoS so they share its dimensions
+        and variable length types. Workers are forked so modules are not
+        pickled; the attributes in each module's CACHE_STATE are returned to
+        this process (e.g. the SWOT time range). Variables are merged in
+        module order so the SoS matches one appended in a single process.
+        """
+
+        module_files = [ self.module_file(module) for module in self.modules ]
+        # Workers open their own handle on the priors SoS
+        self.prior_sos.close()
+        try:
+            for module, module_file in zip(self.modules, module_files):
+                shutil.copyfile(self.sos_file, module_file)
+                module.sos_new = module_file
+            num_workers = min(self.workers, len(self.modules))
+            with ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context("fork"),
+                                     initializer=_init_worker, initargs=(self.modules, self.metadata_json)) as pool:
+                states = list(pool.map(_append_module, range(len(self.modules))))
+            for module, state in zip(self.modules, states):
+                for attr, value in state.items(): setattr(module, attr, value)
+
+            with Dataset(self.sos_file, 'a') as sos:
+                patch = Patch(np.arange(sos.dimensions["num_reaches"].size), np.arange(sos.dimensions["num_nodes"].size))
+                for module, module_file in zip(self.modules, module_files):
+                    with Dataset(module_file, 'r') as module_sos:
+                        patch.copy_group(module_sos, sos)
+                    self.logger.info(f"Appended {module.__class__.__name__} data to {self.sos_file.name}.")
+        finally:
+            for module, module_file in zip(self.modules, module_files):
+                module.sos_new = self.sos_file
+                module_file.unlink(missing_ok=True)
         
     def create_modules(self, run_type, input_dir, diag_dir, flpe_dir, moi_dir, \
-                       off_dir, val_dir):
+                       off_dir, val_dir, options=None):
         
         """Create and stores a list of AbstractModule objects.
         
@@ -238,93 +470,115 @@ class Append:
             path to Offline directory
         val_dir: Path
             path to Validation directory
+        options: dict
+            command line output options passed to each module
         """
         
+        # Restrict metadata to selected variables so modules only read and write them
+        variables = options.get("variables") if options else None
+        if variables:
+            self.metadata_json = self.metadata_json.select(variables)
+            for path in variables:
+                if not self.metadata_json.includes(*path.strip('/').split('/')):
+                    self.logger.warning(f"Unknown variable '{path}' requested; skipping.")
+
+        # Append modules in worker processes, at most one per available core
+        self.workers = options.get("workers", 0) if options else 0
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        if self.workers > cores:
+            self.logger.info(f"Using {cores} of {self.workers} requested workers as only {cores} cores are available.")
+            self.workers = cores
+
+        # Reuse extracted module data from previous runs
+        cache = None
+        if options and options.get("cachedir"):
+            from output.ExtractCache import ExtractCache
+            label = list(self.cont.keys())[0]
+            if self.partial_label: label = f"{label}_{self.partial_label}"
+            cache = ExtractCache(options["cachedir"], label, self.logger)
+
+        context = ModuleContext(list(self.cont.values())[0], self.sos_file, \
+            self.logger, self.prior_sos, run_type, {
+                "input": input_dir,
+                "flpe": flpe_dir,
+                "moi": moi_dir,
+                "offline": off_dir,
+                "postdiagnostics": diag_dir / "postdiagnostics",
+                "prediagnostics": diag_dir / "prediagnostics",
+                "validation": val_dir
+            }, self.vlen_f, self.vlen_i, self.vlen_s, options, self.metadata_json,
+            cache)
+
         # Must create output results for SWOT NetCDF data
-        self.modules.append(Swot(list(self.cont.values())[0], \
-            input_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-            self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
+        self.swot = create_module("swot", context)
+        self.modules.append(self.swot)
         
         # All other modules are optional
         for module in self.modules_list:
-            if module == "hivdi":
-                self.modules.append(Hivdi(list(self.cont.values())[0], \
-                    flpe_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "metroman":
-                self.modules.append(Metroman(list(self.cont.values())[0], \
-                    flpe_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "moi":
-                self.modules.append(Moi(list(self.cont.values())[0], \
-                    moi_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "momma":
-                self.modules.append(Momma(list(self.cont.values())[0], \
-                    flpe_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "neobam":
-                self.modules.append(Neobam(list(self.cont.values())[0], \
-                    flpe_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "offline":
-                self.modules.append(Offline(list(self.cont.values())[0], \
-                    off_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "postdiagnostics":
-                self.modules.append(Postdiagnostics(list(self.cont.values())[0], \
-                    diag_dir / "postdiagnostics", self.sos_file, self.logger, self.sos_rids, \
-                    self.sos_nrids, self.sos_nids))
-            if module == "prediagnostics":
-                self.modules.append(Prediagnostics(list(self.cont.values())[0], \
-                    diag_dir / "prediagnostics", self.sos_file, self.logger, self.vlen_f, \
-                    self.vlen_i, self.vlen_s, self.sos_rids, self.sos_nrids, \
-                    self.sos_nids)) 
-            if module == "priors" and run_type == "constrained":
-                self.modules.append(Priors(list(self.cont.values())[0], \
-                    self.sos_cur, self.sos_file, self.logger, self.PRIORS_SUFFIX))
-            if module == "sad":
-                self.modules.append(Sad(list(self.cont.values())[0], \
-                    flpe_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "sic4dvar":
-                self.modules.append(Sic4dvar(list(self.cont.values())[0], \
-                    flpe_dir, self.sos_file, self.logger, self.vlen_f, self.vlen_i, \
-                    self.vlen_s, self.sos_rids, self.sos_nrids, self.sos_nids))
-            if module == "validation":
-                self.modules.append(Validation(list(self.cont.values())[0], \
-                    val_dir, self.sos_file, self.logger, self.sos_rids, self.sos_nrids, \
-                    self.sos_nids))
+            if module == "swot": continue
+            if module == "priors" and run_type != "constrained": continue
+            if variables and not self.metadata_json.includes(module):
+                self.logger.info(f"No {module} variables requested; skipping.")
+                continue
+            try:
+                self.modules.append(create_module(module, context))
+            except UnknownModuleError:
+                self.logger.warning(f"Unknown module '{module}' requested; skipping.")
+
+        # Reject streaming before any module is written rather than part way
+        if options and options.get("streamblock"):
+            blocked = [ module.__class__.__name__ for module in self.modules if not module.streams ]
+            if blocked:
+                raise ValueError(f"--streamblock cannot be used with: {', '.join(blocked)}.")
                 
-    def update_time_coverage(self):
-        """Update time coverage for results."""
+    def update_time_coverage(self, time_range=None):
+        """Update time coverage for results.
+        
+        Shard results files also store the SWOT time range in seconds so
+        that merge_shards computes the coverage of the continent exactly.
+
+        Parameters
+        ----------
+        time_range: tuple
+            minimum and maximum SWOT time (defaults to the times tracked by
+            the SWOT module)
+        """
         
         sos = Dataset(self.sos_file, 'a')
         
-        # Determine min and max SWOT time values from node-level data
+        # Min and max SWOT time values tracked during node-level extraction
         swot_ts = datetime.datetime(2000,1,1,0,0,0)
-        time = sos["nodes"]["time"][:]
-        time = np.hstack(time)
-        time[np.isclose(time,-999999999999.0)] = np.nan   # Time fill value
-        time[np.isclose(time,-9999.0)] = np.nan    # Another fill value found
+        if time_range is None:
+            time_range = (None, None) if self.swot is None else (self.swot.time_min, self.swot.time_max)
         
         # Min/max and duration values for coverage
-        if np.isnan(time).all():
+        if time_range[0] is None:
             sos.time_coverage_start = "NO TIME DATA"
             sos.time_coverage_end = "NO TIME DATA"
             sos.time_coverage_duration = "NO TIME DATA"
         else:
-            min_time = swot_ts + datetime.timedelta(seconds=np.nanmin(time))
-            max_time = swot_ts + datetime.timedelta(seconds=np.nanmax(time))
-            sos.time_coverage_start = min_time.strftime("%Y-%m-%dT%H:%M:%S")
-            sos.time_coverage_end = max_time.strftime("%Y-%m-%dT%H:%M:%S")
-            
-            duration = relativedelta.relativedelta(max_time, min_time)
-            sos.time_coverage_duration = f"P{duration.years}Y{duration.months}M{duration.days}DT{duration.hours}H{duration.minutes}M{duration.seconds}S"
+            min_time = swot_ts + datetime.timedelta(seconds=float(time_range[0]))
+            max_time = swot_ts + datetime.timedelta(seconds=float(time_range[1]))
+            write_time_coverage(sos, min_time, max_time)
+            if self.shard is not None:
+                sos.setncatts(dict(zip(self.SHARD_TIME_ATTRS, np.asarray(time_range, dtype=np.float64))))
         
         sos.close()
             
 
+def _init_worker(modules, metadata_json):
+    """Store the modules and metadata a worker process appends."""
+
+    global _WORKER_MODULES, _WORKER_METADATA
+    _WORKER_MODULES, _WORKER_METADATA = modules, metadata_json
+
+def _append_module(index):
+    """Append a module to its module file and return its CACHE_STATE attributes."""
+
+    module = _WORKER_MODULES[index]
+    module.append_module(_WORKER_METADATA)
+    return { attr: getattr(module, attr) for attr in module.CACHE_STATE }
+
 def get_cont_data(cont_json, index):
     """Extract and return the continent data needs to be extracted for.
     
@@ -363,96 +617,149 @@ def get_modules_list(modules_json_path):
         data = json.load(jsonfile)
     return data['modules']
 
-def get_continent_sos_data(sos_cur, continent, priors_suffix):
-    """Return a dictionary of continents with associated reach identifiers.
+def write_reaches(prior_sos, result_sos, metadata_json):
+    """Write reach_id variable and associated dimension to the SoS.
     
     Parameters
     ----------
-    continent: str
-        continent letter identifiers
-    sos_cur: Path
-        path to the current SoS
-    priors_suffix: str
-        string suffix of priors SOS file name
+    prior_sos: PriorSoS
+        shared handle on the priors SoS
+    result_sos: netCDF4.Dataset
+        new SoS results file
+    metadata_json: dict
+        dictionary of metadata attributes
     """
     
-    nc = Dataset(sos_cur / f"{continent}_{priors_suffix}.nc", 'r')
-    rids = nc["reaches"]["reach_id"][:]
-    nrids = nc["nodes"]["reach_id"][:]
-    nids = nc["nodes"]["node_id"][:]
-    nc.close()
-
-    return { "reaches": rids, "node_reaches": nrids, "nodes": nids }
-
-def write_reaches(prior_sos, result_sos, metadata_json):
-    """Write reach_id variable and associated dimension to the SoS."""
-    
+    prior_reaches = prior_sos.dataset["reaches"]
     sos_reach = result_sos.createGroup("reaches")
     
     # Reach ID
     reach_var = sos_reach.createVariable("reach_id", "i8", ("num_reaches",), compression="zlib")
-    reach_var.setncatts(prior_sos["reaches"]["reach_id"].__dict__)
-    reach_var[:] = prior_sos["reaches"]["reach_id"][:]
+    reach_var.setncatts(prior_reaches["reach_id"].__dict__)
+    reach_var[:] = prior_sos.reach_ids
     set_variable_atts(reach_var, metadata_json["reaches"]["reach_id"]) 
-    try:
+    if prior_sos.reach_x is not None and prior_sos.reach_y is not None:
         # Latitude
         x = sos_reach.createVariable("x", "f8", ("num_reaches"), compression="zlib")
-        x.setncatts(prior_sos["reaches"]["x"].__dict__)
-        x[:] = prior_sos["reaches"]["x"][:]
+        x.setncatts(prior_reaches["x"].__dict__)
+        x[:] = prior_sos.reach_x
         set_variable_atts(x, metadata_json["reaches"]["x"])
         
         # Longitude
         y = sos_reach.createVariable("y", "f8", ("num_reaches"), compression="zlib")
-        y.setncatts(prior_sos["reaches"]["y"].__dict__)
-        y[:] = prior_sos["reaches"]["y"][:]
+        y.setncatts(prior_reaches["y"].__dict__)
+        y[:] = prior_sos.reach_y
         set_variable_atts(y, metadata_json["reaches"]["y"])
-    except:
+    else:
         print('Geospatial data not present in sos..')
     
     # River name
     river_name = sos_reach.createVariable("river_name", str, ("num_reaches"),)
-    river_name.setncatts(prior_sos["reaches"]["river_name"].__dict__)
-    river_name[:] = prior_sos["reaches"]["river_name"][:]
+    river_name.setncatts(prior_reaches["river_name"].__dict__)
+    river_name[:] = prior_sos.read(prior_reaches["river_name"])
     set_variable_atts(river_name, metadata_json["reaches"]["river_name"])
 
-def write_nodes(prior_sos, result_sos, metadata_json, node_ids):
+def write_nodes(prior_sos, result_sos, metadata_json):
     """Write node_id and reach_id variables with associated dimension to the
-    SoS."""
+    SoS.
+    
+    Parameters
+    ----------
+    prior_sos: PriorSoS
+        shared handle on the priors SoS
+    result_sos: netCDF4.Dataset
+        new SoS results file
+    metadata_json: dict
+        dictionary of metadata attributes
+    """
 
+    prior_nodes = prior_sos.dataset["nodes"]
     sos_node = result_sos.createGroup("nodes")
     
     # Node ID
     node_var = sos_node.createVariable("node_id", "i8", ("num_nodes",), compression="zlib")
-    node_var.setncatts(prior_sos["nodes"]["node_id"].__dict__)
-    node_var[:] = node_ids
+    node_var.setncatts(prior_nodes["node_id"].__dict__)
+    node_var[:] = prior_sos.node_ids
     set_variable_atts(node_var, metadata_json["nodes"]["node_id"])
     
     # Reach ID
     reach_var = sos_node.createVariable("reach_id", "i8", ("num_nodes",), compression="zlib")
-    reach_var.setncatts(prior_sos["nodes"]["reach_id"].__dict__)
-    reach_var[:] = prior_sos["nodes"]["reach_id"][:]
+    reach_var.setncatts(prior_nodes["reach_id"].__dict__)
+    reach_var[:] = prior_sos.node_reach_ids
     set_variable_atts(reach_var, metadata_json["nodes"]["reach_id"])
     
     # Latitude
     x = sos_node.createVariable("x", "f8", ("num_nodes"), compression="zlib")
-    x.setncatts(prior_sos["nodes"]["x"].__dict__)
-    x[:] = prior_sos["nodes"]["x"][:]
+    x.setncatts(prior_nodes["x"].__dict__)
+    x[:] = prior_sos.node_x
     set_variable_atts(x, metadata_json["nodes"]["x"])
     
     # Longitude
     y = sos_node.createVariable("y", "f8", ("num_nodes"), compression="zlib")
-    y.setncatts(prior_sos["nodes"]["y"].__dict__)
-    y[:] = prior_sos["nodes"]["y"][:]
+    y.setncatts(prior_nodes["y"].__dict__)
+    y[:] = prior_sos.node_y
     set_variable_atts(y, metadata_json["nodes"]["y"])
     
     # River name
     river_name = sos_node.createVariable("river_name", str, ("num_nodes"),)
-    river_name.setncatts(prior_sos["nodes"]["river_name"].__dict__)
-    river_name[:] = prior_sos["nodes"]["river_name"][:]
+    river_name.setncatts(prior_nodes["river_name"].__dict__)
+    river_name[:] = prior_sos.read(prior_nodes["river_name"])
     set_variable_atts(river_name, metadata_json["nodes"]["river_name"])
 
+def read_time_coverage(sos):
+    """Return time coverage start and end of a results file.
+
+    Returns an empty list if the results file has no time data.
+
+    Parameters
+    ----------
+    sos: netCDF4.Dataset
+        SoS results file
+    """
+
+    try:
+        return [ datetime.datetime.strptime(sos.time_coverage_start, "%Y-%m-%dT%H:%M:%S"),
+                 datetime.datetime.strptime(sos.time_coverage_end, "%Y-%m-%dT%H:%M:%S") ]
+    except (AttributeError, ValueError):
+        return []
+
+def shard_rows(num_reaches, shard, num_shards):
+    """Return the priors reach rows of a shard.
+
+    Shards are consecutive slices of the priors reach order whose sizes
+    differ by at most one reach.
+
+    Parameters
+    ----------
+    num_reaches: int
+        number of reaches of the continent
+    shard: int
+        shard number (0 to num_shards - 1)
+    num_shards: int
+        number of shards the continent is split into
+    """
+
+    return np.arange(num_reaches * shard // num_shards, num_reaches * (shard + 1) // num_shards)
+
+def write_time_coverage(sos, min_time, max_time):
+    """Write time coverage attributes to a results file.
+
+    Parameters
+    ----------
+    sos: netCDF4.Dataset
+        SoS results file
+    min_time: datetime.datetime
+        earliest SWOT time
+    max_time: datetime.datetime
+        latest SWOT time
+    """
+
+    sos.time_coverage_start = min_time.strftime("%Y-%m-%dT%H:%M:%S")
+    sos.time_coverage_end = max_time.strftime("%Y-%m-%dT%H:%M:%S")
+    duration = relativedelta.relativedelta(max_time, min_time)
+    sos.time_coverage_duration = f"P{duration.years}Y{duration.months}M{duration.days}DT{duration.hours}H{duration.minutes}M{duration.seconds}S"
+
 def set_variable_atts(variable, variable_dict):
-    """Set the variable attribute metdata."""
+    """Set the variable attribute metdata with a single setncatts call."""
     
-    for name, value in variable_dict.items():
-        setattr(variable, name, value)
\ No newline at end of file
+    variable.setncatts(MetadataPlan.typed_attrs(variable, variable_dict))
\ No newline at end of file
@@ -0,0 +1,250 @@
+# Standard imports
+import hashlib
+import os
+from pathlib import Path
+
+# Third-party imports
+import numpy as np
+
+# Local imports
+from output.modules.SparseRows import SparseRows
+
+class _Stored:
+    """Placeholder for data stored as arrays of an extraction cache file.
+
+    Attributes
+    ----------
+    kind: str
+        "array", "broadcast", "ragged" or "sparse"
+    key: str
+        prefix of the cache file arrays that hold the data
+    shape: tuple
+        shape of broadcast or ragged object array or number of sparse rows
+    """
+
+    def __init__(self, kind, key, shape=None):
+        self.kind = kind
+        self.key = key
+        self.shape = shape
+
+class ExtractCache:
+    """Class that persists modules' extracted data between runs.
+
+    Each module's data dictionary is written to an .npz file in the cache
+    directory after extraction. Fixed size arrays are stored as arrays and
+    ragged rows as concatenated values plus offsets. Attributes and other
+    small values are stored in a pickled tree. A retry reuses the file when
+    the fingerprint of the module's input files still matches.
+
+    Attributes
+    ----------
+    cache_dir: Path
+        directory to store cache files in
+    continent: str
+        continent the cached data belongs to
+    logger: logging.Logger
+        logger to log statements with
+
+    Methods
+    -------
+    fingerprint(input_dir, input_files, extras)
+        return fingerprint of input files and extraction settings.
+    load(module, key)
+        return cached data dictionary and module state.
+    path(module)
+        return path to a module's cache file.
+    save(module, key, data_dict, state)
+        write data dictionary and module state to a cache file.
+    """
+
+    SUFFIX = "extract.npz"
+
+    def __init__(self, cache_dir, continent, logger=None):
+        """
+        Parameters
+        ----------
+        cache_dir: Path
+            directory to store cache files in
+        continent: str
+            continent the cached data belongs to
+        logger: logging.Logger
+            logger to log statements with
+        """
+
+        self.cache_dir = Path(cache_dir)
+        self.continent = continent
+        self.logger = logger
+
+    def path(self, module):
+        """Return path to a module's cache file.
+
+        Parameters
+        ----------
+        module: str
+            name of module
+        """
+
+        return self.cache_dir / f"{self.continent}_{module}_{self.SUFFIX}"
+
+    @staticmethod
+    def fingerprint(input_dir, input_files, extras):
+        """Return fingerprint of input files and extraction settings.
+
+        Each input file contributes its name relative to input_dir, size and
+        modification time.
+
+        Parameters
+        ----------
+        input_dir: Path
+            module input directory
+        input_files: list
+            paths to the input files the module reads
+        extras: list
+            other values the extracted data depends on
+        """
+
+        digest = hashlib.sha256()
+        for extra in extras:
+            digest.update(extra if isinstance(extra, bytes) else repr(extra).encode())
+        entries = []
+        for input_file in input_files:
+            stat = os.stat(input_file)
+            entries.append((os.path.relpath(input_file, input_dir), stat.st_size, stat.st_mtime_ns))
+        for entry in sorted(entries):
+            digest.update(repr(entry).encode())
+        return digest.hexdigest()
+
+    def load(self, module, key):
+        """Return cached data dictionary and module state.
+
+        Returns None if there is no cache file or it does not match key.
+
+        Parameters
+        ----------
+        module: str
+            name of module
+        key: str
+            fingerprint returned by fingerprint
+        """
+
+        path = self.path(module)
+        if not path.exists(): return None
+        try:
+            with np.load(path, allow_pickle=True) as npz:
+                if str(npz["key"]) != key: return None
+                data_dict, state = npz["tree"].item()
+                return self.__restore(data_dict, npz), self.__restore(state, npz)
+        except (OSError, KeyError, ValueError, EOFError) as error:
+            if self.logger: self.logger.warning(f"Could not read extraction cache {path}: {error}")
+            return None
+
+    def save(self, module, key, data_dict, state):
+        """Write data dictionary and module state to a cache file.
+
+        Parameters
+        ----------
+        module: str
+            name of module
+        key: str
+            fingerprint returned by fingerprint
+        data_dict: dict
+            dictionary of extracted module data
+        state: dict
+            module attributes set during extraction
+        """
+
+        path = self.path(module)
+        arrays = {}
+        tree = np.empty((), dtype=object)
+        tree[()] = (self.__store(data_dict, arrays), self.__store(state, arrays))
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp.npz")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(tmp, key=np.array(key), tree=tree, **arrays)
+            os.replace(tmp, path)
+        except OSError as error:
+            if self.logger: self.logger.warning(f"Could not write extraction cache {path}: {error}")
+            tmp.unlink(missing_ok=True)
+
+    def __store(self, value, arrays):
+        """Return value with arrays moved into arrays and replaced by _Stored.
+
+        Parameters
+        ----------
+        value: object
+            data dictionary or value in it
+        arrays: dict
+            dictionary of arrays to write to the cache file
+        """
+
+        if isinstance(value, dict):
+            return { name: self.__store(item, arrays) for name, item in value.items() }
+        key = f"a{len(arrays)}"
+        if isinstance(value, SparseRows):
+            rows = value.rows
+            ragged = self.__ragged([ value[int(row)] for row in rows ])
+            if ragged is None: return value
+            arrays[f"{key}_rows"] = rows
+            arrays[f"{key}_values"], arrays[f"{key}_offsets"] = ragged
+            arrays[f"{key}_fill"] = np.asarray(value.fill)
+            return _Stored("sparse", key, value.num_rows)
+        if isinstance(value, np.ma.MaskedArray): return value
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            if 0 in value.strides and value.size > 1:
+                # Broadcast view: store one element along repeated axes
+                arrays[key] = value[tuple(slice(0, 1) if stride == 0 else slice(None)
+                                          for stride in value.strides)]
+                return _Stored("broadcast", key, value.shape)
+            arrays[key] = value
+            return _Stored("array", key)
+        if isinstance(value, np.ndarray):
+            ragged = self.__ragged(value.ravel())
+            if ragged is None: return value
+            arrays[f"{key}_values"], arrays[f"{key}_offsets"] = ragged
+            return _Stored("ragged", key, value.shape)
+        return value
+
+    @staticmethod
+    def __ragged(rows):
+        """Return concatenated values and offsets of rows (None if not 1-D arrays of one type).
+
+        Parameters
+        ----------
+        rows: sequence
+            sequence of row arrays
+        """
+
+        if not all(isinstance(row, np.ndarray) and row.ndim == 1 for row in rows): return None
+        if len({ row.dtype for row in rows }) > 1 or any(row.dtype == object for row in rows): return None
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([ row.shape[0] for row in rows ])
+        values = np.concatenate(rows) if len(rows) else np.array([], dtype=np.float64)
+        return values, offsets
+
+    def __restore(self, value, npz):
+        """Return value with _Stored placeholders replaced by their data.
+
+        Parameters
+        ----------
+        value: object
+            stored data dictionary or value in it
+        npz: numpy.lib.npyio.NpzFile
+            open cache file
+        """
+
+        if isinstance(value, dict):
+            return { name: self.__restore(item, npz) for name, item in value.items() }
+        if not isinstance(value, _Stored): return value
+        if value.kind == "array": return npz[value.key]
+        if value.kind == "broadcast": return np.broadcast_to(npz[value.key], value.shape)
+        values = npz[f"{value.key}_values"]
+        offsets = npz[f"{value.key}_offsets"]
+        if value.kind == "sparse":
+            sparse = SparseRows(value.shape, npz[f"{value.key}_fill"])
+            for i, row in enumerate(npz[f"{value.key}_rows"]):
+                sparse[int(row)] = values[offsets[i]:offsets[i + 1]]
+            return sparse
+        data = np.empty(offsets.shape[0] - 1, dtype=object)
+        for i in range(data.shape[0]):
+            data[i] = values[offsets[i]:offsets[i + 1]]
+        return data.reshape(value.shape)
@@ -0,0 +1,212 @@
+# Third-party imports
+import numpy as np
+
+class MetadataPlan(dict):
+    """Class that holds metadata JSON compiled into per-variable attribute plans.
+
+    The nested metadata is walked once when the plan is created. Each
+    variable's attributes are kept under its key path so they can be merged
+    with input file attributes and set with a single setncatts call. The plan
+    is still a dictionary of the metadata JSON, so nested lookups keep working.
+
+    Attributes
+    ----------
+    CAST_ATTRS: tuple
+        attributes written in the data type of their variable
+    groups: dict
+        list of variable names for each group key path (tuple)
+    PACKED_FLAGS: str
+        name of the variable that 0/1 flags of its group are packed into
+    SKELETON: tuple
+        groups written by every run whatever variables are selected
+    variables: dict
+        dictionary of attributes for each variable key path (tuple)
+
+    Methods
+    -------
+    attrs(*keys)
+        return attributes of a variable.
+    has(*keys)
+        return True if a variable has metadata.
+    includes(*keys)
+        return True if any variable under a key path has metadata.
+    names(*keys)
+        return names of the variables of a group.
+    of(metadata_json)
+        return metadata_json as a MetadataPlan.
+    select(paths)
+        return plan restricted to the variables under paths.
+    typed_attrs(variable, attrs)
+        return attributes with range and missing values cast for a variable.
+    """
+
+    CAST_ATTRS = ("valid_min", "valid_max", "valid_range", "missing_value")
+
+    PACKED_FLAGS = "flags"
+
+    SKELETON = ("global_attributes", "global_attributes_extra", "reaches", "nodes")
+
+    def __init__(self, metadata_json):
+        """
+        Parameters
+        ----------
+        metadata_json: dict
+            dictionary of SoS metadata loaded from metadata.json
+        """
+
+        super().__init__(metadata_json)
+        self.variables = {}
+        self.__compile((), metadata_json)
+        self.groups = self.__group(self.variables)
+
+    def __compile(self, keys, metadata):
+        """Store variable attributes and group variable names under keys.
+
+        A dictionary without nested dictionaries holds a variable's attributes.
+
+        Parameters
+        ----------
+        keys: tuple
+            key path of metadata
+        metadata: dict
+            dictionary of group or variable metadata
+        """
+
+        if not any(isinstance(value, dict) for value in metadata.values()):
+            self.variables[keys] = dict(metadata)
+            return
+        for name, value in metadata.items():
+            if isinstance(value, dict): self.__compile(keys + (name,), value)
+
+    @staticmethod
+    def __group(variables):
+        """Return dictionary of variable names for each group key path.
+
+        Parameters
+        ----------
+        variables: dict
+            dictionary of attributes for each variable key path
+        """
+
+        groups = {}
+        for keys in variables:
+            if keys: groups.setdefault(keys[:-1], []).append(keys[-1])
+        return groups
+
+    def attrs(self, *keys):
+        """Return attributes of a variable (empty if it has no metadata).
+
+        Parameters
+        ----------
+        keys: str
+            key path of variable, e.g. "sad", "Qa"
+        """
+
+        return self.variables.get(keys, {})
+
+    def has(self, *keys):
+        """Return True if a variable has metadata.
+
+        Parameters
+        ----------
+        keys: str
+            key path of variable
+        """
+
+        return keys in self.variables
+
+    def includes(self, *keys):
+        """Return True if any variable under a key path has metadata.
+
+        Parameters
+        ----------
+        keys: str
+            key path of group or variable, e.g. "moi", "sad"
+        """
+
+        return any(variable[:len(keys)] == keys for variable in self.variables)
+
+    def names(self, *keys):
+        """Return names of the variables of a group.
+
+        Parameters
+        ----------
+        keys: str
+            key path of group, e.g. "prediagnostics", "reach"
+        """
+
+        return self.groups.get(keys, [])
+
+    @staticmethod
+    def of(metadata_json):
+        """Return metadata_json as a MetadataPlan, compiling it if needed.
+
+        Parameters
+        ----------
+        metadata_json: dict or MetadataPlan
+            dictionary of SoS metadata
+        """
+
+        return metadata_json if isinstance(metadata_json, MetadataPlan) else MetadataPlan(metadata_json)
+
+    def select(self, paths):
+        """Return plan restricted to the variables under paths.
+
+        SKELETON groups are always kept. A packed flags variable and the 0/1
+        flags of its group are kept together, since the packed field is
+        written from those flags. Modules only read and write the variables
+        that remain in the plan.
+
+        Parameters
+        ----------
+        paths: list
+            list of "/" separated key paths, e.g. "moi/sad/q" or "validation"
+        """
+
+        prefixes = [ tuple(path.strip('/').split('/')) for path in paths ] \
+            + [ (group,) for group in self.SKELETON ]
+        plan = MetadataPlan(self)
+        selected = { keys for keys in self.variables if any(keys[:len(prefix)] == prefix for prefix in prefixes) }
+        packed = { keys[:-1] for keys in selected if self.__packs(keys) }
+        plan.variables = { keys: attrs for keys, attrs in self.variables.items()
+                          if keys in selected or (keys[:-1] in packed and self.__packs(keys)) }
+        plan.groups = self.__group(plan.variables)
+        return plan
+
+    def __packs(self, keys):
+        """Return True if a variable is a packed flags variable or a 0/1 flag packed into one.
+
+        Parameters
+        ----------
+        keys: tuple
+            key path of variable
+        """
+
+        if keys[:-1] + (self.PACKED_FLAGS,) not in self.variables: return False
+        return keys[-1] == self.PACKED_FLAGS or self.variables[keys].get("flag_values") == "0 1"
+
+    @staticmethod
+    def typed_attrs(variable, attrs):
+        """Return attributes with range and missing values cast for a variable.
+
+        netCDF4 casts these attributes to the variable's data type when they
+        are set one at a time but not when they are set with setncatts.
+
+        Parameters
+        ----------
+        variable: netCDF4._netCDF4.Variable
+            variable the attributes are set on
+        attrs: dict
+            dictionary of attributes
+        """
+
+        if not isinstance(variable.datatype, np.dtype): return attrs
+        typed = dict(attrs)
+        for name in MetadataPlan.CAST_ATTRS:
+            if name not in attrs: continue
+            try:
+                value = np.array(attrs[name], variable.dtype)
+            except (TypeError, ValueError):
+                continue
+            if (value == np.array(attrs[name])).all(): typed[name] = value
+        return typed
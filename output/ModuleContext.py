@@ -0,0 +1,93 @@
+class ModuleContext:
+    """Class that holds the state shared by every module in an Output run.
+
+    Modules are created from a context (AbstractModule.from_context) rather
+    than from a long list of constructor arguments.
+
+    Attributes
+    ----------
+    cache: ExtractCache
+        extraction cache shared by modules (None when not caching)
+    cont_ids: list
+        list of continent identifiers
+    dirs: dict
+        input directory (Path) for each directory key (see output.Registry)
+    logger: logging.Logger
+        logger to log statements with
+    metadata: MetadataPlan
+        compiled SoS metadata
+    options: dict
+        command line output options (e.g. "nodeobs")
+    prior_sos: PriorSoS
+        shared handle on the continent's priors SoS
+    reach_index: ReachIndex
+        reach and node row lookups for the priors SoS identifiers
+    reach_rows: nd.array
+        rows of the reaches in the results file (None when every reach is processed)
+    run_type: str
+        either "constrained" or "unconstrained"
+    sos_new: Path
+        path to new SOS file
+    sos_nrids: nd.array
+        array of SOS reach identifiers on the node-level
+    sos_nids: nd.array
+        array of SOS node identifiers
+    sos_rids: nd.array
+        array of SoS reach identifiers associated with continent
+    vlen_f: VLType
+        variable length float data type for NetCDF ragged arrays
+    vlen_i: VLType
+        variable length int data type for NEtCDF ragged arrays
+    vlen_s: VLType
+        variable length string data type for NEtCDF ragged arrays
+    """
+
+    def __init__(self, cont_ids, sos_new, logger, prior_sos, run_type, dirs,
+                 vlen_f=None, vlen_i=None, vlen_s=None, options=None, metadata=None,
+                 cache=None):
+        """
+        Parameters
+        ----------
+        cont_ids: list
+            list of continent identifiers
+        sos_new: Path
+            path to new SOS file
+        logger: logging.Logger
+            logger to log statements with
+        prior_sos: PriorSoS
+            shared handle on the continent's priors SoS
+        run_type: str
+            either "constrained" or "unconstrained"
+        dirs: dict
+            input directory (Path) for each directory key
+        vlen_f: VLType
+            variable length float data type for NetCDF ragged arrays
+        vlen_i: VLType
+            variable length int data type for NEtCDF ragged arrays
+        vlen_s: VLType
+            variable length string data type for NEtCDF ragged arrays
+        options: dict
+            command line output options
+        metadata: MetadataPlan
+            compiled SoS metadata
+        cache: ExtractCache
+            extraction cache shared by modules
+        """
+
+        self.cont_ids = cont_ids
+        self.sos_new = sos_new
+        self.logger = logger
+        self.prior_sos = prior_sos
+        self.run_type = run_type
+        self.dirs = dirs
+        self.vlen_f = vlen_f
+        self.vlen_i = vlen_i
+        self.vlen_s = vlen_s
+        self.options = options if options is not None else {}
+        self.metadata = metadata
+        self.cache = cache
+        self.sos_rids = prior_sos.reach_ids
+        self.sos_nrids = prior_sos.node_reach_ids
+        self.sos_nids = prior_sos.node_ids
+        self.reach_index = prior_sos.index
+        self.reach_rows = prior_sos.reach_rows
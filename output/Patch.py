@@ -0,0 +1,239 @@
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+
+class Patch:
+    """Class that overwrites reach and node rows of a results file.
+
+    A partial results file holds the results of a selection of reaches and
+    their nodes (see PriorSoS.select). Variables indexed by num_reaches or
+    num_nodes are written to the selected rows of the results file and
+    other variables are overwritten in full. Variables and groups that are
+    missing from the results file are created with the same definition.
+    Variables are copied in blocks of rows of about WRITE_SIZE values so
+    only one block is held in memory at a time.
+
+    Attributes
+    ----------
+    node_rows: nd.array
+        ascending rows of the partial file's nodes in the results file
+    reach_rows: nd.array
+        ascending rows of the partial file's reaches in the results file
+    ROW_DIMS: tuple
+        names of the dimensions that index reach and node rows
+    SKELETON: dict
+        identifier and coordinate variables of the reaches and nodes groups
+    WRITE_SIZE: int
+        number of values read and written at a time
+
+    Methods
+    -------
+    apply(partial_file, results_file, history)
+        write the rows of a partial results file to a results file.
+    check(partial, results)
+        raise ValueError if the partial file does not fit the results file.
+    copy_group(src, dst)
+        write the variables of a partial file group to a results file group.
+    update_history(results, history)
+        append a line to the history attribute.
+    """
+
+    ROW_DIMS = ("num_reaches", "num_nodes")
+    SKELETON = {
+        "reaches": ("reach_id", "x", "y", "river_name"),
+        "nodes": ("node_id", "reach_id", "x", "y", "river_name")
+    }
+    # Same block size as AbstractModule.WRITE_SIZE without importing module classes
+    WRITE_SIZE = 1 << 20
+
+    def __init__(self, reach_rows, node_rows):
+        """
+        Parameters
+        ----------
+        reach_rows: nd.array
+            ascending rows of the partial file's reaches in the results file
+        node_rows: nd.array
+            ascending rows of the partial file's nodes in the results file
+        """
+
+        self.reach_rows = np.asarray(reach_rows, dtype=np.int64)
+        self.node_rows = np.asarray(node_rows, dtype=np.int64)
+
+    def apply(self, partial_file, results_file, history):
+        """Write the rows of a partial results file to a results file.
+
+        Parameters
+        ----------
+        partial_file: Path
+            path to partial results file
+        results_file: Path
+            path to results file to overwrite rows of
+        history: str
+            line to append to the history attribute
+        """
+
+        with Dataset(partial_file, 'r') as partial, Dataset(results_file, 'a') as results:
+            self.check(partial, results)
+            self.copy_group(partial, results)
+            self.update_history(results, history)
+
+    def check(self, partial, results):
+        """Raise ValueError if the partial file does not fit the results file.
+
+        The reach and node identifiers of the partial file must be those of
+        the results file rows and the other dimensions must match.
+
+        Parameters
+        ----------
+        partial: netCDF4.Dataset
+            partial results file
+        results: netCDF4.Dataset
+            results file
+        """
+
+        for group, name, rows in (("reaches", "reach_id", self.reach_rows), ("nodes", "node_id", self.node_rows)):
+            ids = self.__read_raw(results[group][name])
+            partial_ids = self.__read_raw(partial[group][name])
+            if rows.shape[0] != partial_ids.shape[0] or (rows.shape[0] and rows[-1] >= ids.shape[0]) \
+                or not np.array_equal(ids[rows], partial_ids):
+                raise ValueError(f"Partial file {group} do not match the rows of {results.filepath()}.")
+        self.__check_dims(partial, results)
+
+    @staticmethod
+    def __read_raw(var):
+        """Return variable data without masking.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            identifier variable
+        """
+
+        var.set_auto_mask(False)
+        return var[:]
+
+    def __check_dims(self, src, dst):
+        """Raise ValueError if a dimension of src has another size in dst.
+
+        Parameters
+        ----------
+        src: netCDF4.Group
+            partial file group
+        dst: netCDF4.Group
+            results file group (or None if it does not exist)
+        """
+
+        if dst is None: return
+        for name, dim in src.dimensions.items():
+            if name in self.ROW_DIMS or name not in dst.dimensions: continue
+            if dim.isunlimited() or dim.size == dst.dimensions[name].size: continue
+            raise ValueError(f"Dimension {src.path}/{name} has size {dim.size} "
+                             f"instead of {dst.dimensions[name].size}.")
+        for name, grp in src.groups.items():
+            self.__check_dims(grp, dst.groups.get(name))
+
+    def copy_group(self, src, dst):
+        """Write the variables of a partial file group to a results file group.
+
+        Parameters
+        ----------
+        src: netCDF4.Group
+            partial file group
+        dst: netCDF4.Group
+            results file group
+        """
+
+        skeleton = self.SKELETON.get(src.name, ()) if src.parent is not None and src.parent.parent is None else ()
+        for name, dim in src.dimensions.items():
+            if name in dst.dimensions: continue
+            size = self.__root(dst).dimensions[name].size if name in self.ROW_DIMS else dim.size
+            dst.createDimension(name, None if dim.isunlimited() else size)
+        for name, var in src.variables.items():
+            if name in skeleton: continue
+            out = dst.variables[name] if name in dst.variables else self.__create_like(var, dst)
+            self.__write(var, out)
+        for name, grp in src.groups.items():
+            self.copy_group(grp, dst.groups[name] if name in dst.groups else dst.createGroup(name))
+
+    @staticmethod
+    def __root(grp):
+        """Return the dataset a group belongs to.
+
+        Parameters
+        ----------
+        grp: netCDF4.Group
+            results file group
+        """
+
+        while grp.parent is not None: grp = grp.parent
+        return grp
+
+    def __create_like(self, var, grp):
+        """Create and return a results file variable defined like var.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            partial file variable
+        grp: netCDF4.Group
+            results file group to create the variable in
+        """
+
+        datatype = var.datatype
+        if hasattr(datatype, "dtype") and not isinstance(datatype, np.dtype):
+            root = self.__root(grp)
+            datatype = root.vltypes[datatype.name] if datatype.name in root.vltypes \
+                else root.createVLType(datatype.dtype, datatype.name)
+        attrs = var.__dict__
+        filters = var.filters() or {}
+        out = grp.createVariable(var.name, datatype, var.dimensions, fill_value=attrs.get("_FillValue"),
+                                 compression="zlib" if filters.get("zlib") else None)
+        out.setncatts({ name: value for name, value in attrs.items() if name != "_FillValue" })
+        return out
+
+    def __write(self, src, dst):
+        """Write src data to the rows of dst it belongs to.
+
+        Runs of consecutive rows are copied in blocks of about WRITE_SIZE
+        values (rows of variable length data count as one value each).
+
+        Parameters
+        ----------
+        src: netCDF4._netCDF4.Variable
+            partial file variable
+        dst: netCDF4._netCDF4.Variable
+            results file variable
+        """
+
+        src.set_auto_maskandscale(False)
+        dst.set_auto_maskandscale(False)
+        dims = src.dimensions
+        if not dims:
+            dst[:] = src[:]
+            return
+        if dims[0] in self.ROW_DIMS:
+            rows = self.reach_rows if dims[0] == "num_reaches" else self.node_rows
+        else:
+            rows = np.arange(src.shape[0])
+        if rows.shape[0] == 0: return
+        block = max(1, self.WRITE_SIZE // max(1, int(np.prod(src.shape[1:]))))
+        # Write runs of consecutive rows as slices
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        for start, stop in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [rows.shape[0]]))):
+            for i in range(start, stop, block):
+                j = min(i + block, stop)
+                dst[rows[i]:rows[j - 1] + 1] = src[i:j]
+
+    def update_history(self, results, history):
+        """Append a line to the history attribute.
+
+        Parameters
+        ----------
+        results: netCDF4.Dataset
+            results file
+        history: str
+            line to append
+        """
+
+        current = getattr(results, "history", "")
+        results.history = f"{current}\n{history}" if current else history
@@ -0,0 +1,193 @@
+# Standard imports
+import heapq
+import json
+import math
+import os
+from pathlib import Path
+
+# Third-party imports
+from netCDF4 import Dataset
+
+# Local imports
+from output.Registry import MODULES
+
+class Planner:
+    """Class that plans array jobs of about the same cost for continents.
+
+    The cost of a continent is estimated from its number of reaches and the
+    number and size of its input files under each module's directory.
+    Continents that cost more than an even share of the total are split into
+    shards and the shards and smaller continents are packed into jobs,
+    largest first, onto the job with the least work.
+
+    Attributes
+    ----------
+    conts: list
+        list of continent dictionaries loaded from the continent JSON file
+    COST_PER_FILE: int
+        cost of opening an input file in bytes read
+    COST_PER_REACH: int
+        cost of writing a reach in bytes read
+    dirs: dict
+        input directory (Path) for each directory key (see output.Registry)
+    logger: logging.Logger
+        logger to log statements with
+    modules: list
+        list of module names that are run
+    priors: Callable
+        function of a continent name that returns the path to its priors SoS
+
+    Methods
+    -------
+    estimate()
+        return estimated cost of each continent.
+    plan(num_jobs)
+        return plan of array jobs for continents.
+    write(plan_file, num_jobs)
+        write plan of array jobs to a JSON file.
+    """
+
+    COST_PER_FILE = 1 << 18
+    COST_PER_REACH = 1 << 14
+
+    def __init__(self, cont_json, dirs, modules, priors, logger):
+        """
+        Parameters
+        ----------
+        cont_json: Path
+            path to continent JSON file
+        dirs: dict
+            input directory (Path) for each directory key
+        modules: list
+            list of module names that are run
+        priors: Callable
+            function of a continent name that returns the path to its priors SoS
+        logger: logging.Logger
+            logger to log statements with
+        """
+
+        with open(cont_json) as jf:
+            self.conts = json.load(jf)
+        self.dirs = dirs
+        self.modules = modules
+        self.priors = priors
+        self.logger = logger
+
+    def estimate(self):
+        """Return estimated cost of each continent.
+
+        Returns a list in continent JSON order of dictionaries with the
+        continent index, name, number of reaches, number of files and bytes
+        for each directory key and the total cost.
+        """
+
+        for module in self.modules:
+            if module not in MODULES: self.logger.warning(f"Unknown module '{module}' has no input directory to plan; skipping.")
+        dir_keys = sorted({ MODULES[module][2] for module in self.modules if module in MODULES } | {"input"})
+        scans = { dir_key: self.__scan(self.dirs[dir_key]) for dir_key in dir_keys }
+        costs = []
+        for index, cont in enumerate(self.conts):
+            name, cont_ids = next(iter(cont.items()))
+            files = { dir_key: sum(scan.get(cont_id, (0, 0))[0] for cont_id in cont_ids) for dir_key, scan in scans.items() }
+            sizes = { dir_key: sum(scan.get(cont_id, (0, 0))[1] for cont_id in cont_ids) for dir_key, scan in scans.items() }
+            reaches = self.__num_reaches(name)
+            costs.append({
+                "index": index,
+                "continent": name,
+                "reaches": reaches,
+                "files": files,
+                "bytes": sizes,
+                "cost": sum(sizes.values()) + self.COST_PER_FILE * sum(files.values()) + self.COST_PER_REACH * reaches
+            })
+        return costs
+
+    def __scan(self, directory):
+        """Return number of files and bytes for each continent identifier.
+
+        Files belong to the continent identifier of the first digit of their
+        name, the first digit of the reach identifier.
+
+        Parameters
+        ----------
+        directory: Path
+            directory to scan recursively
+        """
+
+        scan = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if not name.endswith(".nc") or not name[0].isdigit(): continue
+                num_files, size = scan.get(int(name[0]), (0, 0))
+                scan[int(name[0])] = (num_files + 1, size + os.stat(os.path.join(root, name)).st_size)
+        return scan
+
+    def __num_reaches(self, continent):
+        """Return number of reaches in a continent's priors SoS (0 if missing).
+
+        Parameters
+        ----------
+        continent: str
+            continent name
+        """
+
+        priors_file = Path(self.priors(continent))
+        if not priors_file.exists():
+            self.logger.warning(f"No priors SoS for {continent}: {priors_file}.")
+            return 0
+        with Dataset(priors_file, 'r') as ds:
+            return ds.dimensions["num_reaches"].size
+
+    def plan(self, num_jobs):
+        """Return plan of array jobs for continents.
+
+        The plan holds a list of tasks for each array job, the merges of
+        sharded continents and the estimated costs. A task is a continent
+        index with its shard and number of shards (0 if not sharded).
+
+        Parameters
+        ----------
+        num_jobs: int
+            number of array jobs to plan
+        """
+
+        if num_jobs < 1: raise ValueError(f"Cannot plan {num_jobs} jobs.")
+        costs = self.estimate()
+        target = max(sum(cost["cost"] for cost in costs) / num_jobs, 1)
+
+        # Split continents that cost more than an even share into shards
+        items, merges = [], []
+        for cost in costs:
+            shards = min(math.ceil(cost["cost"] / target), max(cost["reaches"], 1))
+            if shards <= 1:
+                items.append((cost["cost"], { "index": cost["index"], "continent": cost["continent"], "shard": 0, "shards": 0 }))
+                continue
+            merges.append({ "index": cost["index"], "continent": cost["continent"], "shards": shards })
+            for shard in range(shards):
+                items.append((cost["cost"] / shards, { "index": cost["index"], "continent": cost["continent"], "shard": shard, "shards": shards }))
+
+        # Pack largest items first onto the job with the least work
+        jobs = [ (0.0, job, []) for job in range(num_jobs) ]
+        for item_cost, task in sorted(items, key=lambda item: -item[0]):
+            load, job, tasks = heapq.heappop(jobs)
+            tasks.append(task)
+            heapq.heappush(jobs, (load + item_cost, job, tasks))
+        jobs = [ sorted(tasks, key=lambda task: (task["index"], task["shard"])) for _, _, tasks in sorted(jobs, key=lambda job: job[1]) if tasks ]
+
+        return { "jobs": jobs, "merges": merges, "costs": costs }
+
+    def write(self, plan_file, num_jobs):
+        """Write plan of array jobs to a JSON file and return the plan.
+
+        Parameters
+        ----------
+        plan_file: Path
+            path to plan JSON file
+        num_jobs: int
+            number of array jobs to plan
+        """
+
+        plan = self.plan(num_jobs)
+        with open(plan_file, 'w') as jf:
+            json.dump(plan, jf, indent=2)
+        self.logger.info(f"Planned {len(plan['jobs'])} jobs and {len(plan['merges'])} merges in {plan_file}.")
+        return plan
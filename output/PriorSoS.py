@@ -0,0 +1,203 @@
+# Standard imports
+import copy
+from pathlib import Path
+
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+
+# Local imports
+from output.ReachIndex import ReachIndex
+
+class PriorSoS:
+    """Class that reads a continent's priors SoS once and shares the result.
+
+    Identifiers, coordinates and global attributes are read when the object
+    is created; the NetCDF handle stays open for consumers that need other
+    groups (variable attributes, river names, priors "model" group) until
+    close() is called.
+
+    Attributes
+    ----------
+    path: Path
+        path to priors SoS file
+    global_atts: dict
+        global attributes of the priors SoS
+    index: ReachIndex
+        reach and node row lookups derived from identifiers
+    node_rows: nd.array
+        rows of the selected nodes in the priors SoS (None if not a selection)
+    reach_ids: nd.array
+        array of SoS reach identifiers
+    reach_rows: nd.array
+        rows of the selected reaches in the priors SoS (None if not a selection)
+    reach_x: nd.array
+        array of reach longitudes (None if not present)
+    reach_y: nd.array
+        array of reach latitudes (None if not present)
+    node_reach_ids: nd.array
+        array of SoS reach identifiers on the node-level
+    node_ids: nd.array
+        array of SoS node identifiers
+    node_x: nd.array
+        array of node longitudes
+    node_y: nd.array
+        array of node latitudes
+    SIDECAR_SUFFIX: str
+        suffix appended to priors file name for the cached index
+
+    Methods
+    -------
+    close()
+        close the priors SoS NetCDF handle
+    dataset
+        return the open priors SoS NetCDF handle
+    product_version
+        return product version of the priors SoS
+    read(var)
+        return variable data of the selected reach or node rows
+    select(reach_rows)
+        return priors SoS restricted to reach rows and their nodes
+    """
+
+    SIDECAR_SUFFIX = ".index.npz"
+
+    def __init__(self, sos_dir, continent, suffix, logger=None, cache_dir=None):
+        """
+        Parameters
+        ----------
+        sos_dir: Path
+            path to directory that contains priors SoS files
+        continent: str
+            continent letter identifier
+        suffix: str
+            string suffix of priors SoS file name
+        logger: logging.Logger
+            logger to log statements with
+        cache_dir: Path
+            directory to store the index sidecar in (default: sos_dir)
+        """
+
+        self.path = Path(sos_dir) / f"{continent}_{suffix}.nc"
+        self.logger = logger
+        self.sidecar = Path(cache_dir or sos_dir) / f"{self.path.name}{self.SIDECAR_SUFFIX}"
+        self._dataset = None
+
+        ds = self.dataset
+        self.global_atts = ds.__dict__
+        self.reach_ids = np.ma.getdata(ds["reaches"]["reach_id"][:])
+        self.reach_x = self.__read_optional(ds["reaches"], "x")
+        self.reach_y = self.__read_optional(ds["reaches"], "y")
+        self.node_reach_ids = np.ma.getdata(ds["nodes"]["reach_id"][:])
+        self.node_x = np.ma.getdata(ds["nodes"]["x"][:])
+        self.node_y = np.ma.getdata(ds["nodes"]["y"][:])
+        self.node_ids = self.__read_raw(ds["nodes"], "node_id")
+        self.reach_rows = None
+        self.node_rows = None
+
+        self.index = self.__load_index()
+
+    @property
+    def dataset(self):
+        """Return open NetCDF handle on the priors SoS."""
+
+        if self._dataset is None or not self._dataset.isopen():
+            self._dataset = Dataset(self.path, 'r')
+        return self._dataset
+
+    @property
+    def product_version(self):
+        """Return product version of the priors SoS."""
+
+        return self.global_atts["product_version"]
+
+    def close(self):
+        """Close the priors SoS NetCDF handle."""
+
+        if self._dataset is not None and self._dataset.isopen():
+            self._dataset.close()
+        self._dataset = None
+
+    def select(self, reach_rows, orphan_nodes=False):
+        """Return priors SoS restricted to reach rows and the nodes of those reaches.
+
+        The selection shares the NetCDF handle and global attributes. Its
+        identifiers and index only cover the selected rows, which are kept
+        in ascending order.
+
+        Parameters
+        ----------
+        reach_rows: nd.array
+            rows of reaches in the priors SoS
+        orphan_nodes: bool
+            also select the nodes whose reach is not in the priors SoS
+        """
+
+        reach_rows = np.unique(np.asarray(reach_rows, dtype=np.int64))
+        node_rows = [ self.index.reach_node_rows(None, row) for row in reach_rows ]
+        if orphan_nodes: node_rows.append(np.flatnonzero(~np.isin(self.node_reach_ids, self.reach_ids)))
+        node_rows = np.sort(np.concatenate(node_rows)) if node_rows else np.array([], dtype=np.int64)
+
+        selection = copy.copy(self)
+        selection.reach_rows = reach_rows
+        selection.node_rows = node_rows
+        selection.reach_ids = self.reach_ids[reach_rows]
+        selection.reach_x = self.reach_x[reach_rows] if self.reach_x is not None else None
+        selection.reach_y = self.reach_y[reach_rows] if self.reach_y is not None else None
+        selection.node_reach_ids = self.node_reach_ids[node_rows]
+        selection.node_ids = self.node_ids[node_rows]
+        selection.node_x = self.node_x[node_rows]
+        selection.node_y = self.node_y[node_rows]
+        selection.index = ReachIndex(selection.reach_ids, selection.node_reach_ids, selection.node_ids)
+        return selection
+
+    def read(self, var):
+        """Return variable data of the selected reach or node rows.
+
+        Variables that are not indexed by reach or node are read in full.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            variable of the priors SoS
+        """
+
+        dims = var.dimensions
+        if self.reach_rows is not None and dims and dims[0] == "num_reaches": return var[self.reach_rows]
+        if self.node_rows is not None and dims and dims[0] == "num_nodes": return var[self.node_rows]
+        return var[:]
+
+    def __read_optional(self, grp, name):
+        """Return variable data or None if variable is not present."""
+
+        if name not in grp.variables: return None
+        return np.ma.getdata(grp[name][:])
+
+    def __read_raw(self, grp, name):
+        """Return variable data without masking.
+
+        netCDF4 masks values outside of valid_min/valid_max and the range
+        stored on the priors node_id variable does not hold the node
+        identifiers, so every node comes back masked. Identifiers never hold
+        fill values so the raw integers are read instead.
+        """
+
+        var = grp[name]
+        var.set_auto_mask(False)
+        return var[:]
+
+    def __load_index(self):
+        """Load ReachIndex from sidecar or derive it and write the sidecar."""
+
+        stat = self.path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        index = ReachIndex.load(self.sidecar, key, self.reach_ids,
+                                self.node_reach_ids, self.node_ids)
+        if index is not None: return index
+
+        index = ReachIndex(self.reach_ids, self.node_reach_ids, self.node_ids)
+        try:
+            index.save(self.sidecar, key)
+        except OSError as error:
+            if self.logger: self.logger.warning(f"Could not write index sidecar {self.sidecar}: {error}")
+        return index
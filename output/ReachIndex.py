@@ -0,0 +1,182 @@
+# Standard imports
+import os
+
+# Third-party imports
+import numpy as np
+
+class ReachIndex:
+    """Class that maps SoS reach and node identifiers to their rows.
+
+    The index is derived from the reach and node identifiers of a priors SoS
+    and may be persisted to an .npz sidecar so it is only computed once per
+    priors file.
+
+    Attributes
+    ----------
+    reach_ids: nd.array
+        array of SoS reach identifiers
+    node_reach_ids: nd.array
+        array of SoS reach identifiers on the node-level
+    node_ids: nd.array
+        array of SoS node identifiers
+    reach_order: nd.array
+        rows of reach_ids in ascending identifier order
+    node_order: nd.array
+        rows of node_ids in ascending identifier order
+    node_reach_order: nd.array
+        node rows grouped by reach identifier (stable)
+    node_start: nd.array
+        start offset into node_reach_order for each reach row
+    node_end: nd.array
+        end offset into node_reach_order for each reach row
+
+    Methods
+    -------
+    reach_rows(reach_ids)
+        return reach rows for an array of reach identifiers
+    node_rows(node_ids)
+        return node rows for an array of node identifiers
+    reach_node_rows(reach_id)
+        return the node rows that belong to a reach
+    save(sidecar, key)
+        write derived indexes to an .npz sidecar
+    load(sidecar, key, reach_ids, node_reach_ids, node_ids)
+        load derived indexes from an .npz sidecar
+    """
+
+    INDEXES = ("reach_order", "node_order", "node_reach_order", "node_start",
+               "node_end")
+
+    def __init__(self, reach_ids, node_reach_ids, node_ids, indexes=None):
+        """
+        Parameters
+        ----------
+        reach_ids: nd.array
+            array of SoS reach identifiers
+        node_reach_ids: nd.array
+            array of SoS reach identifiers on the node-level
+        node_ids: nd.array
+            array of SoS node identifiers
+        indexes: dict
+            previously derived indexes (computed when not provided)
+        """
+
+        self.reach_ids = reach_ids
+        self.node_reach_ids = node_reach_ids
+        self.node_ids = node_ids
+        if indexes is None: indexes = self.__derive()
+        for name in self.INDEXES:
+            setattr(self, name, indexes[name])
+
+    def __derive(self):
+        """Compute and return derived indexes from identifier arrays."""
+
+        node_reach_order = np.argsort(self.node_reach_ids, kind="stable")
+        sorted_nrids = self.node_reach_ids[node_reach_order]
+        return {
+            "reach_order": np.argsort(self.reach_ids, kind="stable"),
+            "node_order": np.argsort(self.node_ids, kind="stable"),
+            "node_reach_order": node_reach_order,
+            "node_start": np.searchsorted(sorted_nrids, self.reach_ids, side="left"),
+            "node_end": np.searchsorted(sorted_nrids, self.reach_ids, side="right")
+        }
+
+    @staticmethod
+    def __lookup(ids, order, values):
+        """Return rows of values for ids using sorted order, -1 if missing."""
+
+        values = np.atleast_1d(np.asarray(values))
+        if ids.shape[0] == 0: return np.full(values.shape, -1, dtype=np.int64)
+        sorted_ids = ids[order]
+        pos = np.searchsorted(sorted_ids, values).clip(0, ids.shape[0] - 1)
+        rows = order[pos].astype(np.int64)
+        rows[sorted_ids[pos] != values] = -1
+        return rows
+
+    def reach_rows(self, reach_ids):
+        """Return reach rows for reach identifiers (-1 if not in the SoS).
+
+        Parameters
+        ----------
+        reach_ids: array_like
+            reach identifiers to locate
+        """
+
+        return self.__lookup(self.reach_ids, self.reach_order, reach_ids)
+
+    def node_rows(self, node_ids):
+        """Return node rows for node identifiers (-1 if not in the SoS).
+
+        Parameters
+        ----------
+        node_ids: array_like
+            node identifiers to locate
+        """
+
+        return self.__lookup(self.node_ids, self.node_order, node_ids)
+
+    def reach_node_rows(self, reach_id, row=None):
+        """Return the ascending node rows that belong to a reach.
+
+        Equivalent to np.where(node_reach_ids == reach_id)[0].
+
+        Parameters
+        ----------
+        reach_id: int
+            reach identifier
+        row: int
+            reach row if already known
+        """
+
+        if row is None: row = self.reach_rows(reach_id)[0]
+        if row < 0: return np.array([], dtype=np.int64)
+        return self.node_reach_order[self.node_start[row]:self.node_end[row]]
+
+    def save(self, sidecar, key):
+        """Write derived indexes to an .npz sidecar.
+
+        Parameters
+        ----------
+        sidecar: Path
+            path to .npz sidecar file
+        key: tuple
+            (mtime_ns, size) of the priors file the index was derived from
+        """
+
+        tmp = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, key=np.array(key, dtype=np.int64),
+                 **{ name: getattr(self, name) for name in self.INDEXES })
+        os.replace(tmp, sidecar)
+
+    @classmethod
+    def load(cls, sidecar, key, reach_ids, node_reach_ids, node_ids):
+        """Load derived indexes from an .npz sidecar.
+
+        Returns None if the sidecar is missing, stale or does not match the
+        identifier arrays.
+
+        Parameters
+        ----------
+        sidecar: Path
+            path to .npz sidecar file
+        key: tuple
+            (mtime_ns, size) of the priors file
+        reach_ids: nd.array
+            array of SoS reach identifiers
+        node_reach_ids: nd.array
+            array of SoS reach identifiers on the node-level
+        node_ids: nd.array
+            array of SoS node identifiers
+        """
+
+        if not sidecar.exists(): return None
+        try:
+            with np.load(sidecar) as npz:
+                if tuple(npz["key"]) != tuple(key): return None
+                indexes = { name: npz[name] for name in cls.INDEXES }
+        except (OSError, KeyError, ValueError):
+            return None
+        if indexes["reach_order"].shape[0] != reach_ids.shape[0] \
+            or indexes["node_order"].shape[0] != node_ids.shape[0]:
+            return None
+        return cls(reach_ids, node_reach_ids, node_ids, indexes)
@@ -0,0 +1,95 @@
+"""Registry module: Maps command line module names to AbstractModule classes.
+
+Module classes are imported only when they are requested so a run only pays
+for the modules it appends. Modules that live outside of this package can
+register under the "confluence_output.modules" entry point group with the
+command line name as the entry point name, for example:
+
+    [project.entry-points."confluence_output.modules"]
+    mymodule = "mypackage.MyModule:MyModule"
+
+Modules registered through entry points read from the directory named by
+their DIR_KEY class attribute (default "input").
+
+Class
+-----
+UnknownModuleError
+    KeyError raised for a command line name that is not registered
+
+Functions
+---------
+create_module(name, context)
+    create and return an AbstractModule object for a command line name
+get_module_class(name)
+    import and return the AbstractModule class for a command line name
+"""
+
+# Standard imports
+from importlib import import_module
+from importlib.metadata import entry_points
+
+ENTRY_POINT_GROUP = "confluence_output.modules"
+
+class UnknownModuleError(KeyError):
+    """KeyError raised for a command line name that is not registered."""
+
+# Command line name: (module path, class name, directory key)
+MODULES = {
+    "hivdi": ("output.modules.Hivdi", "Hivdi", "flpe"),
+    "metroman": ("output.modules.Metroman", "Metroman", "flpe"),
+    "moi": ("output.modules.Moi", "Moi", "moi"),
+    "momma": ("output.modules.Momma", "Momma", "flpe"),
+    "neobam": ("output.modules.Neobam", "Neobam", "flpe"),
+    "offline": ("output.modules.Offline", "Offline", "offline"),
+    "postdiagnostics": ("output.modules.Postdiagnostics", "Postdiagnostics", "postdiagnostics"),
+    "prediagnostics": ("output.modules.Prediagnostics", "Prediagnostics", "prediagnostics"),
+    "priors": ("output.modules.Priors", "Priors", "input"),
+    "sad": ("output.modules.Sad", "Sad", "flpe"),
+    "sic4dvar": ("output.modules.Sic4dvar", "Sic4dvar", "flpe"),
+    "swot": ("output.modules.Swot", "Swot", "input"),
+    "validation": ("output.modules.Validation", "Validation", "validation")
+}
+
+def get_module_class(name):
+    """Import and return the AbstractModule class and its directory key.
+
+    Parameters
+    ----------
+    name: str
+        command line name of module
+
+    Returns
+    -------
+    tuple
+        (AbstractModule subclass, directory key)
+
+    Raises
+    ------
+    UnknownModuleError
+        if the name is not registered
+    """
+
+    if name in MODULES:
+        module_path, class_name, dir_key = MODULES[name]
+        return getattr(import_module(module_path), class_name), dir_key
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name == name:
+            module_class = entry_point.load()
+            return module_class, getattr(module_class, "DIR_KEY", "input")
+
+    raise UnknownModuleError(f"Module '{name}' is not registered.")
+
+def create_module(name, context):
+    """Create and return an AbstractModule object for a command line name.
+
+    Parameters
+    ----------
+    name: str
+        command line name of module
+    context: ModuleContext
+        state shared by every module in an Output run
+    """
+
+    module_class, dir_key = get_module_class(name)
+    return module_class.from_context(context, context.dirs[dir_key])
@@ -16,6 +16,8 @@ class Upload:
         references SWORD of Science S3 bucket
     sos_file: Path
         path to new SoS file to upload
+    prior_sos: PriorSoS
+        shared handle on the priors SoS the results were created from
     VERS_LENGTH: int
         number of integers in SoS identifier
 
@@ -29,7 +31,7 @@ class Upload:
     VERS_LENGTH = 4
 
     def __init__(self, sos_file, sos_bucket, podaac_upload, podaac_bucket, \
-                 continent, run_date, run_type, logger):
+                 continent, run_date, run_type, logger, prior_sos=None):
         """
         Parameters
         ----------
@@ -37,6 +39,8 @@ class Upload:
             path to new SoS file to upload
         logger: Logger
             logger to use for logging state
+        prior_sos: PriorSoS
+            shared handle on the priors SoS (results file is read if None)
         """
 
         self.sos_file = sos_file
@@ -47,6 +51,7 @@ class Upload:
         self.run_date = run_date
         self.run_type = run_type
         self.logger = logger
+        self.prior_sos = prior_sos
 
     def upload_data(self, output_dir, val_dir, run_type, modules):
         """Uploads SoS result file to confluence-sos S3 bucket.
@@ -62,9 +67,12 @@ class Upload:
         """
 
         # Get SoS version
-        sos_ds = Dataset(output_dir / self.sos_file, 'r')
-        vers = sos_ds.product_version
-        sos_ds.close()
+        if self.prior_sos is not None:
+            vers = self.prior_sos.product_version
+        else:
+            sos_ds = Dataset(output_dir / self.sos_file, 'r')
+            vers = sos_ds.product_version
+            sos_ds.close()
         padding = ['0'] * (self.VERS_LENGTH - len(vers))
         vers = f"{''.join(padding)}{vers}"
         
@@ -1,20 +1,41 @@
 # Standard imports
 from abc import ABCMeta, abstractmethod
+import glob
+from pathlib import Path
 
 # Third-party imports
+from netCDF4 import Dataset, default_fillvals
 import numpy as np
 
+# Local imports
+from output.MetadataPlan import MetadataPlan
+from output.modules.SparseRows import SparseRows
+
 class AbstractModule(metaclass=ABCMeta):
     """Class that represents a Confluence Module that has result data to store.
     
     Attributes
     ----------
+    cache: ExtractCache
+        extraction cache shared by modules (None when not caching)
+    CACHE_STATE: tuple
+        names of attributes set by get_module_data that are cached with its data
     cont_ids: list
         list of continent identifiers
     FILL: dict
         dictionary of various NetCDF variable fill values
     input_dir: Path
         path to input directory
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
+    metadata: MetadataPlan
+        compiled SoS metadata (None when not created from a context)
+    options: dict
+        command line output options (empty when not created from a context)
+    reach_index: ReachIndex
+        reach and node row lookups (None when not created from a context)
+    reach_rows: nd.array
+        rows of the reaches in the results file (None when every reach is processed)
     sos_nrids: nd.array
         array of SOS reach identifiers on the node-level
     sos_nids: nd.array
@@ -24,10 +45,16 @@ class AbstractModule(metaclass=ABCMeta):
         path to the current SoS
     sos_new: Path
             path to new SOS file
+    stream_block: int
+        number of reaches held in memory when streaming (0 when not streaming)
+    streams: bool
+        indicates the module implements the stream_module_data hook
     vlen_f: VLType
         variable length float data type for NetCDF ragged arrays
     vlen_i: VLType
         variable length int data type for NEtCDF ragged arrays
+    WRITE_SIZE: int
+        number of values converted and written to a variable at a time
     
     Methods
     -------
@@ -37,8 +64,55 @@ class AbstractModule(metaclass=ABCMeta):
         append module data to the new version of the SoS result file.
     create_data_dict(nt=None)
         creates and returns module data dictionary.
+    create_spec_dict(specs, num_rows=None)
+        create and return data dictionary of VariableSpec variables.
+    create_spec_vars(specs, grp, data_dict, metadata_json)
+        create VariableSpec variables with their attributes in the SoS.
+    create_var(grp, name, type, dims, attrs, metadata=None)
+        create NetCDF variable with input file and metadata attributes.
+    create_var_nt(grp, name, vlen, dims, attrs, fill=0, metadata=None)
+        create NetCDF variable length data variable with input file and metadata attributes.
+    from_context(context, input_dir)
+        create and return module from a ModuleContext.
+    get_cached_module_data()
+        return module data from the extraction cache or extract and cache it.
     get_module_data(nt=None)
         retrieve module results from NetCDF files.
+    get_node_index(node_id)
+        return the SoS node row of a node identifier.
+    get_node_indexes(reach_id, index=None)
+        return the SoS node rows that belong to a reach.
+    get_spec_attrs(specs, nc_file, data_dict)
+        store input file attributes of VariableSpec variables.
+    get_spec_data(specs, in_dir, suffix, skip_errors=False)
+        extract VariableSpec variables from per reach input files.
+    get_vltype(sos_ds, dtype, name)
+        return variable length data type, creating it if needed.
+    input_files()
+        return sorted paths of the input files the module reads.
+    plan_names(keys, names)
+        return names of the variables under keys that will be written.
+    plan_specs(specs)
+        return VariableSpec objects of variables that will be written.
+    set_context(context)
+        store shared lookups and options of a ModuleContext.
+    stream_module_data(metadata_json)
+        hook of modules that extract and append module data in blocks of
+        stream_block reaches (not defined by modules that cannot stream).
+    stream_spec_data(specs, in_dir, suffix, group, metadata_json, skip_errors=False)
+        extract and write VariableSpec variables in blocks of reaches.
+    read_spec_vars(specs, ds, index, data_dict)
+        read VariableSpec variables of an input file into a reach row.
+    write_row_runs(var, type, rows, data)
+        write rows of module data to rows of a NetCDF variable.
+    read_var(var, fill, index=slice(None), out=None)
+        read variable data without masking and replace missing values.
+    write_rows(var, type, data, start=0)
+        write rows of module data to a NetCDF variable.
+    write_spec_rows(specs, variables, data_dict, start=0)
+        write rows of VariableSpec variables to the SoS.
+    write_spec_vars(specs, grp, data_dict, metadata_json)
+        write VariableSpec variables and their metadata to the SoS.
     write_var(q_grp, name, dims, sv_dict)
         create NetCDF variable and write module data to it
     """
@@ -46,8 +120,15 @@ class AbstractModule(metaclass=ABCMeta):
     FILL = {
         "f8": -999999999999.0,
         "i4": -999,
+        "i1": -127,
         "S1": "x"
     }
+
+    CACHE_STATE = ()
+
+    INPUT_FILES = ("{cont_ids}*.nc",)
+
+    WRITE_SIZE = 1 << 20
     
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f=None, vlen_i=None, 
                  vlen_s=None, rids=None, nrids=None, nids=None):
@@ -87,6 +168,44 @@ class AbstractModule(metaclass=ABCMeta):
         self.sos_rids = rids
         self.sos_nrids = nrids
         self.sos_nids = nids
+        self.reach_index = None
+        self.reach_rows = None
+        self.options = {}
+        self.metadata = None
+        self.cache = None
+
+    @classmethod
+    def from_context(cls, context, input_dir):
+        """Create and return module from a ModuleContext.
+
+        Parameters
+        ----------
+        context: ModuleContext
+            state shared by every module in an Output run
+        input_dir: Path
+            path to input directory
+        """
+
+        module = cls(context.cont_ids, input_dir, context.sos_new, context.logger,
+                     context.vlen_f, context.vlen_i, context.vlen_s, context.sos_rids,
+                     context.sos_nrids, context.sos_nids)
+        return module.set_context(context)
+
+    def set_context(self, context):
+        """Store shared lookups and options of a ModuleContext and return self.
+
+        Parameters
+        ----------
+        context: ModuleContext
+            state shared by every module in an Output run
+        """
+
+        self.reach_index = context.reach_index
+        self.reach_rows = context.reach_rows
+        self.options = context.options
+        self.metadata = context.metadata
+        self.cache = context.cache
+        return self
     
     @classmethod
     def __subclasshook__(cls, subclass):
@@ -98,12 +217,74 @@ class AbstractModule(metaclass=ABCMeta):
                 callable(subclass.append_module_data) or
                 NotImplemented)
         
+    @property
+    def stream_block(self):
+        """Return number of reaches held in memory when streaming."""
+
+        return self.options.get("streamblock", 0)
+
+    @property
+    def streams(self):
+        """Return True if the module implements the stream_module_data hook."""
+
+        return callable(getattr(self, "stream_module_data", None))
+
     def append_module(self, metadata_json):
-        """Append module results to the SoS."""
+        """Append module results to the SoS.
         
-        data_dict = self.get_module_data()
-        self.append_module_data(data_dict, metadata_json)
+        Modules are written in blocks of stream_block reaches with their
+        stream_module_data hook when the "streamblock" option is set and
+        otherwise reuse cached data when there is an extraction cache.
+
+        Raises
+        ------
+        ValueError
+            if the "streamblock" option is set and the module cannot stream
+        """
         
+        if self.stream_block:
+            if not self.streams:
+                raise ValueError(f"{self.__class__.__name__} cannot be written in blocks of reaches.")
+            self.stream_module_data(metadata_json)
+            return
+        data_dict = self.get_cached_module_data()
+        self.append_module_data(data_dict, metadata_json)
+
+    def get_cached_module_data(self):
+        """Return module data from the extraction cache or extract and cache it.
+
+        The cache is keyed by the module's input files, the SoS reach and
+        node identifiers, the output options and the selected variables.
+        Only the input files the module reads are checked for changes.
+        """
+
+        if self.cache is None: return self.get_module_data()
+
+        name = self.__class__.__name__.lower()
+        extras = [ name, self.cont_ids, sorted((option, value) for option, value in self.options.items() if option not in ("cachedir", "workers")),
+                   sorted(self.metadata.variables) if self.metadata is not None else None ]
+        extras += [ np.ascontiguousarray(ids).tobytes() for ids in (self.sos_rids, self.sos_nids) if ids is not None ]
+        key = self.cache.fingerprint(self.input_dir, self.input_files(), extras)
+        cached = self.cache.load(name, key)
+        if cached is not None:
+            data_dict, state = cached
+            for attr, value in state.items(): setattr(self, attr, value)
+            self.logger.info(f"Reusing cached {name} data from {self.cache.path(name)}.")
+            return data_dict
+
+        data_dict = self.get_module_data()
+        self.cache.save(name, key, data_dict, { attr: getattr(self, attr) for attr in self.CACHE_STATE })
+        return data_dict
+
+    def input_files(self):
+        """Return sorted paths of the input files the module reads.
+
+        Files match the INPUT_FILES glob patterns under input_dir.
+        """
+
+        patterns = [ pattern.format(cont_ids=self.cont_ids) for pattern in self.INPUT_FILES ]
+        return sorted({ Path(in_file) for pattern in patterns for in_file in glob.glob(f"{self.input_dir}/{pattern}") })
+
     @abstractmethod
     def get_module_data(self):
         """Retrieve module results from NetCDF files."""
@@ -128,7 +309,7 @@ class AbstractModule(metaclass=ABCMeta):
         
         raise NotImplementedError
     
-    def write_var(self, grp, name, type, dims, data_dict):
+    def write_var(self, grp, name, type, dims, data_dict, metadata=None):
         """Create NetCDF variable and write module data to it.
 
         Parameters
@@ -143,17 +324,159 @@ class AbstractModule(metaclass=ABCMeta):
             tuple of NetCDF4 dimensions that matches shape of var data
         data_dict: dict
             dictionary of result data
+        metadata: dict
+            dictionary of SoS metadata attributes of the variable
+        """
+
+        var = self.create_var(grp, name, type, dims, data_dict["attrs"][name], metadata)
+        self.write_rows(var, type, data_dict[name])
+        return var
+
+    def create_var(self, grp, name, type, dims, attrs, metadata=None):
+        """Create NetCDF variable with input file and metadata attributes.
+
+        Metadata attributes take precedence over input file attributes and
+        both are set with one call.
+
+        Parameters
+        ----------
+        grp: netCDF4._netCDF4.Group
+            dicharge NetCDF4 group to create variable in
+        name: str
+            name of variable
+        type: str
+            string type of NetCDF variable
+        dims: tuple
+            tuple of NetCDF4 dimensions
+        attrs: dict
+            dictionary of input file variable attributes
+        metadata: dict
+            dictionary of SoS metadata attributes of the variable
         """
 
         var = grp.createVariable(name, type, dims, fill_value=self.FILL[type], compression="zlib")
-        if data_dict["attrs"][name]: var.setncatts(data_dict["attrs"][name])
-        if type == "f8" or type == "i4":
-            var[:] = np.nan_to_num(data_dict[name], copy=True, nan=self.FILL[type])
-        else:
-            var[:] = data_dict[name]
+        attrs = { **(attrs or {}), **MetadataPlan.typed_attrs(var, metadata or {}) }
+        if attrs: var.setncatts(attrs)
         return var
+
+    def write_rows(self, var, type, data, start=0):
+        """Write rows of module data to a NetCDF variable.
+
+        Rows are written in blocks of about WRITE_SIZE values so that fill
+        conversion and the NetCDF library only copy one block at a time.
+        Fixed size blocks that only hold fill values are not written as the
+        variable's unwritten chunks already read as its _FillValue.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            variable to write to
+        type: str or netCDF4._netCDF4.VLType
+            string type of NetCDF variable, VariableSpec type or variable
+            length data type
+        data: nd.array or SparseRows
+            rows of module data
+        start: int
+            first row of variable to write to
+        """
+
+        if type in self.FILL:
+            self.__write_fixed(var, type, np.asarray(data), start)
+        else:
+            if isinstance(data, SparseRows): data = data.to_array()
+            self.__write_vlen(var, data, start)
+
+    def write_row_runs(self, var, type, rows, data):
+        """Write rows of module data to rows of a NetCDF variable.
+
+        Rows are sorted and written as runs of consecutive rows so a block
+        of nodes is written in one slice when its rows are consecutive.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            variable to write to
+        type: str or netCDF4._netCDF4.VLType
+            string type of NetCDF variable or variable length data type
+        rows: nd.array
+            row of the variable to write each row of data to
+        data: nd.array
+            rows of module data
+        """
+
+        if rows.shape[0] == 0: return
+        order = np.argsort(rows, kind="stable")
+        rows, data = rows[order], data[order]
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        for start, stop in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [rows.shape[0]]))):
+            self.write_rows(var, type, data[start:stop], rows[start])
+
+    def __write_fixed(self, var, type, data, start):
+        """Write fixed size rows in blocks converting NaN to fill in a buffer.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            variable to write to
+        type: str
+            string type of NetCDF variable
+        data: nd.array
+            rows of module data
+        start: int
+            first row of variable to write to
+        """
+
+        row_size = max(1, int(np.prod(data.shape[1:])))
+        num_rows = max(1, self.WRITE_SIZE // row_size)
+        convert = type in ("f8", "i4") and np.issubdtype(data.dtype, np.floating)
+        buffer = np.empty((min(num_rows, data.shape[0]),) + data.shape[1:], dtype=data.dtype) if convert else None
+        # Unwritten chunks only read as fill if input file attributes kept the _FillValue
+        skip_fill = type in ("f8", "i4", "i1") and var.__dict__.get("_FillValue") == self.FILL[type]
+        for i in range(0, data.shape[0], num_rows):
+            block = data[i:i + num_rows]
+            if skip_fill and self.__is_fill(block, type): continue
+            if convert:
+                block = buffer[:block.shape[0]]
+                np.copyto(block, data[i:i + num_rows])
+                np.nan_to_num(block, copy=False, nan=self.FILL[type])
+            var[start + i:start + i + block.shape[0]] = block
+
+    def __write_vlen(self, var, data, start):
+        """Write variable length rows in slices of about WRITE_SIZE values.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            variable to write to
+        data: nd.array
+            object array of rows of module data
+        start: int
+            first row of variable to write to
+        """
+
+        sizes = np.fromiter((np.size(row) + 1 for row in data), dtype=np.int64, count=len(data))
+        ends = np.searchsorted(np.cumsum(sizes), np.arange(self.WRITE_SIZE, sizes.sum(), self.WRITE_SIZE), side="right")
+        bounds = np.unique(np.concatenate(([0], ends, [len(data)])))
+        for i, j in zip(bounds[:-1], bounds[1:]):
+            var[start + i:start + j] = data[i:j]
+
+    def __is_fill(self, data, type):
+        """Return True if data only holds NaN or the fill value of type.
+
+        Parameters
+        ----------
+        data: nd.array
+            rows of module data
+        type: str
+            string type of NetCDF variable
+        """
+
+        data = np.asarray(data)
+        if np.issubdtype(data.dtype, np.floating):
+            return bool((np.isnan(data) | (data == self.FILL[type])).all())
+        return bool((data == self.FILL[type]).all())
     
-    def write_var_nt(self, grp, name, vlen, dims, data_dict, fill=0):
+    def write_var_nt(self, grp, name, vlen, dims, data_dict, fill=0, metadata=None):
         """Create NetCDF variable length data variable and write module data.
         
         Parameters
@@ -168,24 +491,514 @@ class AbstractModule(metaclass=ABCMeta):
             tuple of NetCDF4 dimensions that matches shape of var data
         data_dict: dict
             dictionary of result data
+        fill: float
+            missing value (0 to use the input file fill value, -1 for none)
+        metadata: dict
+            dictionary of SoS metadata attributes of the variable
         """
         
+        var = self.create_var_nt(grp, name, vlen, dims, data_dict["attrs"][name], fill, metadata)
+        self.write_rows(var, vlen, data_dict[name])
+        return var
+
+    def create_var_nt(self, grp, name, vlen, dims, attrs, fill=0, metadata=None):
+        """Create NetCDF variable length data variable with input file and metadata attributes.
+
+        The input file _FillValue becomes the missing_value. Metadata
+        attributes take precedence and all attributes are set with one call.
+
+        Parameters
+        ----------
+        grp: netCDF4._netCDF4.Group
+            dicharge NetCDF4 group to create variable in
+        name: str
+            name of variable
+        vlen: netCDF4._netCDF4.VLType
+            variable length data type
+        dims: tuple
+            tuple of NetCDF4 dimensions
+        attrs: dict
+            dictionary of input file variable attributes
+        fill: float
+            missing value (0 to use the input file fill value, -1 for none)
+        metadata: dict
+            dictionary of SoS metadata attributes of the variable
+        """
+
         var = grp.createVariable(name, vlen, dims)
-        if data_dict["attrs"][name]:
+        merged = {}
+        if attrs:
             if fill:
-                if fill != -1: var.missing_value = fill
+                if fill != -1: merged["missing_value"] = fill
             else:
-                var.missing_value = data_dict["attrs"][name]["_FillValue"]
-            data_dict["attrs"][name].pop("_FillValue", None)
-            var.setncatts(data_dict["attrs"][name])
-        var[:] = data_dict[name]
+                merged["missing_value"] = attrs["_FillValue"]
+            merged.update(attrs)
+            merged.pop("_FillValue", None)
+        if metadata: merged.update(MetadataPlan.typed_attrs(var, metadata))
+        if merged: var.setncatts(merged)
         return var
         
+    def create_spec_dict(self, specs, num_rows=None):
+        """Create and return data dictionary of VariableSpec variables.
+
+        Ragged array variables are SparseRows of an array of the f8 fill
+        value and the others hold NaN.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        num_rows: int
+            number of reach rows (defaults to the number of SoS reaches)
+        """
+
+        if num_rows is None: num_rows = self.sos_rids.shape[0]
+        data_dict = {}
+        for spec in self.plan_specs(specs):
+            group_dict, name = self.__spec_group(data_dict, spec.name)
+            if spec.type == "vlen_f":
+                group_dict[name] = SparseRows(num_rows, np.array([self.FILL["f8"]]))
+            else:
+                group_dict[name] = np.full(num_rows, np.nan, dtype=np.float64)
+            group_dict["attrs"][name] = {}
+        return data_dict
+
+    def get_spec_attrs(self, specs, nc_file, data_dict):
+        """Store input file attributes of VariableSpec variables.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        nc_file: Path
+            path to NetCDF file
+        data_dict: dict
+            dictionary of module variables
+        """
+
+        ds = Dataset(nc_file, 'r')
+        for spec in specs:
+            var = self.__spec_var(ds, spec)
+            if var is None: continue
+            group_dict, name = self.__spec_group(data_dict, spec.name)
+            group_dict["attrs"][name] = var.__dict__
+        ds.close()
+
+    def get_spec_data(self, specs, in_dir, suffix, skip_errors=False):
+        """Extract VariableSpec variables from per reach input files.
+
+        Input files are named "{reach_id}_{suffix}.nc".
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        in_dir: Path
+            path to directory of input files
+        suffix: str
+            suffix of input file names
+        skip_errors: bool
+            log and skip files that cannot be read instead of raising
+        """
+
+        specs = self.plan_specs(specs)
+        in_rids, first_file = self.__find_spec_files(in_dir)
+
+        # Storage of results data
+        data_dict = self.create_spec_dict(specs)
+        if first_file is None: return data_dict
+
+        # Storage of variable attributes
+        self.get_spec_attrs(specs, first_file, data_dict)
+
+        # Data extraction
+        for index, s_rid in enumerate(self.sos_rids):
+            if s_rid not in in_rids: continue
+            self.__read_spec_file(specs, in_dir / f"{int(s_rid)}_{suffix}.nc", index,
+                                  data_dict, skip_errors)
+        return data_dict
+
+    def stream_spec_data(self, specs, in_dir, suffix, group, metadata_json, skip_errors=False):
+        """Extract and write VariableSpec variables in blocks of reaches.
+
+        Variables are created up front and only stream_block reaches are held
+        in memory before they are written to their rows in the SoS.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        in_dir: Path
+            path to directory of input files
+        suffix: str
+            suffix of input file names
+        group: str
+            name of module group in the SoS
+        metadata_json: dict
+            dictionary of SoS variable metadata
+        skip_errors: bool
+            log and skip files that cannot be read instead of raising
+        """
+
+        specs = self.plan_specs(specs)
+        in_rids, first_file = self.__find_spec_files(in_dir)
+        attrs_dict = self.create_spec_dict(specs, 0)
+        if first_file is not None: self.get_spec_attrs(specs, first_file, attrs_dict)
+
+        sos_ds = Dataset(self.sos_new, 'a')
+        variables = self.create_spec_vars(specs, sos_ds.createGroup(group), attrs_dict, metadata_json)
+        num_reaches = self.sos_rids.shape[0]
+        # Without input files every row is fill and is written in one block
+        block = self.stream_block if in_rids else max(num_reaches, 1)
+        for start in range(0, num_reaches, block):
+            stop = min(start + block, num_reaches)
+            block_dict = self.create_spec_dict(specs, stop - start)
+            for index in range(start, stop):
+                s_rid = self.sos_rids[index]
+                if s_rid not in in_rids: continue
+                self.__read_spec_file(specs, in_dir / f"{int(s_rid)}_{suffix}.nc",
+                                      index - start, block_dict, skip_errors)
+            self.write_spec_rows(specs, variables, block_dict, start)
+        sos_ds.close()
+
+    def __find_spec_files(self, in_dir):
+        """Return set of reach identifiers with input files and a first file.
+
+        The first file is None if there are no input files.
+
+        Parameters
+        ----------
+        in_dir: Path
+            path to directory of input files
+        """
+
+        in_files = [ Path(in_file) for in_file in glob.glob(f"{in_dir}/{self.cont_ids}*.nc") ]
+        in_rids = { int(in_file.name.split('_')[0]) for in_file in in_files }
+        return in_rids, in_files[0] if in_files else None
+
+    def __read_spec_file(self, specs, nc_file, index, data_dict, skip_errors):
+        """Read VariableSpec variables of a reach's input file.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        nc_file: Path
+            path to reach input file
+        index: int
+            row of reach in data_dict
+        data_dict: dict
+            dictionary of module variables
+        skip_errors: bool
+            log and skip files that cannot be read instead of raising
+        """
+
+        try:
+            with Dataset(nc_file, 'r') as ds:
+                self.read_spec_vars(specs, ds, index, data_dict)
+        except Exception:
+            if not skip_errors: raise
+            self.logger.warning('%s failed to read...', nc_file.name)
+
+    @staticmethod
+    def read_var(var, fill, index=slice(None), out=None):
+        """Read variable data without masking and replace missing values.
+
+        Returns the same values as var[index].filled(fill) without building
+        a masked array. Values equal to the _FillValue (or the default fill
+        value), a missing_value or outside of the valid range are missing.
+        Variables that are scaled or unsigned are read masked.
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            input file variable
+        fill: float or int
+            value to replace missing values with
+        index: slice or int or tuple
+            index of variable data to read
+        out: nd.array
+            array to read data into (a new array is returned if None)
+        """
+
+        attrs = var.ncattrs()
+        if "scale_factor" in attrs or "add_offset" in attrs or "_Unsigned" in attrs:
+            data = np.ma.filled(var[index], fill)
+            if out is None: return data
+            np.copyto(out, data)
+            return out
+
+        mask = var.mask
+        var.set_auto_mask(False)
+        data = var[index]
+        var.set_auto_mask(mask)
+        missing = AbstractModule.__missing(var, attrs, data)
+        if out is None:
+            out = np.array(data)
+        else:
+            np.copyto(out, data)
+        if missing is not None: np.copyto(out, fill, where=missing, casting="unsafe")
+        return out
+
+    @staticmethod
+    def __missing(var, attrs, data):
+        """Return boolean array of missing values in data (None if none).
+
+        Parameters
+        ----------
+        var: netCDF4._netCDF4.Variable
+            input file variable
+        attrs: list
+            list of variable attribute names
+        data: nd.array
+            unmasked variable data
+        """
+
+        missing = None
+        def add(mask):
+            nonlocal missing
+            missing = mask if missing is None else missing | mask
+
+        # Fill value
+        if "_FillValue" in attrs:
+            fill_value = np.asarray(var._FillValue)
+        elif var.dtype.str[1:] in default_fillvals:
+            fill_value = np.asarray(default_fillvals[var.dtype.str[1:]], dtype=var.dtype)
+        else:
+            fill_value = None
+        if fill_value is not None:
+            add(np.isnan(data) if fill_value.dtype.kind == 'f' and np.isnan(fill_value) else data == fill_value)
+
+        if "missing_value" in attrs:
+            add(np.isin(data, np.atleast_1d(var.missing_value)))
+
+        # Valid range
+        valid_min, valid_max = None, None
+        if "valid_range" in attrs: valid_min, valid_max = var.valid_range
+        if "valid_min" in attrs: valid_min = var.valid_min
+        if "valid_max" in attrs: valid_max = var.valid_max
+        if valid_min is not None: add(data < valid_min)
+        if valid_max is not None: add(data > valid_max)
+        return missing
+
+    def read_spec_vars(self, specs, ds, index, data_dict):
+        """Read VariableSpec variables of an input file into a reach row.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        ds: netCDF4.Dataset
+            input file of a reach
+        index: int
+            row of reach in sos_rids
+        data_dict: dict
+            dictionary of module variables
+        """
+
+        for spec in specs:
+            var = self.__spec_var(ds, spec)
+            if var is None: continue
+            group_dict, name = self.__spec_group(data_dict, spec.name)
+            group_dict[name][index] = self.read_var(var, spec.fill)
+
+    def write_spec_vars(self, specs, grp, data_dict, metadata_json):
+        """Write VariableSpec variables and their metadata to the SoS.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        grp: netCDF4._netCDF4.Group
+            module group to write data to
+        data_dict: dict
+            dictionary of module variables
+        metadata_json: dict
+            dictionary of SoS variable metadata
+        """
+
+        specs = self.plan_specs(specs)
+        variables = self.create_spec_vars(specs, grp, data_dict, metadata_json)
+        self.write_spec_rows(specs, variables, data_dict)
+
+    def create_spec_vars(self, specs, grp, data_dict, metadata_json):
+        """Create VariableSpec variables with their attributes in the SoS.
+
+        Returns the list of variables in the order of specs.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        grp: netCDF4._netCDF4.Group
+            module group to create variables in
+        data_dict: dict
+            dictionary of module variables with input file attributes
+        metadata_json: dict
+            dictionary of SoS variable metadata
+        """
+
+        plan = MetadataPlan.of(metadata_json)
+        variables = []
+        for spec in specs:
+            group_dict, name = self.__spec_group(data_dict, spec.name)
+            out_grp = grp
+            for group in spec.name.split('/')[:-1]:
+                out_grp = out_grp.createGroup(group)
+            metadata = plan.attrs(*spec.metadata)
+            if spec.type == "vlen_f":
+                var = self.create_var_nt(out_grp, name, self.vlen_f, spec.dims, group_dict["attrs"][name],
+                                         metadata=metadata)
+            else:
+                var = self.create_var(out_grp, name, spec.type, spec.dims, group_dict["attrs"][name],
+                                      metadata)
+            variables.append(var)
+        return variables
+
+    def plan_names(self, keys, names):
+        """Return names of the variables under keys that will be written.
+
+        Variables without SoS metadata are not read. Every name is kept
+        when the module was not created from a context.
+
+        Parameters
+        ----------
+        keys: tuple
+            metadata key path of the variables' group
+        names: iterable
+            names of input file variables
+        """
+
+        if self.metadata is None: return list(names)
+        return [ name for name in names if self.metadata.has(*keys, name) ]
+
+    def plan_specs(self, specs):
+        """Return VariableSpec objects of variables that will be written.
+
+        Variables without SoS metadata are neither read nor written. Every
+        variable is kept when the module was not created from a context.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        """
+
+        if self.metadata is None: return specs
+        return [ spec for spec in specs if self.metadata.has(*spec.metadata) ]
+
+    def write_spec_rows(self, specs, variables, data_dict, start=0):
+        """Write rows of VariableSpec variables to the SoS.
+
+        Parameters
+        ----------
+        specs: list
+            list of VariableSpec objects
+        variables: list
+            list of variables returned by create_spec_vars
+        data_dict: dict
+            dictionary of module variables
+        start: int
+            first SoS reach row of data_dict
+        """
+
+        for spec, var in zip(specs, variables):
+            group_dict, name = self.__spec_group(data_dict, spec.name)
+            self.write_rows(var, spec.type, group_dict[name], start)
+
+    @staticmethod
+    def __spec_group(data_dict, name):
+        """Return the data dictionary that holds a variable and its name.
+
+        Parameters
+        ----------
+        data_dict: dict
+            dictionary of module variables
+        name: str
+            VariableSpec name, "/" separates subgroups
+        """
+
+        *groups, name = name.split('/')
+        for group in groups:
+            data_dict = data_dict.setdefault(group, {})
+        data_dict.setdefault("attrs", {})
+        return data_dict, name
+
+    @staticmethod
+    def __spec_var(ds, spec):
+        """Return input file variable of a VariableSpec.
+
+        Returns None if an optional variable is missing.
+
+        Parameters
+        ----------
+        ds: netCDF4.Dataset
+            input file
+        spec: VariableSpec
+            variable to return
+        """
+
+        try:
+            return ds[spec.source]
+        except (IndexError, KeyError):
+            if spec.optional: return None
+            raise
+
+    def get_node_indexes(self, reach_id, index=None):
+        """Return the SoS node rows that belong to a reach.
+
+        Returns a tuple in the form of np.where(sos_nrids == reach_id).
+
+        Parameters
+        ----------
+        reach_id: int
+            reach identifier
+        index: int
+            row of reach identifier in sos_rids if known
+        """
+
+        if self.reach_index is None: return np.where(self.sos_nrids == reach_id)
+        return (self.reach_index.reach_node_rows(reach_id, index),)
+
+    def get_node_index(self, node_id):
+        """Return the SoS node row of a node identifier.
+
+        Parameters
+        ----------
+        node_id: int
+            node identifier
+
+        Raises
+        ------
+        IndexError
+            if the node identifier is not in the SoS
+        """
+
+        if self.reach_index is None: return np.where(self.sos_nids == node_id)[0][0]
+        row = self.reach_index.node_rows(node_id)[0]
+        if row < 0: raise IndexError(f"Node {node_id} is not in the SoS.")
+        return row
+
+    def get_vltype(self, sos_ds, dtype, name):
+        """Return variable length data type, creating it if needed.
+
+        Parameters
+        ----------
+        sos_ds: netCDF4.Dataset
+            SoS results file
+        dtype: numpy.dtype
+            data type of variable length array elements
+        name: str
+            name of variable length data type
+        """
+
+        if name in sos_ds.vltypes: return sos_ds.vltypes[name]
+        return sos_ds.createVLType(dtype, name)
+
     def set_variable_atts(self, variable, variable_dict):
-        """Set the variable attribute metdata."""
+        """Set the variable attribute metdata with a single setncatts call."""
         try:
-            for name, value in variable_dict.items():
-                setattr(variable, name, value)
-        except:
-            self.logger.warn('could not find metadata for %s', variable)
+            variable.setncatts(MetadataPlan.typed_attrs(variable, variable_dict))
+        except (TypeError, ValueError) as error:
+            self.logger.warning('could not set metadata for %s: %s', variable.name, error)
 
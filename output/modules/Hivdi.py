@@ -7,7 +7,9 @@ from netCDF4 import Dataset
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
+from output.modules.SparseRows import SparseRows
 
 class Hivdi(AbstractModule):
     """
@@ -18,6 +20,8 @@ class Hivdi(AbstractModule):
 
     Attributes
     ----------
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
 
     Methods
     -------
@@ -31,6 +35,8 @@ class Hivdi(AbstractModule):
         get NetCDF attributes for each NetCDF variable.
     """
 
+    INPUT_FILES = ("hivdi/{cont_ids}*.nc",)
+
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s,
                  rids, nrids, nids):
         """
@@ -81,8 +87,8 @@ class Hivdi(AbstractModule):
             for s_rid in self.sos_rids:
                 if s_rid in hv_rids:
                     hv_ds = Dataset(hv_dir / f"{int(s_rid)}_h2ivdi.nc", 'r')
-                    hv_dict["reach"]["Q"][index] = hv_ds["reach"]["Q"][:].filled(self.FILL["f8"])
-                    hv_dict["reach"]["A0"][index] = hv_ds["reach"]["A0"][:].filled(np.nan)
+                    hv_dict["reach"]["Q"][index] = self.read_var(hv_ds["reach"]["Q"], self.FILL["f8"])
+                    hv_dict["reach"]["A0"][index] = self.read_var(hv_ds["reach"]["A0"], np.nan)
                     # hv_dict["reach"]["alpha"][index] = hv_ds["reach"]["alpha"][:].filled(np.nan)
                     # hv_dict["reach"]["beta"][index] = hv_ds["reach"]["beta"][:].filled(np.nan)s
                     hv_ds.close()
@@ -94,7 +100,7 @@ class Hivdi(AbstractModule):
 
         data_dict = {
             "reach" : {
-                "Q" : np.empty((self.sos_rids.shape[0]), dtype=object),
+                "Q" : SparseRows(self.sos_rids.shape[0], np.array([self.FILL["f8"]])),
                 "A0" : np.full(self.sos_rids.shape[0], np.nan, dtype=np.float64),
                 # "alpha" : np.full(self.sos_rids.shape[0], np.nan, dtype=np.float64),
                 # "beta" : np.full(self.sos_rids.shape[0], np.nan, dtype=np.float64),
@@ -107,8 +113,6 @@ class Hivdi(AbstractModule):
             }
         }
         
-        # Vlen variables
-        data_dict["reach"]["Q"].fill(np.array([self.FILL["f8"]]))
         return data_dict
         
     def get_nc_attrs(self, nc_file, data_dict):
@@ -138,13 +142,12 @@ class Hivdi(AbstractModule):
             dictionary of HiVDI variables
         """
 
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         hv_grp = sos_ds.createGroup("hivdi")
         
-        var = self.write_var_nt(hv_grp, "Q", self.vlen_f, ("num_reaches"), data_dict["reach"])
-        self.set_variable_atts(var, metadata_json["hivdi"]["Q"])
-        var = self.write_var(hv_grp, "A0", "f8", ("num_reaches",), data_dict["reach"])
-        self.set_variable_atts(var, metadata_json["hivdi"]["A0"])
+        var = self.write_var_nt(hv_grp, "Q", self.vlen_f, ("num_reaches"), data_dict["reach"], metadata=plan.attrs("hivdi", "Q"))
+        var = self.write_var(hv_grp, "A0", "f8", ("num_reaches",), data_dict["reach"], metadata=plan.attrs("hivdi", "A0"))
         # var = self.write_var(hv_grp, "beta", "f8", ("num_reaches",), data_dict["reach"])
         # self.set_variable_atts(var, metadata_json["hivdi"]["beta"])
         # var = self.write_var(hv_grp, "alpha", "f8", ("num_reaches",), data_dict["reach"])
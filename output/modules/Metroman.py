@@ -8,7 +8,9 @@ from netCDF4 import Dataset
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
+from output.modules.SparseRows import SparseRows
 
 class Metroman(AbstractModule):
     """
@@ -19,6 +21,8 @@ class Metroman(AbstractModule):
 
     Attributes
     ----------
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
 
     Methods
     -------
@@ -36,6 +40,8 @@ class Metroman(AbstractModule):
         insert discharge values into dictionary with nr by nt dimensions
     """
     
+    INPUT_FILES = ("metroman/*.nc",)
+
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s,
                  rids, nrids, nids):
         """
@@ -97,10 +103,10 @@ class Metroman(AbstractModule):
                     # self.__insert_nr(s_rid, "A0hat", index, mn_ds, mn_dict)
                     # self.__insert_nr(s_rid, "nahat", index, mn_ds, mn_dict)
                     # self.__insert_nr(s_rid, "x1hat", index, mn_ds, mn_dict)
-                    mn_dict["allq"][index] = mn_ds["average"]["allq"][:].filled(self.FILL["f8"])
-                    mn_dict["q_u"][index] = mn_ds["average"]["q_u"][:].filled(np.nan)
-                    mn_dict["A0hat"][index] = mn_ds["average"]["A0hat"][:].filled(np.nan)
-                    mn_dict["x1hat"][index] = mn_ds["average"]["x1hat"][:].filled(np.nan)
+                    mn_dict["allq"][index] = self.read_var(mn_ds["average"]["allq"], self.FILL["f8"])
+                    mn_dict["q_u"][index] = self.read_var(mn_ds["average"]["q_u"], np.nan)
+                    mn_dict["A0hat"][index] = self.read_var(mn_ds["average"]["A0hat"], np.nan)
+                    mn_dict["x1hat"][index] = self.read_var(mn_ds["average"]["x1hat"], np.nan)
 
 
 
@@ -113,11 +119,11 @@ class Metroman(AbstractModule):
         """Creates and returns MetroMan data dictionary."""
 
         data_dict = {
-            "allq" : np.empty((self.sos_rids.shape[0]), dtype=object),
+            "allq" : SparseRows(self.sos_rids.shape[0], np.array([self.FILL["f8"]])),
             "A0hat" : np.full(self.sos_rids.shape[0], np.nan, dtype=np.float64),
             "nahat" : np.full(self.sos_rids.shape[0], np.nan, dtype=np.float64),
             "x1hat" : np.full(self.sos_rids.shape[0], np.nan, dtype=np.float64),
-            "q_u" : np.empty((self.sos_rids.shape[0]), dtype=object),
+            "q_u" : SparseRows(self.sos_rids.shape[0], np.array([self.FILL["f8"]])),
             "attrs" : {
                 "allq": {},
                 "A0hat": {},
@@ -126,10 +132,6 @@ class Metroman(AbstractModule):
                 "q_u": {}
             }
         }
-        # Vlen variables
-        data_dict["allq"].fill(np.array([self.FILL["f8"]]))
-        data_dict["q_u"].fill(np.array([self.FILL["f8"]]))
-        
         return data_dict
         
     def get_nc_attrs(self, nc_file, data_dict):
@@ -169,7 +171,7 @@ class Metroman(AbstractModule):
         """
 
         mn_index = np.where(mn_ds["reach_id"][:] == s_rid)[0][0]
-        mn_dict[name][index] = mn_ds[name][mn_index].filled(np.nan)
+        mn_dict[name][index] = self.read_var(mn_ds[name], np.nan, mn_index)
 
     def __insert_nt(self, s_rid, name, index, mn_ds, mn_dict):
         """Insert discharge values into dictionary with nr by nt dimensions.
@@ -189,7 +191,7 @@ class Metroman(AbstractModule):
         """
 
         mn_index = np.where(mn_ds["reach_id"][:] == s_rid)[0][0]
-        mn_dict[name][index] = mn_ds[name][mn_index,:].filled(self.FILL["f8"])
+        mn_dict[name][index] = self.read_var(mn_ds[name], self.FILL["f8"], (mn_index, slice(None)))
 
     def append_module_data(self, data_dict, metadata_json):
         """Append MetroMan data to the new version of the SoS.
@@ -200,19 +202,15 @@ class Metroman(AbstractModule):
             dictionary of MetroMan variables
         """
 
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         mn_grp = sos_ds.createGroup("metroman")
 
         # MetroMan data
-        var = self.write_var_nt(mn_grp, "allq", self.vlen_f, ("num_reaches"), data_dict)
-        self.set_variable_atts(var, metadata_json["metroman"]["allq"])
-        var = self.write_var(mn_grp, "A0hat", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["metroman"]["A0hat"])
-        var = self.write_var(mn_grp, "nahat", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["metroman"]["nahat"])
-        var = self.write_var(mn_grp, "x1hat", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["metroman"]["x1hat"])
-        var = self.write_var_nt(mn_grp, "q_u", self.vlen_f, ("num_reaches"), data_dict)
-        self.set_variable_atts(var, metadata_json["metroman"]["q_u"])
+        var = self.write_var_nt(mn_grp, "allq", self.vlen_f, ("num_reaches"), data_dict, metadata=plan.attrs("metroman", "allq"))
+        var = self.write_var(mn_grp, "A0hat", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("metroman", "A0hat"))
+        var = self.write_var(mn_grp, "nahat", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("metroman", "nahat"))
+        var = self.write_var(mn_grp, "x1hat", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("metroman", "x1hat"))
+        var = self.write_var_nt(mn_grp, "q_u", self.vlen_f, ("num_reaches"), data_dict, metadata=plan.attrs("metroman", "q_u"))
 
         sos_ds.close()
\ No newline at end of file
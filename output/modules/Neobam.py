@@ -8,7 +8,9 @@ from netCDF4 import Dataset
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
+from output.modules.SparseRows import SparseRows
 
 class Neobam(AbstractModule):
     """
@@ -19,6 +21,8 @@ class Neobam(AbstractModule):
 
     Attributes
     ----------
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
 
     Methods
     -------
@@ -32,6 +36,8 @@ class Neobam(AbstractModule):
         get NetCDF attributes for each NetCDF variable.
     """
 
+    INPUT_FILES = ("geobam/{cont_ids}*.nc",)
+
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s,
                  rids, nrids, nids):
         """
@@ -93,33 +99,33 @@ class Neobam(AbstractModule):
                     try:
                         nb_ds = Dataset(os.path.join(nb_dir , f"{int(s_rid)}_geobam.nc"), 'r')
 
-                        nb_dict["q"]["q"][index] = nb_ds["q"]["q"][:].filled(self.FILL["f8"])
+                        nb_dict["q"]["q"][index] = self.read_var(nb_ds["q"]["q"], self.FILL["f8"])
                         nb_dict['q']["attrs"]['q']['_FillValue'] = nb_ds['q']['q']._FillValue
-                        nb_dict["q"]["q_sd"][index] = nb_ds["q"]["q_sd"][:].filled(np.nan)
+                        nb_dict["q"]["q_sd"][index] = self.read_var(nb_ds["q"]["q_sd"], np.nan)
                         nb_dict["q"]["attrs"]['q_sd']['_FillValue'] = nb_ds["q"]['q_sd']._FillValue
 
                         internal_node_count = 0
                         for a_node_id in abs(nb_ds.node_ids)[:]:
-                            node_index = np.where(self.sos_nids == abs(a_node_id))[0][0]
+                            node_index = self.get_node_index(abs(a_node_id))
 
-                            nb_dict["r"]["mean"][node_index] = nb_ds["r"]["mean"][internal_node_count].filled(np.nan)
+                            nb_dict["r"]["mean"][node_index] = self.read_var(nb_ds["r"]["mean"], np.nan, internal_node_count)
                             nb_dict["r"]["attrs"]['mean']['_FillValue'] = nb_ds["r"]['mean']._FillValue
-                            nb_dict["r"]["sd"][index] = nb_ds["r"]["sd"][0].filled(np.nan)
+                            nb_dict["r"]["sd"][index] = self.read_var(nb_ds["r"]["sd"], np.nan, 0)
                             nb_dict["r"]["attrs"]['sd']['_FillValue'] = nb_ds["r"]['sd']._FillValue
                             
-                            nb_dict["logn"]["mean"][node_index] = nb_ds["logn"]["mean"][internal_node_count].filled(np.nan)
+                            nb_dict["logn"]["mean"][node_index] = self.read_var(nb_ds["logn"]["mean"], np.nan, internal_node_count)
                             nb_dict["logn"]["attrs"]['mean']['_FillValue'] = nb_ds["logn"]['mean']._FillValue
-                            nb_dict["logn"]["sd"][index] = nb_ds["logn"]["sd"][0].filled(np.nan)
+                            nb_dict["logn"]["sd"][index] = self.read_var(nb_ds["logn"]["sd"], np.nan, 0)
                             nb_dict["logn"]["attrs"]['sd']['_FillValue'] = nb_ds["logn"]['sd']._FillValue
                             
-                            nb_dict["logWb"]["mean"][node_index] = nb_ds["logWb"]["mean"][internal_node_count].filled(np.nan)
+                            nb_dict["logWb"]["mean"][node_index] = self.read_var(nb_ds["logWb"]["mean"], np.nan, internal_node_count)
                             nb_dict["logWb"]["attrs"]['mean']['_FillValue'] = nb_ds["logWb"]['mean']._FillValue
-                            nb_dict["logWb"]["sd"][index] = nb_ds["logWb"]["sd"][0].filled(np.nan)
+                            nb_dict["logWb"]["sd"][index] = self.read_var(nb_ds["logWb"]["sd"], np.nan, 0)
                             nb_dict["logWb"]["attrs"]['sd']['_FillValue'] = nb_ds["logWb"]['sd']._FillValue
                             
-                            nb_dict["logDb"]["mean"][node_index] = nb_ds["logDb"]["mean"][internal_node_count].filled(np.nan)
+                            nb_dict["logDb"]["mean"][node_index] = self.read_var(nb_ds["logDb"]["mean"], np.nan, internal_node_count)
                             nb_dict["logDb"]["attrs"]['mean']['_FillValue'] = nb_ds["logDb"]['mean']._FillValue
-                            nb_dict["logDb"]["sd"][index] = nb_ds["logDb"]["sd"][0].filled(np.nan)
+                            nb_dict["logDb"]["sd"][index] = self.read_var(nb_ds["logDb"]["sd"], np.nan, 0)
                             nb_dict["logDb"]["attrs"]['sd']['_FillValue'] = nb_ds["logDb"]['sd']._FillValue
 
                             internal_node_count += 1
@@ -168,18 +174,14 @@ class Neobam(AbstractModule):
                 }
             },
             "q" : {
-                "q" : np.empty((self.sos_rids.shape[0]), dtype=object),
-                "q_sd": np.empty((self.sos_rids.shape[0]), dtype=object),
+                "q" : SparseRows(self.sos_rids.shape[0], np.array([self.FILL["f8"]])),
+                "q_sd": SparseRows(self.sos_rids.shape[0], np.array([self.FILL["f8"]])),
                 "attrs" : {
                     "q": {},
                     "q_sd":{}
                 }
             }
         }
-        # Vlen variables
-        data_dict["q"]["q"].fill(np.array([self.FILL["f8"]]))
-        data_dict["q"]["q_sd"].fill(np.array([self.FILL["f8"]]))
-        
         return data_dict
         
     def get_nc_attrs(self, nc_file, data_dict):
@@ -209,37 +211,28 @@ class Neobam(AbstractModule):
             dictionary of HiVDI variables
         """
 
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         nb_grp = sos_ds.createGroup("neobam")
         
         r_grp = nb_grp.createGroup("r")
-        var = self.write_var(r_grp, "mean", "f8", ("num_nodes"), data_dict["r"])
-        self.set_variable_atts(var, metadata_json["neobam"]["r"]["mean"])
-        var = self.write_var(r_grp, "sd", "f8", ("num_reaches"), data_dict["r"])
-        self.set_variable_atts(var, metadata_json["neobam"]["r"]["sd"])
+        var = self.write_var(r_grp, "mean", "f8", ("num_nodes"), data_dict["r"], metadata=plan.attrs("neobam", "r", "mean"))
+        var = self.write_var(r_grp, "sd", "f8", ("num_reaches"), data_dict["r"], metadata=plan.attrs("neobam", "r", "sd"))
         
         logn_grp = nb_grp.createGroup("logn") 
-        var = self.write_var(logn_grp, "mean", "f8", ("num_nodes"), data_dict["logn"])
-        self.set_variable_atts(var, metadata_json["neobam"]["logn"]["mean"])
-        var = self.write_var(logn_grp, "sd", "f8", ("num_reaches"), data_dict["logn"])
-        self.set_variable_atts(var, metadata_json["neobam"]["logn"]["sd"])
+        var = self.write_var(logn_grp, "mean", "f8", ("num_nodes"), data_dict["logn"], metadata=plan.attrs("neobam", "logn", "mean"))
+        var = self.write_var(logn_grp, "sd", "f8", ("num_reaches"), data_dict["logn"], metadata=plan.attrs("neobam", "logn", "sd"))
         
         logDb_grp = nb_grp.createGroup("logDb") 
-        var = self.write_var(logDb_grp, "mean", "f8", ("num_nodes"), data_dict["logDb"])
-        self.set_variable_atts(var, metadata_json["neobam"]["logDb"]["mean"])
-        var = self.write_var(logDb_grp, "sd", "f8", ("num_reaches"), data_dict["logDb"])
-        self.set_variable_atts(var, metadata_json["neobam"]["logDb"]["sd"])
+        var = self.write_var(logDb_grp, "mean", "f8", ("num_nodes"), data_dict["logDb"], metadata=plan.attrs("neobam", "logDb", "mean"))
+        var = self.write_var(logDb_grp, "sd", "f8", ("num_reaches"), data_dict["logDb"], metadata=plan.attrs("neobam", "logDb", "sd"))
         
         logWb_grp = nb_grp.createGroup("logWb") 
-        var = self.write_var(logWb_grp, "mean", "f8", ("num_nodes"), data_dict["logWb"])
-        self.set_variable_atts(var, metadata_json["neobam"]["logWb"]["mean"])
-        var = self.write_var(logWb_grp, "sd", "f8", ("num_reaches"), data_dict["logWb"])
-        self.set_variable_atts(var, metadata_json["neobam"]["logWb"]["sd"])
+        var = self.write_var(logWb_grp, "mean", "f8", ("num_nodes"), data_dict["logWb"], metadata=plan.attrs("neobam", "logWb", "mean"))
+        var = self.write_var(logWb_grp, "sd", "f8", ("num_reaches"), data_dict["logWb"], metadata=plan.attrs("neobam", "logWb", "sd"))
         
         q_grp = nb_grp.createGroup("q")
-        var = self.write_var_nt(q_grp, "q", self.vlen_f, ("num_reaches"), data_dict["q"])
-        self.set_variable_atts(var, metadata_json["neobam"]["q"]["q"])
-        var = self.write_var_nt(q_grp, "q_sd", self.vlen_f, ("num_reaches"), data_dict["q"])
-        self.set_variable_atts(var, metadata_json["neobam"]["q"]["q_sd"])
+        var = self.write_var_nt(q_grp, "q", self.vlen_f, ("num_reaches"), data_dict["q"], metadata=plan.attrs("neobam", "q", "q"))
+        var = self.write_var_nt(q_grp, "q_sd", self.vlen_f, ("num_reaches"), data_dict["q"], metadata=plan.attrs("neobam", "q", "q_sd"))
         
         sos_ds.close()
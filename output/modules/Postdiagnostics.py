@@ -1,13 +1,13 @@
 # Standard imports
 import glob
 from pathlib import Path
-import os
 
 # Third-party imports
 from netCDF4 import Dataset, stringtochar
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
 
 class Postdiagnostics(AbstractModule):
@@ -19,10 +19,18 @@ class Postdiagnostics(AbstractModule):
         array of string basin-level algorithm names
     basin_algo_num: int
         number of basin-level algorithms
+    BASIN_FLAGS: list
+        list of basin-level flag variable names
+    CACHE_STATE: tuple
+        algorithm names and counts cached with extracted data
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
     reach_algo_names: nd.array
         array of string reach-level algorithm names
     reach_algo_num: int
         number of reach-level algorithms
+    REACH_FLAGS: list
+        list of reach-level flag variable names
         
     Methods
     -------
@@ -30,12 +38,19 @@ class Postdiagnostics(AbstractModule):
         append module data to the new version of the SoS result file.
     create_data_dict()
         creates and returns module data dictionary.
+    from_context(context, input_dir)
+        create and return module from a ModuleContext.
+    flag_attrs(attrs)
+        return flag variable metadata with flag values typed as int8.
     get_module_data()
         retrieve module results from NetCDF files.
-    get_nc_attrs(nc_file, data_dict)
-        get NetCDF attributes for each NetCDF variable.
     """
     
+    BASIN_FLAGS = ["realism_flags", "stability_flags", "prepost_flags"]
+    REACH_FLAGS = ["realism_flags", "stability_flags"]
+    CACHE_STATE = ("basin_algo_names", "basin_num_algos", "reach_algo_names", "reach_num_algos")
+    INPUT_FILES = ("basin/{cont_ids}*.nc", "reach/{cont_ids}*.nc")
+    
     def __init__(self, cont_ids, input_dir, sos_new, logger, rids, nrids, nids):
         """
         Parameters
@@ -63,138 +78,125 @@ class Postdiagnostics(AbstractModule):
         super().__init__(cont_ids, input_dir, sos_new, logger, rids=rids, nrids=nrids, 
                          nids=nids)
 
+    @classmethod
+    def from_context(cls, context, input_dir):
+        """Create and return module from a ModuleContext.
+
+        Parameters
+        ----------
+        context: ModuleContext
+            state shared by every module in an Output run
+        input_dir: Path
+            path to input directory
+        """
+
+        module = cls(context.cont_ids, input_dir, context.sos_new, context.logger,
+                     context.sos_rids, context.sos_nrids, context.sos_nids)
+        return module.set_context(context)
+
     def get_module_data(self):
         """Extract Postdiagnostics results from NetCDF files."""
 
-        # Files and reach identifiers
-        pd_basin_files = [ Path(pd_file) for pd_file in glob.glob(f"{self.input_dir}/basin/{self.cont_ids}*.nc") ]
-        pd_reach_files = [ Path(pd_file) for pd_file in glob.glob(f"{self.input_dir}/reach/{self.cont_ids}*.nc") ]
+        # Read algorithm names, flags and attributes from each file once
+        basin_cache, basin_attrs = self.__read_files("basin", "moi_diag", self.BASIN_FLAGS)
+        reach_cache, reach_attrs = self.__read_files("reach", "flpe_diag", self.REACH_FLAGS)
 
-        pd_basin_rids = [ int(pd_file.name.split('_')[0]) for pd_file in pd_basin_files ]
-        pd_reach_rids = [ int(pd_file.name.split('_')[0]) for pd_file in pd_reach_files ]
-        pd_rids = pd_basin_rids + pd_reach_rids
-
-        if len(pd_basin_files) == 0 and len(pd_reach_files) == 0:
+        if len(basin_cache) == 0 and len(reach_cache) == 0:
             # Store empty data
             pd_dict = self.create_data_dict()
         else:
             # Get names number of algorithms processed
-            self.__get_algo_data(pd_basin_files, pd_reach_files)
+            self.basin_algo_names = self.__get_algo_names(basin_cache)
+            self.basin_num_algos = len(self.basin_algo_names)
+            self.reach_algo_names = self.__get_algo_names(reach_cache)
+            self.reach_num_algos = len(self.reach_algo_names)
 
-            # Storage initialization
+            # Storage initialization (algorithms that did not run are filled)
             pd_dict = self.create_data_dict()
             
-            # Storage of variable attributes - taken from first file in list
-            self.get_nc_attrs(pd_basin_files[0], pd_dict)
-            self.get_nc_attrs(pd_reach_files[0], pd_dict)
-
-            # Data extraction
-            index = 0
-            for s_rid in self.sos_rids:
-                # data for reach identifier
-                if s_rid in pd_rids:
-                    # basin
-                    if os.path.exists(os.path.join(self.input_dir, "basin", f"{int(s_rid)}_moi_diag.nc")):
-                        pd_b_ds = Dataset(self.input_dir / "basin" / f"{int(s_rid)}_moi_diag.nc", 'r')
-                        basin_realism_flags = list(pd_b_ds["realism_flags"][:].filled(np.nan))
-                        basin_stability_flags = list(pd_b_ds["stability_flags"][:].filled(np.nan))
-                        basin_prepost_flags = list(pd_b_ds["prepost_flags"][:].filled(np.nan))
-
-                        # sometimes different algos dont run for some flpes
-                        # the blocks below ensure that no matter what algos are run ,the order is persserved
-                        # if an algo didn't run, then it will be filled with nan
-                        dif = [x for x in self.basin_algo_names if x not in pd_b_ds['algo_names']]
-                        for missing_algo in dif:
-                            missing_index = list(self.basin_algo_names).index(missing_algo)
-                            basin_realism_flags.insert(missing_index, np.nan)
-                            basin_stability_flags.insert(missing_index, np.nan)
-                            basin_prepost_flags.insert(missing_index, np.nan)
-
-                        pd_dict["basin"]["realism_flags"][index, :] = np.asarray(basin_realism_flags)
-                        pd_dict["basin"]["stability_flags"][index, :] = np.asarray(basin_stability_flags)
-                        pd_dict["basin"]["prepost_flags"][index, :] = np.asarray(basin_prepost_flags)
-                        pd_b_ds.close()
-                    else:
-                        # the below prevents ragged arrays
-                        empty_basin = np.empty(len(self.basin_algo_names),)
-                        empty_basin[:]= np.nan
-                        pd_dict["basin"]["realism_flags"][index, :] = empty_basin
-                        pd_dict["basin"]["stability_flags"][index, :] = empty_basin
-                        pd_dict["basin"]["prepost_flags"][index, :] = empty_basin
-
-                    # reach
-                    if os.path.exists(os.path.join(self.input_dir, "reach", f"{int(s_rid)}_flpe_diag.nc")):
-                        pd_r_ds = Dataset(self.input_dir / "reach" / f"{int(s_rid)}_flpe_diag.nc", 'r')
-                        reach_realism_flags = list(pd_r_ds["realism_flags"][:].filled(np.nan))
-                        reach_stability_flags = list(pd_r_ds["stability_flags"][:].filled(np.nan))
-
-                        # sometimes different algos dont run for some flpes
-                        # the blocks below ensure that no matter what algos are run ,the order is persserved
-                        # if an algo didn't run, then it will be filled with nan
-                        dif = [x for x in self.reach_algo_names if x not in pd_r_ds['algo_names']]
-                        for missing_algo in dif:
-                            missing_index = list(self.reach_algo_names).index(missing_algo)
-                            reach_realism_flags.insert(missing_index, np.nan)
-                            reach_stability_flags.insert(missing_index, np.nan)
-
-                        pd_dict["reach"]["realism_flags"][index, :] = np.asarray(reach_realism_flags)
-                        pd_dict["reach"]["stability_flags"][index, :] = np.asarray(reach_stability_flags)
-                        pd_r_ds.close()
-                    else:
-                        # the below prevents ragged arrays
-                        empty_reach = np.empty(len(self.reach_algo_names),)
-                        empty_reach[:]= np.nan
-                        pd_dict["reach"]["realism_flags"][index, :] = empty_reach
-                        pd_dict["reach"]["stability_flags"][index, :] = empty_reach
-
-                # no data for reach identifier
-                else:
-                    # the below prevents ragged arrays
-                    empty_basin = np.empty(len(self.basin_algo_names),)
-                    empty_basin[:]= np.nan
-
-                    empty_reach = np.empty(len(self.reach_algo_names),)
-                    empty_reach[:]= np.nan
-
-                    pd_dict["basin"]["realism_flags"][index, :] = empty_basin
-                    pd_dict["basin"]["stability_flags"][index, :] = empty_basin
-                    pd_dict["basin"]["prepost_flags"][index, :] = empty_basin
-                    pd_dict["reach"]["realism_flags"][index, :] = empty_reach
-                    pd_dict["reach"]["stability_flags"][index, :] = empty_reach
-
-                index += 1
+            # Storage of variable attributes - taken from first file of level
+            pd_dict["basin"]["attrs"].update(basin_attrs)
+            pd_dict["reach"]["attrs"].update(reach_attrs)
+
+            # Data extraction - algorithm columns located by name
+            self.__insert_flags(pd_dict["basin"], basin_cache, self.basin_algo_names, self.BASIN_FLAGS)
+            self.__insert_flags(pd_dict["reach"], reach_cache, self.reach_algo_names, self.REACH_FLAGS)
         return pd_dict
-    
-    def __get_algo_data(self, basin_files, reach_files):
-        """Store basin and reach algorithn names and number.
+
+    def __read_files(self, level, suffix, flags):
+        """Read algorithm names and flags from each file of a level once.
 
         Parameters
-        -----------
-        basin_files: list
-            list of basin file paths
-        reach_files: list
-            list of reach file paths
+        ----------
+        level: str
+            "basin" or "reach" directory name
+        suffix: str
+            file name suffix after the reach identifier
+        flags: list
+            list of flag variable names to read
+
+        Returns
+        -------
+        tuple
+            dictionary of reach identifier to file data and dictionary of
+            variable attributes from the first file read
         """
 
-        self.basin_algo_names = []
-        self.basin_num_algos = 0
-        for i in basin_files:
-            pd_b_ds = Dataset(i, 'r')
-            self.basin_algo_names.extend(pd_b_ds["algo_names"][:])
-            pd_b_ds.close()
-        self.basin_algo_names = list(set(self.basin_algo_names))
-        self.basin_algo_names.sort()
-        self.basin_num_algos = len(self.basin_algo_names)
-
-        self.reach_algo_names = []
-        self.reach_num_algos = 0
-        for i in reach_files:
-            pd_r_ds = Dataset(i, 'r')
-            self.reach_algo_names.extend(pd_r_ds["algo_names"][:])
-            pd_r_ds.close()
-        self.reach_algo_names = list(set(self.reach_algo_names))
-        self.reach_algo_names.sort()
-        self.reach_num_algos = len(self.reach_algo_names)
+        pd_files = sorted(glob.glob(f"{self.input_dir}/{level}/{self.cont_ids}*_{suffix}.nc"))
+        cache = {}
+        attrs = {}
+        for pd_file in pd_files:
+            pd_ds = Dataset(pd_file, 'r')
+            data = { "algo_names": list(pd_ds["algo_names"][:]) }
+            for flag in flags:
+                data[flag] = self.read_var(pd_ds[flag], self.FILL["i1"]).astype(np.int8)
+                if not attrs.get(flag):
+                    attrs[flag] = { name: value for name, value in pd_ds[flag].__dict__.items() \
+                        if name not in ("_FillValue", "missing_value") }
+            pd_ds.close()
+            cache[int(Path(pd_file).name.split('_')[0])] = data
+        return cache, attrs
+
+    def __get_algo_names(self, cache):
+        """Return sorted union of algorithm names in file cache.
+
+        Parameters
+        ----------
+        cache: dict
+            dictionary of reach identifier to file data
+        """
+
+        algo_names = set()
+        for data in cache.values():
+            algo_names.update(data["algo_names"])
+        return sorted(algo_names)
+
+    def __insert_flags(self, level_dict, cache, algo_names, flags):
+        """Insert cached flags into their reach row and algorithm columns.
+
+        Sometimes different algorithms do not run for some reaches so flags
+        are placed by algorithm name; algorithms that did not run keep the
+        fill value.
+
+        Parameters
+        ----------
+        level_dict: dict
+            dictionary of basin or reach flag matrices
+        cache: dict
+            dictionary of reach identifier to file data
+        algo_names: list
+            sorted list of all algorithm names for the level
+        flags: list
+            list of flag variable names
+        """
+
+        columns = { name: column for column, name in enumerate(algo_names) }
+        for index, s_rid in enumerate(self.sos_rids):
+            data = cache.get(int(s_rid))
+            if data is None: continue
+            algo_columns = np.array([ columns[name] for name in data["algo_names"] ], dtype=np.int64)
+            for flag in flags:
+                level_dict[flag][index, algo_columns] = data[flag]
 
     def create_data_dict(self):
         """Creates and returns Postdiagnostics data dictionary."""
@@ -205,9 +207,9 @@ class Postdiagnostics(AbstractModule):
             "reach_algo_names" : self.reach_algo_names,
             "reach_num_algos" : self.reach_num_algos,
             "basin" : {
-                "realism_flags" : np.full((self.sos_rids.shape[0], self.basin_num_algos), np.nan, dtype=np.float64),
-                "stability_flags" : np.full((self.sos_rids.shape[0], self.basin_num_algos), np.nan, dtype=np.float64),
-                "prepost_flags" : np.full((self.sos_rids.shape[0], self.basin_num_algos), np.nan, dtype=np.float64),
+                "realism_flags" : np.full((self.sos_rids.shape[0], self.basin_num_algos), self.FILL["i1"], dtype=np.int8),
+                "stability_flags" : np.full((self.sos_rids.shape[0], self.basin_num_algos), self.FILL["i1"], dtype=np.int8),
+                "prepost_flags" : np.full((self.sos_rids.shape[0], self.basin_num_algos), self.FILL["i1"], dtype=np.int8),
                 "attrs": {
                     "realism_flags": {},
                     "stability_flags": {},
@@ -215,8 +217,8 @@ class Postdiagnostics(AbstractModule):
                 }
             },
             "reach" : {
-                "realism_flags" : np.full((self.sos_rids.shape[0], self.reach_num_algos), np.nan, dtype=np.float64),
-                "stability_flags" : np.full((self.sos_rids.shape[0], self.reach_num_algos), np.nan, dtype=np.float64),
+                "realism_flags" : np.full((self.sos_rids.shape[0], self.reach_num_algos), self.FILL["i1"], dtype=np.int8),
+                "stability_flags" : np.full((self.sos_rids.shape[0], self.reach_num_algos), self.FILL["i1"], dtype=np.int8),
                 "attrs": {
                     "realism_flags": {},
                     "stability_flags": {}
@@ -224,26 +226,6 @@ class Postdiagnostics(AbstractModule):
             }
         }
     
-    def get_nc_attrs(self, nc_file, data_dict):
-        """Get NetCDF attributes for each NetCDF variable.
-
-        Parameters
-        ----------
-        nc_file: Path
-            path to NetCDF file
-        data_dict: dict
-            dictionary of MOI variables
-        """
-        ds = Dataset(nc_file, 'r')
-        level = nc_file.name.split('_')[1]
-        if level == "moi":
-            for key in data_dict["basin"]["attrs"].keys():
-                data_dict["basin"]["attrs"][key] = ds[key].__dict__
-        if level == "flpe":
-            for key in data_dict["reach"]["attrs"].keys():
-                data_dict["reach"]["attrs"][key] = ds[key].__dict__
-        ds.close()
-    
     def append_module_data(self, data_dict, metadata_json):
         """Append Postdiagnostic data to the new version of the SoS.
         
@@ -253,6 +235,7 @@ class Postdiagnostics(AbstractModule):
             dictionary of Postdiagnostic variables
         """
 
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         pd_grp = sos_ds.createGroup("postdiagnostics")
 
@@ -265,18 +248,15 @@ class Postdiagnostics(AbstractModule):
         
         bna_v = b_grp.createVariable("basin_num_algos", "i4", ("basin_num_algos",), compression="zlib")
         bna_v[:] = range(1, data_dict["basin_num_algos"] + 1)
-        self.set_variable_atts(bna_v, metadata_json["postdiagnostics"]["basin"]["basin_num_algos"])
+        self.set_variable_atts(bna_v, plan.attrs("postdiagnostics", "basin", "basin_num_algos"))
         
         ban_v = b_grp.createVariable("basin_algo_names", "S1", ("basin_num_algos", "nchar"), compression="zlib")
         ban_v[:] = stringtochar(np.array(data_dict["basin_algo_names"], dtype="S10"))
-        self.set_variable_atts(ban_v, metadata_json["postdiagnostics"]["basin"]["basin_algo_names"])
+        self.set_variable_atts(ban_v, plan.attrs("postdiagnostics", "basin", "basin_algo_names"))
         
-        var = self.write_var(b_grp, "realism_flags", "i4", ("num_reaches", "basin_num_algos"), data_dict["basin"])
-        self.set_variable_atts(var, metadata_json["postdiagnostics"]["basin"]["realism_flags"])
-        var = self.write_var(b_grp, "stability_flags", "i4", ("num_reaches", "basin_num_algos"), data_dict["basin"])
-        self.set_variable_atts(var, metadata_json["postdiagnostics"]["basin"]["stability_flags"])
-        var = self.write_var(b_grp, "prepost_flags", "i4", ("num_reaches", "basin_num_algos"), data_dict["basin"])
-        self.set_variable_atts(var, metadata_json["postdiagnostics"]["basin"]["prepost_flags"])
+        for name in ("realism_flags", "stability_flags", "prepost_flags"):
+            self.write_var(b_grp, name, "i1", ("num_reaches", "basin_num_algos"), data_dict["basin"],
+                           metadata=self.flag_attrs(plan.attrs("postdiagnostics", "basin", name)))
 
         # Reach
         r_grp = pd_grp.createGroup("reach")
@@ -284,15 +264,30 @@ class Postdiagnostics(AbstractModule):
         
         rna_v = r_grp.createVariable("reach_num_algos", "i4", ("reach_num_algos",), compression="zlib")
         rna_v[:] = range(1, data_dict["reach_num_algos"] + 1)
-        self.set_variable_atts(rna_v, metadata_json["postdiagnostics"]["reach"]["reach_num_algos"])
+        self.set_variable_atts(rna_v, plan.attrs("postdiagnostics", "reach", "reach_num_algos"))
         
         ran_v = r_grp.createVariable("reach_algo_names", "S1", ("reach_num_algos", "nchar"), compression="zlib")
         ran_v[:] = stringtochar(np.array(data_dict["reach_algo_names"], dtype="S10"))
-        self.set_variable_atts(ran_v, metadata_json["postdiagnostics"]["reach"]["reach_algo_names"])
+        self.set_variable_atts(ran_v, plan.attrs("postdiagnostics", "reach", "reach_algo_names"))
         
-        var = self.write_var(r_grp, "realism_flags", "i4", ("num_reaches", "reach_num_algos"), data_dict["reach"])
-        self.set_variable_atts(var, metadata_json["postdiagnostics"]["reach"]["realism_flags"])
-        var = self.write_var(r_grp, "stability_flags", "i4", ("num_reaches", "reach_num_algos"), data_dict["reach"])
-        self.set_variable_atts(var, metadata_json["postdiagnostics"]["reach"]["stability_flags"])
+        for name in ("realism_flags", "stability_flags"):
+            self.write_var(r_grp, name, "i1", ("num_reaches", "reach_num_algos"), data_dict["reach"],
+                           metadata=self.flag_attrs(plan.attrs("postdiagnostics", "reach", name)))
+
+        sos_ds.close()
+
+    @staticmethod
+    def flag_attrs(attrs):
+        """Return flag variable metadata with flag values typed as int8.
+
+        Range attributes are cast to the int8 flag variable when it is
+        created.
+
+        Parameters
+        ----------
+        attrs: dict
+            dictionary of variable metadata
+        """
 
-        sos_ds.close()
\ No newline at end of file
+        if "flag_values" not in attrs: return attrs
+        return { **attrs, "flag_values": np.array(attrs["flag_values"].split(), dtype=np.int8) }
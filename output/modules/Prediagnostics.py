@@ -7,6 +7,7 @@ from netCDF4 import Dataset
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
 
 class Prediagnostics(AbstractModule):
@@ -17,6 +18,9 @@ class Prediagnostics(AbstractModule):
     
     Attributes
     ----------
+    packed: bool
+        indicates 0/1 flags are stored packed into one bit field per
+        observation with other flags stored as int8
         
     Methods
     -------
@@ -61,6 +65,12 @@ class Prediagnostics(AbstractModule):
 
         super().__init__(cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s, \
             rids, nrids, nids)
+
+    @property
+    def packed(self):
+        """Return True if flags are stored packed into a bit field."""
+
+        return self.options.get("prediagflags", "int32") == "packed"
         
     def get_module_data(self):
         """Extract Prediagnostics results from NetCDF files."""
@@ -70,7 +80,10 @@ class Prediagnostics(AbstractModule):
         pre_files = [ Path(pre_file) for pre_file in glob.glob(f"{pre_dir}/{self.cont_ids}*.nc") ] 
         pre_rids = [ int(pre_file.name.split('_')[0]) for pre_file in pre_files ]
 
-        # Storage of results data
+        # Storage of results data (variables are named by the input files)
+        if len(pre_files) == 0:
+            self.logger.info('no prediagnostics files found; writing empty groups')
+            return { 'reach': { 'attrs': {} }, 'node': { 'attrs': {} } }
         pre_ds = Dataset(pre_dir / f"{pre_rids[0]}_prediagnostics.nc", 'r')
         pre_dict = self.create_data_dict(pre_ds)
         pre_ds.close()
@@ -84,10 +97,10 @@ class Prediagnostics(AbstractModule):
             for s_rid in self.sos_rids:
                 if s_rid in pre_rids:
                     pre_ds = Dataset(pre_dir / f"{int(s_rid)}_prediagnostics.nc", 'r')
-                    # Reach
-                    for a_variable in pre_ds['reach'].variables.keys():
-                        if a_variable != 'attrs':
-                            pre_dict['reach'][a_variable][index] = pre_ds['reach'][a_variable][:].filled(self.FILL["i4"])
+                    # Reach (only variables that will be written)
+                    for a_variable in pre_dict['reach'].keys():
+                        if a_variable != 'attrs' and a_variable in pre_ds['reach'].variables:
+                            pre_dict['reach'][a_variable][index] = self.read_var(pre_ds['reach'][a_variable], self.FILL["i4"])
                     # pre_dict["reach"]["ice_clim_f"][index] = pre_ds["reach"]["ice_clim_f"][:].filled(self.FILL["i4"])
                     # # pre_dict["reach"]["ice_dyn_f"][index] = pre_ds["reach"]["ice_dyn_f"][:].filled(self.FILL["i4"])
                     # pre_dict["reach"]["dark_frac"][index] = pre_ds["reach"]["dark_frac"][:].filled(self.FILL["i4"])
@@ -101,7 +114,7 @@ class Prediagnostics(AbstractModule):
                     # pre_dict["reach"]["low_slope_flag"][index] = pre_ds["reach"]["low_slope_flag"][:].filled(self.FILL["i4"])
                     # pre_dict["reach"]["d_x_area_flag"][index] = pre_ds["reach"]["d_x_area_flag"][:].filled(self.FILL["i4"])
                     # Node
-                    indexes = np.where(self.sos_nrids == s_rid)
+                    indexes = self.get_node_indexes(s_rid, index)
                     self._insert_nx(pre_dict, pre_ds, indexes)
                     pre_ds.close()
                 index += 1 
@@ -146,30 +159,21 @@ class Prediagnostics(AbstractModule):
                     # for a_variable in pre_ds['reach'].variables.keys():
                     #     pre_dict['reach'][a_variable][index] = pre_ds['reach'][a_variable][:].filled(self.FILL["i4"])
 
-        j = 0
-        for i in indexes[0]:
-            for a_variable in pre_ds['node'].variables.keys():
-                if a_variable != 'attrs':
-                    pre_dict['node'][a_variable][i] = pre_ds['node'][a_variable][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["ice_clim_f"][i] = pre_ds["node"]["ice_clim_f"][:,j].filled(self.FILL["i4"])
-            # # pre_dict["node"]["ice_dyn_f"][i] = pre_ds["node"]["ice_dyn_f"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["dark_frac"][i] = pre_ds["node"]["dark_frac"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["node_q"][i] = pre_ds["node"]["node_q"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["xovr_cal_q"][i] = pre_ds["node"]["xovr_cal_q"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["width_outliers"][i] = pre_ds["node"]["width_outliers"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["wse_outliers"][i] = pre_ds["node"]["wse_outliers"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["slope_outliers"][i] = pre_ds["node"]["slope_outliers"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["slope2_outliers"][i] = pre_ds["node"]["slope2_outliers"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["low_slope_flag"][i] = pre_ds["node"]["low_slope_flag"][:,j].filled(self.FILL["i4"])
-            # pre_dict["node"]["d_x_area_flag"][i] = pre_ds["node"]["d_x_area_flag"][:,j].filled(self.FILL["i4"])
-            j +=1
+        # Read each node variable once and scatter its columns to node rows
+        rows = indexes[0]
+        for a_variable in pre_dict['node'].keys():
+            if a_variable != 'attrs' and a_variable in pre_ds['node'].variables:
+                data = self.read_var(pre_ds['node'][a_variable], self.FILL["i4"])
+                columns = np.empty(rows.shape[0], dtype=object)
+                columns[:] = list(np.ascontiguousarray(data[:, :rows.shape[0]].T))
+                pre_dict['node'][a_variable][rows] = columns
     
     def create_data_dict(self, pre_ds):
         """Creates and returns Prediagnosics data dictionary."""
                         #     for a_variable in pre_ds['reach'].variables.keys():
                         # pre_dict['reach'][a_variable][index] = pre_ds['reach'][a_variable][:].filled(self.FILL["i4"])
-        reach_variables = pre_ds['reach'].variables.keys()
-        node_variables  = pre_ds['node'].variables.keys()
+        reach_variables = self.plan_names(("prediagnostics", "reach"), pre_ds['reach'].variables.keys())
+        node_variables  = self.plan_names(("prediagnostics", "node"), pre_ds['node'].variables.keys())
         data_dict = {
             'reach':{'attrs':{}},
             'node':{'attrs':{}}
@@ -280,7 +284,7 @@ class Prediagnostics(AbstractModule):
         
         ds = Dataset(nc_file, 'r')
         # Reach
-        for a_variable in ds['reach'].variables.keys():
+        for a_variable in self.plan_names(("prediagnostics", "reach"), ds['reach'].variables.keys()):
             if a_variable != 'attrs':
                 data_dict['reach']['attrs'][a_variable] = ds['reach'][a_variable].__dict__
         # data_dict["reach"]["attrs"]["ice_clim_f"] = ds["reach"]["ice_clim_f"].__dict__
@@ -296,7 +300,7 @@ class Prediagnostics(AbstractModule):
         # data_dict["reach"]["attrs"]["low_slope_flag"] = ds["reach"]["slope2_outliers"].__dict__
         # data_dict["reach"]["attrs"]["d_x_area_flag"] = ds["reach"]["slope2_outliers"].__dict__
         # # Node
-        for a_variable in ds['node'].variables.keys():
+        for a_variable in self.plan_names(("prediagnostics", "node"), ds['node'].variables.keys()):
             if a_variable != 'attrs':
                 data_dict['node']['attrs'][a_variable] = ds['node'][a_variable].__dict__
         # data_dict["node"]["attrs"]["ice_clim_f"] = ds["node"]["ice_clim_f"].__dict__
@@ -321,6 +325,7 @@ class Prediagnostics(AbstractModule):
             dictionary of Prediagnostic variables
         """
         
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         pre_grp = sos_ds.createGroup("prediagnostics")
         
@@ -328,10 +333,13 @@ class Prediagnostics(AbstractModule):
         r_grp = pre_grp.createGroup("reach")
         # for a_variable in ds['reach'].variables.keys():
         #     pre_dict['reach']['attrs'][a_variable] = ds['reach'][a_variable]
-        for a_variable in data_dict["reach"].keys():
-            if a_variable != 'attrs' and a_variable in metadata_json["prediagnostics"]["reach"].keys():
-                var = self.write_var_nt(r_grp, a_variable, self.vlen_i, ("num_reaches"), data_dict["reach"])
-                self.set_variable_atts(var, metadata_json["prediagnostics"]["reach"][a_variable])
+        if self.packed:
+            self._write_packed(sos_ds, r_grp, "num_reaches", data_dict["reach"], \
+                { name: plan.attrs("prediagnostics", "reach", name) for name in plan.names("prediagnostics", "reach") })
+        else:
+            for a_variable in data_dict["reach"].keys():
+                if a_variable != 'attrs' and plan.has("prediagnostics", "reach", a_variable):
+                    var = self.write_var_nt(r_grp, a_variable, self.vlen_i, ("num_reaches"), data_dict["reach"], metadata=plan.attrs("prediagnostics", "reach", a_variable))
 
         # var = self.write_var_nt(r_grp, "ice_clim_f", self.vlen_i, ("num_reaches"), data_dict["reach"])
         # self.set_variable_atts(var, metadata_json["prediagnostics"]["reach"]["ice_clim_f"])
@@ -365,10 +373,13 @@ class Prediagnostics(AbstractModule):
         n_grp = pre_grp.createGroup("node")
 
 
-        for a_variable in data_dict["node"].keys():
-            if a_variable != 'attrs' and a_variable in metadata_json["prediagnostics"]["node"].keys():
-                var = self.write_var_nt(n_grp, a_variable, self.vlen_i, ("num_nodes"), data_dict["node"])
-                self.set_variable_atts(var, metadata_json["prediagnostics"]["node"][a_variable])
+        if self.packed:
+            self._write_packed(sos_ds, n_grp, "num_nodes", data_dict["node"], \
+                { name: plan.attrs("prediagnostics", "node", name) for name in plan.names("prediagnostics", "node") })
+        else:
+            for a_variable in data_dict["node"].keys():
+                if a_variable != 'attrs' and plan.has("prediagnostics", "node", a_variable):
+                    var = self.write_var_nt(n_grp, a_variable, self.vlen_i, ("num_nodes"), data_dict["node"], metadata=plan.attrs("prediagnostics", "node", a_variable))
 
         # var = self.write_var_nt(n_grp, "ice_clim_f", self.vlen_i, ("num_nodes"), data_dict["node"])
         # self.set_variable_atts(var, metadata_json["prediagnostics"]["node"]["ice_clim_f"])
@@ -392,4 +403,89 @@ class Prediagnostics(AbstractModule):
         # self.set_variable_atts(var, metadata_json["prediagnostics"]["node"]["low_slope_flag"])
         # var = self.write_var_nt(n_grp, "d_x_area_flag", self.vlen_i, ("num_nodes"), data_dict["node"])
         # self.set_variable_atts(var, metadata_json["prediagnostics"]["node"]["d_x_area_flag"])
-        sos_ds.close()
\ No newline at end of file
+        sos_ds.close()
+
+    def _write_packed(self, sos_ds, grp, dim, data_dict, metadata):
+        """Write 0/1 flags packed into a bit field and other flags as int8.
+        
+        Flags are packed when their metadata flag_values are "0 1" so every
+        results file has the same bit layout. Each packed flag has a value
+        bit and a missing bit (set where the flag holds the fill value) so
+        the bit field of an observation holds two bits per flag. Packed
+        flag values other than 0 and 1 and int8 values out of range are
+        logged and stored as missing.
+        
+        Parameters
+        ----------
+        sos_ds: netCDF4.Dataset
+            SoS results file
+        grp: netCDF4._netCDF4.Group
+            reach or node prediagnostics group to write to
+        dim: str
+            name of reach or node dimension
+        data_dict: dict
+            dictionary of reach or node Prediagnostic variables
+        metadata: dict
+            dictionary of selected reach or node Prediagnostic metadata
+        """
+        
+        names = [ name for name in data_dict.keys() if name != 'attrs' and name in metadata.keys() ]
+        values = { name: np.concatenate(data_dict[name]) for name in names }
+        flags = [ name for name in metadata.keys() if metadata[name].get("flag_values") == "0 1" ]
+        # Rows without data hold a single fill value (see create_data_dict)
+        lengths = np.array([ row.shape[0] for row in data_dict[names[0]] ]) if names \
+            else np.ones(sos_ds.dimensions[dim].size, dtype=np.int64)
+        
+        if "flags" in metadata and not flags:
+            self.logger.warning(f"Prediagnostic {grp.name} flags are selected but there are no 0/1 flags to pack.")
+        
+        if flags:
+            if 2 * len(flags) > 32:
+                raise ValueError(f"Cannot pack {len(flags)} flags into a 32-bit field.")
+            dtype = np.uint16 if 2 * len(flags) <= 16 else np.uint32
+            packed = np.zeros(lengths.sum(), dtype=dtype)
+            for bit, name in enumerate(flags):
+                flag = values[name] if name in values else np.full(packed.shape[0], self.FILL["i4"])
+                if flag.shape[0] != packed.shape[0]:
+                    raise ValueError(f"Flag {name} does not have the same number of observations as {names[0]}.")
+                invalid = ~np.isin(flag, [0, 1, self.FILL["i4"]])
+                if invalid.any():
+                    self.logger.warning(f"Prediagnostic flag {name} holds {invalid.sum()} values other than 0 and 1; storing them as missing.")
+                packed[flag == 1] |= dtype(1 << bit)
+                packed[(flag == self.FILL["i4"]) | invalid] |= dtype(1 << (len(flags) + bit))
+            
+            var = grp.createVariable("flags", self.get_vltype(sos_ds, dtype, f"vlen_{np.dtype(dtype).name}"), (dim,))
+            self.set_variable_atts(var, metadata["flags"])
+            var.flag_masks = (1 << np.arange(2 * len(flags))).astype(dtype)
+            var.flag_meanings = " ".join(flags + [ f"{name}_missing" for name in flags ])
+            self.write_rows(var, var.datatype, self._split_rows(packed, lengths))
+        
+        # Remaining flags (enumerations) as int8
+        vlen_b = self.get_vltype(sos_ds, np.int8, "vlen_byte")
+        int8_range = np.iinfo(np.int8)
+        for name in names:
+            if name in flags: continue
+            lengths = np.array([ row.shape[0] for row in data_dict[name] ])
+            missing = values[name] == self.FILL["i4"]
+            invalid = ~missing & ((values[name] < int8_range.min) | (values[name] > int8_range.max))
+            if invalid.any():
+                self.logger.warning(f"Prediagnostic flag {name} holds {invalid.sum()} values out of the int8 range; storing them as missing.")
+            int8_values = np.where(missing | invalid, self.FILL["i1"], values[name]).astype(np.int8)
+            int8_dict = { name: self._split_rows(int8_values, lengths), "attrs": data_dict["attrs"] }
+            self.write_var_nt(grp, name, vlen_b, (dim,), int8_dict, fill=np.int8(self.FILL["i1"]),
+                              metadata=metadata[name])
+        
+    def _split_rows(self, values, lengths):
+        """Return object array of per-row arrays split from values.
+        
+        Parameters
+        ----------
+        values: nd.array
+            concatenated values of every row
+        lengths: nd.array
+            number of values in each row
+        """
+        
+        rows = np.empty(lengths.shape[0], dtype=object)
+        rows[:] = np.split(values, np.cumsum(lengths)[:-1])
+        return rows
@@ -13,10 +13,8 @@ class Priors(AbstractModule):
     
     Attributes
     ----------
-    sos: netcdf4 Dataset
-        NetCDF4 Dataset for current SoS priors file
-    suffix: str
-        string suffix of priors file
+    prior_sos: PriorSoS
+        shared handle on the current SoS priors file
         
     Methods
     -------
@@ -24,41 +22,55 @@ class Priors(AbstractModule):
         append module data to the new version of the SoS result file.
     create_data_dict()
         creates and returns module data dictionary.
+    from_context(context, input_dir)
+        create and return module from a ModuleContext.
     get_module_data()
         retrieve module results from NetCDF files.
-    open_sos(self)
-        open current SoS dataset for reading.
-    close_sos(self)
-        closes current SoS dataset.
+    input_files()
+        return path of the priors file the module reads.
     """
     
-    def __init__(self, cont_ids, input_dir, sos_new, logger, suffix):
+    def __init__(self, cont_ids, prior_sos, sos_new, logger):
         """
         Parameters
         ----------
         cont_ids: list
             list of continent identifiers
-        input_dir: Path
-            path to input directory
+        prior_sos: PriorSoS
+            shared handle on the current SoS priors file
         sos_new: Path
             path to new SOS file
         logger: logging.Logger
             logger to log statements with
-        suffix: str
-            string suffix of priors file
         """
 
-        self.suffix = suffix
-        super().__init__(cont_ids, input_dir, sos_new, logger)
+        self.prior_sos = prior_sos
+        super().__init__(cont_ids, prior_sos.path.parent, sos_new, logger)
         
+    @classmethod
+    def from_context(cls, context, input_dir):
+        """Create and return module from a ModuleContext.
+
+        Parameters
+        ----------
+        context: ModuleContext
+            state shared by every module in an Output run
+        input_dir: Path
+            path to input directory
+        """
+
+        module = cls(context.cont_ids, context.prior_sos, context.sos_new, context.logger)
+        return module.set_context(context)
+
+    def input_files(self):
+        """Return path of the priors file the module reads."""
+
+        return [self.prior_sos.path]
+
     def get_module_data(self):
         """Extract and return model group from priors SoS file."""
         
-        continent = self.sos_new.stem.split('_')[0]
-        sos_cur = Dataset(self.input_dir / f"{continent}_{self.suffix}.nc", 'r')
-        pri_dict = self.create_data_dict(sos_cur)
-        sos_cur.close()
-        return pri_dict        
+        return self.create_data_dict(self.prior_sos.dataset)
         
     def create_data_dict(self, sos):
         """Creates and returns Priors NetCDF 'model' group data dictionary."""
@@ -77,7 +89,7 @@ class Priors(AbstractModule):
                 "data_type": variable.datatype,
                 "dimensions": variable.dimensions,
                 "attributes": variable.__dict__,
-                "data": variable[:]
+                "data": self.prior_sos.read(variable)
             }
         
         return {
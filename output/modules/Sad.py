@@ -7,6 +7,7 @@ from netCDF4 import Dataset
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
 
 class Sad(AbstractModule):
@@ -18,6 +19,8 @@ class Sad(AbstractModule):
 
     Attributes
     ----------
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
 
     Methods
     -------
@@ -31,6 +34,8 @@ class Sad(AbstractModule):
         get NetCDF attributes for each NetCDF variable.
     """
 
+    INPUT_FILES = ("sad/{cont_ids}*.nc",)
+
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s,
                  rids, nrids, nids):
         
@@ -82,10 +87,10 @@ class Sad(AbstractModule):
             for s_rid in self.sos_rids:
                 if s_rid in sd_rids:
                     sd_ds = Dataset(sd_dir / f"{int(s_rid)}_sad.nc", 'r')
-                    sd_dict["A0"][index] = sd_ds["A0"][:].filled(np.nan)
-                    sd_dict["n"][index] = sd_ds["n"][:].filled(np.nan)
-                    sd_dict["Qa"][index] = sd_ds["Qa"][:].filled(self.FILL["f8"])
-                    sd_dict["Q_u"][index] = sd_ds["Q_u"][:].filled(self.FILL["f8"])
+                    sd_dict["A0"][index] = self.read_var(sd_ds["A0"], np.nan)
+                    sd_dict["n"][index] = self.read_var(sd_ds["n"], np.nan)
+                    sd_dict["Qa"][index] = self.read_var(sd_ds["Qa"], self.FILL["f8"])
+                    sd_dict["Q_u"][index] = self.read_var(sd_ds["Q_u"], self.FILL["f8"])
                     sd_ds.close()               
                 index += 1
         return sd_dict
@@ -138,16 +143,13 @@ class Sad(AbstractModule):
             dictionary of SAD variables
         """
 
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         sd_grp = sos_ds.createGroup("sad")
 
         # SAD data
-        var = self.write_var(sd_grp, "A0", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["sad"]["A0"])
-        var = self.write_var(sd_grp, "n", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["sad"]["n"])
-        var = self.write_var_nt(sd_grp, "Qa", self.vlen_f, ("num_reaches"), data_dict)
-        self.set_variable_atts(var, metadata_json["sad"]["Qa"])
-        var = self.write_var_nt(sd_grp, "Q_u", self.vlen_f, ("num_reaches"), data_dict)
-        self.set_variable_atts(var, metadata_json["sad"]["Q_u"])
+        var = self.write_var(sd_grp, "A0", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("sad", "A0"))
+        var = self.write_var(sd_grp, "n", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("sad", "n"))
+        var = self.write_var_nt(sd_grp, "Qa", self.vlen_f, ("num_reaches"), data_dict, metadata=plan.attrs("sad", "Qa"))
+        var = self.write_var_nt(sd_grp, "Q_u", self.vlen_f, ("num_reaches"), data_dict, metadata=plan.attrs("sad", "Q_u"))
         sos_ds.close()
\ No newline at end of file
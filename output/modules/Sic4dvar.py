@@ -7,6 +7,7 @@ from netCDF4 import Dataset
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
 
 class Sic4dvar(AbstractModule):
@@ -18,6 +19,8 @@ class Sic4dvar(AbstractModule):
 
     Attributes
     ----------
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
     
     Methods
     -------
@@ -33,6 +36,8 @@ class Sic4dvar(AbstractModule):
         append SIC4DVar result data to dictionary with nx dimension
     """
 
+    INPUT_FILES = ("sic4dvar/{cont_ids}*.nc",)
+
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s,
                  rids, nrids, nids):
         
@@ -84,13 +89,13 @@ class Sic4dvar(AbstractModule):
             for s_rid in self.sos_rids:
                 if s_rid in sv_rids:
                     sv_ds = Dataset(sv_dir / f"{int(s_rid)}_sic4dvar.nc", 'r')
-                    sv_dict["A0"][index] = sv_ds["A0"][:].filled(np.nan)
-                    sv_dict["n"][index] = sv_ds["n"][:].filled(np.nan)                    
+                    sv_dict["A0"][index] = self.read_var(sv_ds["A0"], np.nan)
+                    sv_dict["n"][index] = self.read_var(sv_ds["n"], np.nan)                    
                     # sv_dict["Qalgo5"][index] = sv_ds["Qalgo5"][:].filled(self.FILL["f8"])
                     # sv_dict["Qalgo31"][index] = sv_ds["Qalgo31"][:].filled(self.FILL["f8"])
-                    sv_dict["Q_mm"][index] = sv_ds["Q_mm"][:].filled(self.FILL["f8"])
-                    sv_dict["Q_da"][index] = sv_ds["Q_da"][:].filled(self.FILL["f8"])
-                    indexes = np.where(s_rid == self.sos_nrids)
+                    sv_dict["Q_mm"][index] = self.read_var(sv_ds["Q_mm"], self.FILL["f8"])
+                    sv_dict["Q_da"][index] = self.read_var(sv_ds["Q_da"], self.FILL["f8"])
+                    indexes = self.get_node_indexes(s_rid, index)
                     sv_dict["node_id"][indexes] = self.sos_nids[indexes]
                     # self.__insert_nx(sv_dict, sv_ds, indexes)
                     sv_ds.close()
@@ -172,18 +177,15 @@ class Sic4dvar(AbstractModule):
             dictionary of SIC4DVar variables
         """
 
+        plan = MetadataPlan.of(metadata_json)
         sos_ds = Dataset(self.sos_new, 'a')
         sv_grp = sos_ds.createGroup("sic4dvar")
 
         # SIC4DVar data
 
-        var = self.write_var(sv_grp, "A0", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["sic4dvar"]["A0"])
-        var = self.write_var(sv_grp, "n", "f8", ("num_reaches",), data_dict)
-        self.set_variable_atts(var, metadata_json["sic4dvar"]["n"])
-        var = self.write_var_nt(sv_grp, "Q_mm", self.vlen_f, ("num_reaches"), data_dict)
-        self.set_variable_atts(var, metadata_json["sic4dvar"]["Q_mm"])
-        var = self.write_var_nt(sv_grp, "Q_da", self.vlen_f, ("num_reaches"), data_dict)
-        self.set_variable_atts(var, metadata_json["sic4dvar"]["Q_da"])
+        var = self.write_var(sv_grp, "A0", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("sic4dvar", "A0"))
+        var = self.write_var(sv_grp, "n", "f8", ("num_reaches",), data_dict, metadata=plan.attrs("sic4dvar", "n"))
+        var = self.write_var_nt(sv_grp, "Q_mm", self.vlen_f, ("num_reaches"), data_dict, metadata=plan.attrs("sic4dvar", "Q_mm"))
+        var = self.write_var_nt(sv_grp, "Q_da", self.vlen_f, ("num_reaches"), data_dict, metadata=plan.attrs("sic4dvar", "Q_da"))
         
         sos_ds.close()
\ No newline at end of file
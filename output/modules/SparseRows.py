@@ -0,0 +1,80 @@
+# Third-party imports
+import numpy as np
+
+class SparseRows:
+    """Class that holds ragged array rows for only the reaches with output.
+
+    Rows that were never set read as a shared fill array and are only
+    materialized, in bulk, when the rows are written to the SoS.
+
+    Attributes
+    ----------
+    fill: nd.array
+        array returned for rows that were not set
+    num_rows: int
+        number of rows (reaches or nodes)
+    rows: nd.array
+        array of rows that were set, in the order they were set
+    shape: tuple
+        shape of the dense object array the rows represent
+
+    Methods
+    -------
+    to_array()
+        return dense object array of every row.
+    """
+
+    def __init__(self, num_rows, fill):
+        """
+        Parameters
+        ----------
+        num_rows: int
+            number of rows (reaches or nodes)
+        fill: nd.array
+            array returned for rows that were not set
+        """
+
+        self.num_rows = num_rows
+        self.fill = fill
+        self.__values = {}
+
+    @property
+    def rows(self):
+        """Return array of rows that were set."""
+
+        return np.fromiter(self.__values.keys(), dtype=np.int64, count=len(self.__values))
+
+    @property
+    def shape(self):
+        """Return shape of the dense object array."""
+
+        return (self.num_rows,)
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0: key += self.num_rows
+            if not 0 <= key < self.num_rows: raise IndexError(f"Row {key} is out of range.")
+            return self.__values.get(int(key), self.fill)
+        return self.to_array()[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, (int, np.integer)):
+            if key < 0: key += self.num_rows
+            if not 0 <= key < self.num_rows: raise IndexError(f"Row {key} is out of range.")
+            self.__values[int(key)] = value
+        else:
+            # Array of rows and a matching sequence of row values
+            for row, row_value in zip(np.arange(self.num_rows)[key], value):
+                self.__values[int(row)] = row_value
+
+    def to_array(self):
+        """Return dense object array of every row."""
+
+        dense = np.empty(self.num_rows, dtype=object)
+        dense.fill(self.fill)
+        for row, value in self.__values.items():
+            dense[row] = value
+        return dense
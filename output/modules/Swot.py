@@ -8,6 +8,7 @@ from netCDF4 import chartostring
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
 
 class Swot(AbstractModule):
@@ -19,19 +20,38 @@ class Swot(AbstractModule):
 
     Attributes
     ----------
+    CACHE_STATE: tuple
+        time range cached with extracted data
+    INPUT_FILES: tuple
+        glob patterns of the input files read under input_dir
+    node_obs: str
+        node observations storage: "string" (pass list per node) or "index"
+        (row of the reach-level observations)
+    time_max: float
+        maximum valid node time extracted (None if no valid times)
+    time_min: float
+        minimum valid node time extracted (None if no valid times)
+    TIME_FILL: list
+        time fill values to exclude from the minimum and maximum
 
     Methods
     -------
     append_module_data(data_dict)
         append module data to the new version of the SoS result file.
-    create_data_dict()
+    create_data_dict(num_reaches, num_nodes)
         creates and returns module data dictionary.
     get_module_data()
         retrieve module results from NetCDF files.
     get_nc_attrs(nc_file, data_dict)
         get NetCDF attributes for each NetCDF variable.
+    stream_module_data(metadata_json)
+        extract and append SWOT time data in blocks of stream_block reaches.
     """
 
+    TIME_FILL = [-999999999999.0, -9999.0]
+    CACHE_STATE = ("time_min", "time_max")
+    INPUT_FILES = ("swot/{cont_ids}*.nc",)
+
     def __init__(self, cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s,
                  rids, nrids, nids):
         """
@@ -61,61 +81,152 @@ class Swot(AbstractModule):
 
         super().__init__(cont_ids, input_dir, sos_new, logger, vlen_f, vlen_i, vlen_s, \
             rids, nrids, nids)
+        self.time_min = None
+        self.time_max = None
+
+    @property
+    def node_obs(self):
+        """Return node observations storage option ("string" or "index")."""
+
+        return self.options.get("nodeobs", "string")
 
     def get_module_data(self):
         """Extract SWOT time data from NetCDF files."""
 
-        # Files and reach identifiers
+        swot_dir, swot_rids, first_file = self.__find_swot_files()
+
+        # Storage of time data and variable attributes
+        swot_dict = self.create_data_dict()
+        self.get_nc_attrs(first_file, swot_dict)
+
+        # Data extraction
+        for index, s_rid in enumerate(self.sos_rids):
+            if s_rid in swot_rids:
+                self.__read_swot_file(swot_dir, s_rid, swot_dict, index, 
+                                      self.get_node_indexes(s_rid, index), index)
+        return swot_dict
+
+    def stream_module_data(self, metadata_json):
+        """Extract and append SWOT time data in blocks of stream_block reaches.
+
+        Variables are created up front and only the reaches of a block and
+        their nodes are held in memory before they are written to their rows
+        in the SoS. Nodes without a reach in the SoS are written as fill.
+
+        Parameters
+        ----------
+        metadata_json: dict
+            dictionary of SoS variable metadata
+        """
+
+        swot_dir, swot_rids, first_file = self.__find_swot_files()
+        attrs_dict = self.create_data_dict(0, 0)
+        self.get_nc_attrs(first_file, attrs_dict)
+
+        sos_ds = Dataset(self.sos_new, 'a')
+        variables = self.__create_vars(sos_ds, attrs_dict, MetadataPlan.of(metadata_json))
+        num_reaches = self.sos_rids.shape[0]
+        for start in range(0, num_reaches, self.stream_block):
+            stop = min(start + self.stream_block, num_reaches)
+            node_rows = [ self.get_node_indexes(self.sos_rids[index], index)[0] for index in range(start, stop) ]
+            block_dict = self.create_data_dict(stop - start, sum(rows.shape[0] for rows in node_rows))
+            offset = 0
+            for index in range(start, stop):
+                num_nodes = node_rows[index - start].shape[0]
+                s_rid = self.sos_rids[index]
+                if s_rid in swot_rids:
+                    self.__read_swot_file(swot_dir, s_rid, block_dict, index - start, 
+                                          (np.arange(offset, offset + num_nodes),), index)
+                offset += num_nodes
+            self.__write_rows(variables, block_dict, start, np.concatenate(node_rows))
+
+        orphans = np.flatnonzero(np.isin(self.sos_nrids, self.sos_rids, invert=True))
+        if orphans.shape[0] != 0:
+            self.__write_rows(variables, self.create_data_dict(0, orphans.shape[0]), 0, orphans)
+        sos_ds.close()
+
+    def __find_swot_files(self):
+        """Return SWOT directory, set of reach identifiers with files and a first file.
+
+        Raises
+        ------
+        ValueError
+            if there are no SWOT files for the continent
+        """
+
         swot_dir = self.input_dir / "swot"
         swot_files = [ Path(swot_file) for swot_file in glob.glob(f"{swot_dir}/{self.cont_ids}*.nc") ] 
-        swot_rids = [ int(swot_file.name.split('_')[0]) for swot_file in swot_files ]
+        if len(swot_files) == 0: raise ValueError('no swot files found')
+        swot_rids = { int(swot_file.name.split('_')[0]) for swot_file in swot_files }
+        return swot_dir, swot_rids, swot_dir / swot_files[0]
 
-        # Storage of time data
-        swot_dict = self.create_data_dict()
+    def __read_swot_file(self, swot_dir, s_rid, swot_dict, row, node_indexes, index):
+        """Read reach and node time data of a SWOT file into a data dictionary.
+
+        Parameters
+        ----------
+        swot_dir: Path
+            path to SWOT directory
+        s_rid: int
+            reach identifier
+        swot_dict: dict
+            dictionary of SWOT data
+        row: int
+            row of the reach in the reach-level data
+        node_indexes: tuple
+            rows of the reach's nodes in the node-level data
+        index: int
+            row of the reach in sos_rids
+        """
+
+        swot_ds = Dataset(swot_dir / f"{int(s_rid)}_SWOT.nc", 'r')
         
-        if len(swot_files) != 0:
-            # Storage of variable attributes
-            self.get_nc_attrs(swot_dir / swot_files[0], swot_dict)
+        # Reach
+        observations = ','.join(chartostring(swot_ds["observations"][:]))
+        swot_dict["reach"]["observations"][row] = observations
+        swot_dict["reach"]["time"][row] = self.read_var(swot_ds["reach"]["time"], self.FILL["f8"])
         
-            # Data extraction
-            index = 0
-            for s_rid in self.sos_rids:
-                if s_rid in swot_rids:
-                    swot_ds = Dataset(swot_dir / f"{int(s_rid)}_SWOT.nc", 'r')
-                    
-                    # Reach
-                    swot_dict["reach"]["observations"][index] = ','.join(chartostring(swot_ds["observations"][:]))
-                    swot_dict["reach"]["time"][index] = swot_ds["reach"]["time"][:].filled(self.FILL["f8"])
-                    
-                    # Node
-                    indexes = np.where(self.sos_nrids == s_rid)
-                    self._insert_nx(swot_dict, swot_ds, indexes)
-                    
-                    swot_ds.close()
-                index += 1
-        else:
-            raise ValueError('no swot files found')
-        return swot_dict
+        # Node
+        self._insert_nx(swot_dict, swot_ds, node_indexes, observations, index)
+        
+        swot_ds.close()
     
-    def create_data_dict(self):
-        """Creates and returns SWOT time data dictionary."""
+    def create_data_dict(self, num_reaches=None, num_nodes=None):
+        """Creates and returns SWOT time data dictionary.
 
+        Parameters
+        ----------
+        num_reaches: int
+            number of reach rows (defaults to the reaches of the SoS)
+        num_nodes: int
+            number of node rows (defaults to the nodes of the SoS)
+        """
+
+        if num_reaches is None: num_reaches = self.sos_rids.shape[0]
+        if num_nodes is None: num_nodes = self.sos_nids.shape[0]
         data_dict = {
             "reach": {
-                "time": np.empty((self.sos_rids.shape[0]), dtype=object),
-                "observations": np.empty((self.sos_rids.shape[0]), dtype=object),
+                "time": np.empty((num_reaches), dtype=object),
+                "observations": np.empty((num_reaches), dtype=object),
                 "attrs": {"time": {}, "observations": {}}
                 },
             "node": {
-                "time": np.empty((self.sos_nids.shape[0]), dtype=object),
-                "observations": np.empty((self.sos_nids.shape[0]), dtype=object),
-                "attrs": {"time": {}, "observations": {}}
+                "time": np.empty((num_nodes), dtype=object),
+                "attrs": {"time": {}}
                 }            
         }
+        # Node observations are either pass lists or rows of the reach-level observations
+        if self.node_obs == "index":
+            data_dict["node"]["observations_index"] = np.full(num_nodes, self.FILL["i4"], dtype=np.int32)
+            data_dict["node"]["attrs"]["observations_index"] = {}
+        else:
+            data_dict["node"]["observations"] = np.empty((num_nodes), dtype=object)
+            data_dict["node"]["observations"].fill("xxxxxxxxxx")
+            data_dict["node"]["attrs"]["observations"] = {}
+        
         # Vlen variables
         data_dict["reach"]["observations"].fill("xxxxxxxxxx")
         data_dict["reach"]["time"].fill(np.array([self.FILL["f8"]]))
-        data_dict["node"]["observations"].fill("xxxxxxxxxx")
         data_dict["node"]["time"].fill(np.array([self.FILL["f8"]]))
         return data_dict
         
@@ -133,12 +244,12 @@ class Swot(AbstractModule):
         ds = Dataset(nc_file, 'r')
         data_dict["reach"]["attrs"]["observations"] = ds["observations"].__dict__
         data_dict["reach"]["attrs"]["time"] = ds["reach"]["time"].__dict__
-        data_dict["node"]["attrs"]["observations"] = ds["observations"].__dict__
+        if self.node_obs != "index": data_dict["node"]["attrs"]["observations"] = ds["observations"].__dict__
         data_dict["node"]["attrs"]["time"] = ds["node"]["time"].__dict__
         ds.close()
         
-    def _insert_nx(self, swot_dict, swot_ds, indexes):
-        """Insert node flags into prediagnostics dictionary.
+    def _insert_nx(self, swot_dict, swot_ds, indexes, observations, reach_index):
+        """Insert node observations and time into SWOT dictionary.
         
         Parameters
         ----------
@@ -147,20 +258,50 @@ class Swot(AbstractModule):
         swot_ds: netCDF4.Dataset
             SWOT NetCDF dataset reference
         indexes: list
-            list of integer indexes to insert node flags at
+            list of integer indexes to insert node data at
+        observations: str
+            comma-separated cycle pass observations of the reach
+        reach_index: int
+            row of the reach in the reach-level data
         """
+
+        # Row of the reach in the results file when only some reaches are processed
+        if self.reach_rows is not None: reach_index = self.reach_rows[reach_index]
         
         j = 0
 
         for i in indexes[0]:
             try:
-                swot_dict["node"]["observations"][i] = ','.join(chartostring(swot_ds["observations"][:]))
-                swot_dict["node"]["time"][i] = swot_ds["node"]["time"][j,:].filled(self.FILL["f8"])
+                if self.node_obs == "index":
+                    swot_dict["node"]["observations_index"][i] = reach_index
+                else:
+                    swot_dict["node"]["observations"][i] = observations
+                swot_dict["node"]["time"][i] = self.read_var(swot_ds["node"]["time"], self.FILL["f8"], (j, slice(None)))
+                self._update_time_range(swot_dict["node"]["time"][i])
             except:
-                self.logging.warn('time variable filled, reach was partially observed')
+                self.logger.warning('time variable filled, reach was partially observed')
                 return
             j +=1
         
+    def _update_time_range(self, time):
+        """Update running minimum and maximum with valid node times.
+        
+        Parameters
+        ----------
+        time: nd.array
+            array of node time values
+        """
+        
+        invalid = np.isnan(time)
+        for fill in self.TIME_FILL:
+            invalid |= np.isclose(time, fill)
+        if invalid.all(): return
+        
+        time = time[~invalid]
+        t_min, t_max = time.min(), time.max()
+        self.time_min = t_min if self.time_min is None else min(self.time_min, t_min)
+        self.time_max = t_max if self.time_max is None else max(self.time_max, t_max)
+        
     def append_module_data(self, data_dict, metadata_json):
         """Append SWOT time data to the new version of the SoS.
         
@@ -171,17 +312,57 @@ class Swot(AbstractModule):
         """
 
         sos_ds = Dataset(self.sos_new, 'a')
+        variables = self.__create_vars(sos_ds, data_dict, MetadataPlan.of(metadata_json))
+        self.__write_rows(variables, data_dict, 0)
+        sos_ds.close()
+
+    def __create_vars(self, sos_ds, data_dict, plan):
+        """Create SWOT time variables and return them with their types.
+
+        Parameters
+        ----------
+        sos_ds: netCDF4.Dataset
+            SoS dataset to create variables in
+        data_dict: dict
+            dictionary of SWOT time variables and attributes
+        plan: MetadataPlan
+            SoS metadata plan
+        """
+
+        reach_attrs, node_attrs = data_dict["reach"]["attrs"], data_dict["node"]["attrs"]
+        variables = {}
 
         # Reach
-        var = self.write_var_nt(sos_ds["reaches"], "observations", str, ("num_reaches"), data_dict["reach"], fill=-1)
-        self.set_variable_atts(var, metadata_json["reaches"]["observations"])
-        var = self.write_var_nt(sos_ds["reaches"], "time", self.vlen_f, ("num_reaches"), data_dict["reach"])
-        self.set_variable_atts(var, metadata_json["reaches"]["time"])
+        variables["reach", "observations"] = (self.create_var_nt(sos_ds["reaches"], "observations", str, ("num_reaches"), reach_attrs["observations"], fill=-1, metadata=plan.attrs("reaches", "observations")), str)
+        variables["reach", "time"] = (self.create_var_nt(sos_ds["reaches"], "time", self.vlen_f, ("num_reaches"), reach_attrs["time"], metadata=plan.attrs("reaches", "time")), self.vlen_f)
         
         # Node
-        var = self.write_var_nt(sos_ds["nodes"], "observations", str, ("num_nodes"), data_dict["node"], fill=-1)
-        self.set_variable_atts(var, metadata_json["nodes"]["observations"])
-        var = self.write_var_nt(sos_ds["nodes"], "time", self.vlen_f, ("num_nodes"), data_dict["node"])
-        self.set_variable_atts(var, metadata_json["nodes"]["time"])
-        
-        sos_ds.close()
\ No newline at end of file
+        if self.node_obs == "index":
+            variables["node", "observations_index"] = (self.create_var(sos_ds["nodes"], "observations_index", "i4", ("num_nodes",), node_attrs["observations_index"], metadata=plan.attrs("nodes", "observations_index")), "i4")
+        else:
+            variables["node", "observations"] = (self.create_var_nt(sos_ds["nodes"], "observations", str, ("num_nodes"), node_attrs["observations"], fill=-1, metadata=plan.attrs("nodes", "observations")), str)
+        variables["node", "time"] = (self.create_var_nt(sos_ds["nodes"], "time", self.vlen_f, ("num_nodes"), node_attrs["time"], metadata=plan.attrs("nodes", "time")), self.vlen_f)
+        return variables
+
+    def __write_rows(self, variables, data_dict, start, node_rows=None):
+        """Write SWOT time data to rows of the SoS variables.
+
+        Parameters
+        ----------
+        variables: dict
+            dictionary of (variable, type) keyed by level and name
+        data_dict: dict
+            dictionary of SWOT time variables
+        start: int
+            first reach row to write to
+        node_rows: nd.array
+            node row to write each node to (defaults to consecutive rows
+            from the first node row)
+        """
+
+        for (level, name), (var, type) in variables.items():
+            data = data_dict[level][name]
+            if level == "node" and node_rows is not None:
+                self.write_row_runs(var, type, node_rows, data)
+            else:
+                self.write_rows(var, type, data, start)
@@ -3,12 +3,26 @@ import glob
 from pathlib import Path
 
 # Third-party imports
-from netCDF4 import Dataset
+from netCDF4 import Dataset, chartostring
 import numpy as np
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.AbstractModule import AbstractModule
 
+# (SoS variable name, validation file variable prefix) of each statistic
+STATS = [
+    ("nse", "NSE"),
+    ("rsq", "Rsq"),
+    ("kge", "KGE"),
+    ("rmse", "RMSE"),
+    ("nrmse", "nRMSE"),
+    ("nbias", "nBIAS"),
+    ("sige", "SIGe"),
+    ("spearmanr", "Spearmanr"),
+    ("testn", "testn")
+]
+
 class Validation(AbstractModule):
     """A class that represent the results of running Validation.
     
@@ -17,6 +31,8 @@ class Validation(AbstractModule):
 
     Attributes
     ----------
+    legacy_layout: bool
+        indicates algo_names and gageid are written as character matrices
     num_algos: int
             number of algorithms stats were produced for
     nchar: int
@@ -26,12 +42,30 @@ class Validation(AbstractModule):
     -------
     append_module_data(data_dict)
         append module data to the new version of the SoS result file.
-    create_data_dict()
+    create_data_dict(empty=False, num_rows=None)
         creates and returns module data dictionary.
+    from_context(context, input_dir)
+        create and return module from a ModuleContext.
     get_module_data()
         retrieve module results from NetCDF files.
     get_nc_attrs(nc_file, data_dict)
         get NetCDF attributes for each NetCDF variable.
+    stream_module_data(metadata_json)
+        extract and append Validation results in blocks of stream_block reaches.
+    __create_vars(sos_ds, data_dict, metadata_json)
+        create Validation variables and write algorithm names
+    __find_val_files()
+        return validation directory, reach identifiers and a first file
+    __read_reaches(val_dict, val_dir, val_rids, start, stop)
+        read validation files of a range of reaches
+    __read_stats(val_ds, suffix, block)
+        read statistic variables of a validation file into a block
+    __write_rows(variables, data_dict, start)
+        write Validation data to rows of the SoS variables
+    __gageid_names(data_dict)
+        return gage identifier of each reach from codes and table
+    __to_chars(names)
+        return character matrix of names
     __retrieve_dimensions(val_dir, reach_id)
         retrieve num_algos and nchar dimensions
     """
@@ -88,56 +122,150 @@ class Validation(AbstractModule):
         super().__init__(cont_ids, input_dir, sos_new, logger, rids=rids, nrids=nrids, 
                          nids=nids)
 
+    @property
+    def legacy_layout(self):
+        """Return True if algo_names and gageid are written as characters."""
 
-    def get_module_data(self):
-        """Extract Validation results from NetCDF files."""
+        return self.options.get("validationlegacy", False)
 
+    @classmethod
+    def from_context(cls, context, input_dir):
+        """Create and return module from a ModuleContext.
 
+        Parameters
+        ----------
+        context: ModuleContext
+            state shared by every module in an Output run
+        input_dir: Path
+            path to input directory
+        """
 
-        # Files and reach identifiers
-        val_dir = self.input_dir
-        val_files = [ Path(val_file) for val_file in glob.glob(f"{val_dir}/{self.cont_ids}*.nc") ] 
-        val_rids = [ int(val_file.name.split('_')[0]) for val_file in val_files ]
+        module = cls(context.cont_ids, input_dir, context.sos_new, context.logger,
+                     context.sos_rids, context.sos_nrids, context.sos_nids)
+        return module.set_context(context)
+
+    def get_module_data(self):
+        """Extract Validation results from NetCDF files."""
+
+        val_dir, val_rids, first_file = self.__find_val_files()
 
         # Storage of results data
-        if len(val_files) == 0:
-            val_dict = self.create_data_dict()
+        if first_file is None:
+            val_dict = self.create_data_dict(empty=True)
         else:
             # Retrieve dimensions and storage of variable attributes
             # self.__retrieve_dimensions(val_dir, val_rids[0])
             val_dict = self.create_data_dict()
-            val_dict = self.get_nc_attrs(val_dir / val_files[0], val_dict)
+            val_dict = self.get_nc_attrs(first_file, val_dict)
             
             # Data extraction
-            index = 0
+            self.__read_reaches(val_dict, val_dir, val_rids, 0, self.sos_rids.shape[0])
+        return val_dict
 
+    def stream_module_data(self, metadata_json):
+        """Extract and append Validation results in blocks of stream_block reaches.
 
-            for s_rid in self.sos_rids:
-                if s_rid in val_rids:
-                    val_ds = Dataset(val_dir / f"{int(s_rid)}_validation.nc", 'r')
-                    self.logger.info('processing validation reach: %s', s_rid)
-                    for suffix in self.suffixes :
-                        # val_dict[self.suffix_dict[suffix]]["algo_names"][:self.num_algos,:val_ds[f"algorithm{suffix}"][0].shape[0]] = val_ds[f"algorithm{suffix}"][:].filled('')
+        Variables are created up front and only the statistics of a block of
+        reaches are held in memory before they are written to their rows in
+        the SoS. Gage identifier codes are kept per block.
 
+        Parameters
+        ----------
+        metadata_json: dict
+            dictionary of SoS variable metadata
+        """
 
+        val_dir, val_rids, first_file = self.__find_val_files()
+        attrs_dict = self.create_data_dict(num_rows=0)
+        if first_file is not None: self.get_nc_attrs(first_file, attrs_dict)
 
+        sos_ds = Dataset(self.sos_new, 'a')
+        variables = self.__create_vars(sos_ds, attrs_dict, metadata_json)
+        num_reaches = self.sos_rids.shape[0]
+        # Without validation files every row is fill and is written in one block
+        block = self.stream_block if val_rids else max(num_reaches, 1)
+        for start in range(0, num_reaches, block):
+            stop = min(start + block, num_reaches)
+            block_dict = self.create_data_dict(empty=not val_rids, num_rows=stop - start)
+            if val_rids: self.__read_reaches(block_dict, val_dir, val_rids, start, stop)
+            self.__write_rows(variables, block_dict, start)
+        sos_ds.close()
+
+    def __find_val_files(self):
+        """Return validation directory, set of reach identifiers with files and a first file.
+
+        The first file is None when there are no validation files.
+        """
 
-                        val_dict[self.suffix_dict[suffix]]["has_validation"][index] = getattr(val_ds, f'has_validation{suffix}')
-                        val_dict[self.suffix_dict[suffix]]["gageid"][index,:val_ds[f"gageID{suffix}"][0].shape[0]] = val_ds[f"gageID{suffix}"][0].filled('')
-                        val_dict[self.suffix_dict[suffix]]["nse"][index,:val_ds[f"NSE{suffix}"].shape[0]] = val_ds[f"NSE{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["rsq"][index,:val_ds[f"Rsq{suffix}"].shape[0]] = val_ds[f"Rsq{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["kge"][index,:val_ds[f"KGE{suffix}"].shape[0]] = val_ds[f"KGE{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["rmse"][index,:val_ds[f"RMSE{suffix}"].shape[0]] = val_ds[f"RMSE{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["nrmse"][index,:val_ds[f"nRMSE{suffix}"].shape[0]] = val_ds[f"nRMSE{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["nbias"][index,:val_ds[f"nBIAS{suffix}"].shape[0]] = val_ds[f"nBIAS{suffix}"][:].filled(np.nan)
-                        # val_dict[self.suffix_dict[suffix]]["rrmse"][index,:] = val_ds[f"rRMSE{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["sige"][index,:val_ds[f"SIGe{suffix}"].shape[0]] = val_ds[f"SIGe{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["spearmanr"][index,:val_ds[f"Spearmanr{suffix}"].shape[0]] = val_ds[f"Spearmanr{suffix}"][:].filled(np.nan)
-                        val_dict[self.suffix_dict[suffix]]["testn"][index,:val_ds[f"testn{suffix}"].shape[0]] = val_ds[f"testn{suffix}"][:].filled(np.nan)
-                    val_ds.close()
-                index += 1
-        return val_dict
+        val_dir = self.input_dir
+        val_files = [ Path(val_file) for val_file in glob.glob(f"{val_dir}/{self.cont_ids}*.nc") ] 
+        val_rids = { int(val_file.name.split('_')[0]) for val_file in val_files }
+        return val_dir, val_rids, val_dir / val_files[0] if val_files else None
+
+    def __read_reaches(self, val_dict, val_dir, val_rids, start, stop):
+        """Read validation files of a range of reaches into a data dictionary.
+
+        Parameters
+        ----------
+        val_dict: dict
+            dictionary of Validation variables with a row per reach of the range
+        val_dir: Path
+            path to validation directory
+        val_rids: set
+            reach identifiers with validation files
+        start: int
+            first row of the range in sos_rids
+        stop: int
+            row after the last row of the range in sos_rids
+        """
+
+        block = np.full((len(STATS), max(self.num_algos, self.num_algos_offline)), np.nan, dtype=np.float64)
+        for index in range(start, stop):
+            s_rid = self.sos_rids[index]
+            if s_rid not in val_rids: continue
+            row = index - start
+            val_ds = Dataset(val_dir / f"{int(s_rid)}_validation.nc", 'r')
+            val_ds.set_auto_mask(False)
+            self.logger.debug('processing validation reach: %s', s_rid)
+            for suffix in self.suffixes :
+                group_dict = val_dict[self.suffix_dict[suffix]]
+                group_dict["has_validation"][row] = getattr(val_ds, f'has_validation{suffix}')
+                gageid = val_ds[f"gageID{suffix}"][0]
+                gageid = str(chartostring(np.where(gageid == getattr(val_ds[f"gageID{suffix}"], "_FillValue", b'\x00'), b'', gageid)))
+                if gageid:
+                    gage_table = group_dict["gageid_table"]
+                    group_dict["gageid"][row] = gage_table.setdefault(gageid, len(gage_table))
+                # Scatter all statistics of the reach in one step
+                num_algos = self.__read_stats(val_ds, suffix, block)
+                group_dict["stats"][:, row, :num_algos] = block[:, :num_algos]
+            val_ds.close()
     
+    def __read_stats(self, val_ds, suffix, block):
+        """Read statistic variables of a validation file into a block.
+
+        Variables are read without masking and fill values are replaced with
+        NaN in place. The block is reset to NaN first so statistics shorter
+        than the others do not keep values of a previous read. Returns the
+        number of algorithms read.
+
+        Parameters
+        ----------
+        val_ds: netCDF4.Dataset
+            validation file opened with auto-masking off
+        suffix: str
+            suffix of validation group variables
+        block: nd.array
+            (number of statistics, num_algos) array to read statistics into
+        """
+
+        block.fill(np.nan)
+        num_algos = 0
+        for i, (_, prefix) in enumerate(STATS):
+            var = val_ds[f"{prefix}{suffix}"]
+            self.read_var(var, np.nan, out=block[i, :var.shape[0]])
+            num_algos = max(num_algos, var.shape[0])
+        return num_algos
+
     # def __retrieve_dimensions(self, val_dir, reach_id):
     #     """Retrieve num_algos and nchar dimensions.
 
@@ -154,9 +282,19 @@ class Validation(AbstractModule):
     #     self.nchar = temp.dimensions["nchar"].size
     #     temp.close()
     
-    def create_data_dict(self):
-        """Creates and returns Validation data dictionary."""
+    def create_data_dict(self, empty=False, num_rows=None):
+        """Creates and returns Validation data dictionary.
+        
+        Parameters
+        ----------
+        empty: bool
+            indicates there are no validation files so statistics are a
+            read-only NaN view instead of allocated arrays
+        num_rows: int
+            number of reach rows (defaults to the reaches of the SoS)
+        """
 
+        if num_rows is None: num_rows = self.sos_rids.shape[0]
         data_dict = {}
 
         for group in self.out_groups:
@@ -171,18 +309,12 @@ class Validation(AbstractModule):
             "num_algos" : self.num_algos,
             "nchar": self.nchar,
             
-            "gageid": np.full((self.sos_rids.shape[0], self.nchar), ''),
-            "has_validation": np.full((self.sos_rids.shape[0]), np.nan, dtype=np.float64),
-            "nse": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "rsq": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "kge": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "rmse": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "nrmse": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "nbias": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            # "rrmse": np.full((self.sos_rids.shape[0], self.num_algos), np.nan, dtype=np.float64),
-            "sige": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "spearmanr": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
-            "testn": np.full((self.sos_rids.shape[0], num_algos_dim), np.nan, dtype=np.float64),
+            "gageid": np.full((num_rows), -1, dtype=np.int32),
+            "gageid_table": {},
+            "has_validation": np.full((num_rows), np.nan, dtype=np.float64),
+            # Statistics stacked in STATS order, one view per statistic below
+            "stats": np.broadcast_to(np.float64(np.nan), (len(STATS), num_rows, num_algos_dim)) if empty \
+                else np.full((len(STATS), num_rows, num_algos_dim), np.nan, dtype=np.float64),
             "attrs": {
                 "algo_names": {},
                 "gageid":{},
@@ -199,12 +331,40 @@ class Validation(AbstractModule):
                 "has_validation": {},
             }}
 
-            data_dict[group]["algo_names"] = {}
-            data_dict[group]["algo_names"] =  np.full((num_algos_dim, self.nchar), '')
-            for i, name in enumerate(algo_names):
-                    # Fill each row with the characters of the algorithm name
-                    data_dict[group]['algo_names'][i, :len(name)] = list(name)
+            for i, (name, _) in enumerate(STATS):
+                data_dict[group][name] = data_dict[group]["stats"][i]
+
+            # Algorithm name of each num_algos column (empty if unused)
+            data_dict[group]["algo_names"] = np.full((num_algos_dim,), '', dtype=object)
+            data_dict[group]["algo_names"][:len(algo_names)] = algo_names
         return data_dict
+
+    def __gageid_names(self, data_dict):
+        """Return gage identifier of each reach ('' if the reach has none).
+
+        Gage identifiers are stored as an int32 code per reach (-1 for no
+        gage) into a table of distinct identifiers.
+
+        Parameters
+        ----------
+        data_dict: dict
+            dictionary of Validation variables for a group
+        """
+
+        table = list(data_dict["gageid_table"]) + ['']
+        return np.array(table, dtype=object)[data_dict["gageid"]]
+
+    def __to_chars(self, names):
+        """Return (len(names), nchar) character matrix of names.
+
+        Parameters
+        ----------
+        names: nd.array
+            array of algorithm names or gage identifiers
+        """
+
+        names = np.array([ name.encode() for name in names ], dtype=f"S{self.nchar}")
+        return names.view("S1").reshape(names.shape[0], self.nchar)
         
     def get_nc_attrs(self, nc_file, data_dict):
         """Get NetCDF attributes for each NetCDF variable.
@@ -247,6 +407,27 @@ class Validation(AbstractModule):
         """
 
         sos_ds = Dataset(self.sos_new, 'a')
+        variables = self.__create_vars(sos_ds, data_dict, metadata_json)
+        self.__write_rows(variables, data_dict, 0)
+        sos_ds.close()
+
+    def __create_vars(self, sos_ds, data_dict, metadata_json):
+        """Create Validation variables and write algorithm names.
+
+        Returns (variable, type) of each per reach variable keyed by group
+        and name.
+
+        Parameters
+        ----------
+        sos_ds: netCDF4.Dataset
+            SoS dataset to create variables in
+        data_dict: dict
+            dictionary of Validation variables and attributes
+        metadata_json: dict
+            dictionary of SoS variable metadata
+        """
+
+        plan = MetadataPlan.of(metadata_json)
         val_t_grp = sos_ds.createGroup("validation")
 
         # Dimensions
@@ -255,7 +436,7 @@ class Validation(AbstractModule):
         val_t_grp.createDimension("nchar", self.nchar)
         val_t_grp.createDimension("num_reaches", self.sos_rids.shape[0])
 
-
+        variables = {}
         for group in self.out_groups:
 
             val_grp = val_t_grp.createGroup(group)
@@ -292,64 +473,54 @@ class Validation(AbstractModule):
             # var = self.write_var(val_grp, "sige", "f8", ("num_reaches", "num_algos",), data_dict[group])
             # self.set_variable_atts(var, metadata_json["validation"]["sige"]) 
 
-                # Writing "algo_names" and conditionally setting attributes
-            var = self.write_var(val_grp, "algo_names", "S1", ("num_reaches", "num_algos", "nchar",), data_dict[group])
+            # Writing "algo_names" and conditionally setting attributes
+            if self.legacy_layout:
+                # Character matrix broadcast over every reach
+                names = self.__to_chars(data_dict[group]["algo_names"])
+                chars = { "algo_names": np.broadcast_to(names, (self.sos_rids.shape[0],) + names.shape), "attrs": data_dict[group]["attrs"] }
+                var = self.write_var(val_grp, "algo_names", "S1", ("num_reaches", "num_algos", "nchar",), chars)
+            else:
+                # One name per num_algos column
+                var = val_grp.createVariable("algo_names", str, ("num_algos",))
+                var[:] = data_dict[group]["algo_names"]
             if "algo_names" in metadata_json["validation"]:
                 self.set_variable_atts(var, metadata_json["validation"]["algo_names"])
 
-            # Writing "gageid" and conditionally setting attributes
-            var = self.write_var(val_grp, "gageid", "S1", ("num_reaches", "nchar",), data_dict[group])
+            # Creating "gageid" and conditionally setting attributes
+            if self.legacy_layout:
+                var = self.create_var(val_grp, "gageid", "S1", ("num_reaches", "nchar",), data_dict[group]["attrs"]["gageid"])
+            else:
+                # Variable length string per reach
+                var = val_grp.createVariable("gageid", str, ("num_reaches",))
+                var.setncatts({ key: value for key, value in data_dict[group]["attrs"]["gageid"].items() 
+                               if key not in ("_FillValue", "missing_value") })
             if "gageid" in metadata_json["validation"]:
                 self.set_variable_atts(var, metadata_json["validation"]["gageid"])
+            variables[group, "gageid"] = (var, "S1" if self.legacy_layout else str)
 
-            # Writing "has_validation" and conditionally setting attributes
-            var = self.write_var(val_grp, "has_validation", "i4", ("num_reaches",), data_dict[group])
-            if "has_validation" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["has_validation"])
-
-            # Writing "nse" and conditionally setting attributes
-            var = self.write_var(val_grp, "nse", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "nse" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["nse"])
-
-            # Writing "rsq" and conditionally setting attributes
-            var = self.write_var(val_grp, "rsq", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "rsq" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["rsq"])
-
-            # Writing "kge" and conditionally setting attributes
-            var = self.write_var(val_grp, "kge", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "kge" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["kge"])
-
-            # Writing "rmse" and conditionally setting attributes
-            var = self.write_var(val_grp, "rmse", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "rmse" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["rmse"])
-
-            # Writing "testn" and conditionally setting attributes
-            var = self.write_var(val_grp, "testn", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "testn" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["testn"])
-
-            # Writing "nrmse" and conditionally setting attributes
-            var = self.write_var(val_grp, "nrmse", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "nrmse" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["nrmse"])
-
-            # Writing "nbias" and conditionally setting attributes
-            var = self.write_var(val_grp, "nbias", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "nbias" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["nbias"])
-
-            # Writing "spearmanr" and conditionally setting attributes
-            var = self.write_var(val_grp, "spearmanr", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "spearmanr" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["spearmanr"])
-
-            # Writing "sige" and conditionally setting attributes
-            var = self.write_var(val_grp, "sige", "f8", ("num_reaches", "num_algos",), data_dict[group])
-            if "sige" in metadata_json["validation"]:
-                self.set_variable_atts(var, metadata_json["validation"]["sige"])
-        
-        sos_ds.close()
\ No newline at end of file
+            # Creating "has_validation" and statistics with attributes
+            variables[group, "has_validation"] = (self.create_var(val_grp, "has_validation", "i4", ("num_reaches",), data_dict[group]["attrs"]["has_validation"], metadata=plan.attrs("validation", "has_validation")), "i4")
+            for name in ("nse", "rsq", "kge", "rmse", "testn", "nrmse", "nbias", "spearmanr", "sige"):
+                variables[group, name] = (self.create_var(val_grp, name, "f8", ("num_reaches", "num_algos",), data_dict[group]["attrs"][name], metadata=plan.attrs("validation", name)), "f8")
+        return variables
+
+    def __write_rows(self, variables, data_dict, start):
+        """Write Validation data to rows of the SoS variables.
+
+        Parameters
+        ----------
+        variables: dict
+            dictionary of (variable, type) keyed by group and name
+        data_dict: dict
+            dictionary of Validation variables
+        start: int
+            first reach row to write to
+        """
+
+        for (group, name), (var, type) in variables.items():
+            if name == "gageid":
+                data = self.__gageid_names(data_dict[group])
+                if self.legacy_layout: data = self.__to_chars(data)
+            else:
+                data = data_dict[group][name]
+            self.write_rows(var, type, data, start)
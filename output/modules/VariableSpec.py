@@ -0,0 +1,61 @@
+# Third-party imports
+import numpy as np
+
+# Local imports
+from output.modules.AbstractModule import AbstractModule
+
+class VariableSpec:
+    """Class that declares how a module variable is read and written.
+
+    Modules list their variables as VariableSpec objects and AbstractModule
+    creates storage, reads input files and writes the SoS from that list.
+
+    Attributes
+    ----------
+    dims: tuple
+        tuple of SoS dimensions the variable is written on
+    fill: float
+        value that masked input data is filled with
+    metadata: tuple
+        keys of the variable's attributes in metadata_json
+    name: str
+        SoS variable name, "/" separates subgroups of the module group
+    optional: bool
+        indicates the variable may be missing from input files
+    source: str
+        input file variable path, "/" separates groups
+    type: str
+        "vlen_f" for a float ragged array, "f8" for a float per reach
+    """
+
+    def __init__(self, group, source, name=None, type="f8", dims=("num_reaches",),
+                 fill=None, optional=False):
+        """
+        Parameters
+        ----------
+        group: str
+            name of module group in the SoS and in metadata_json
+        source: str
+            input file variable path
+        name: str
+            SoS variable name (defaults to source)
+        type: str
+            "vlen_f" or "f8"
+        dims: tuple
+            tuple of SoS dimensions the variable is written on
+        fill: float
+            value that masked input data is filled with (defaults to the f8
+            fill value for ragged arrays and NaN otherwise)
+        optional: bool
+            indicates the variable may be missing from input files
+        """
+
+        self.source = source
+        self.name = name if name else source
+        self.type = type
+        self.dims = dims
+        if fill is None:
+            fill = AbstractModule.FILL["f8"] if type == "vlen_f" else np.nan
+        self.fill = fill
+        self.metadata = (group, *self.name.split('/'))
+        self.optional = optional
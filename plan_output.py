@@ -0,0 +1,71 @@
+"""Script to plan Output array jobs.
+
+Scans the input mounts to estimate the cost of each continent and writes a
+plan that splits large continents into shards and packs small continents
+together so every array job finishes in about the same time. run_output.py
+runs the tasks of a job with --plan and merges sharded continents with
+--plan --merge.
+
+Command line arguments:
+contjson: Name of the continent JSON file. Default is "continent.json".
+modules: List of modules executed in current workflow.
+jobs: Number of array jobs to plan.
+plan: Path to write the plan JSON file to. Default is "plan.json" in the input directory.
+"""
+
+# Standard imports
+import argparse
+from pathlib import Path
+
+# Local imports
+from output.Append import Append
+from output.Planner import Planner
+from run_output import DIAGNOSTICS, FLPE, INPUT, MOI, OFFLINE, VALIDATION, get_logger
+
+def create_args():
+    """Create and return argparser with arguments."""
+
+    arg_parser = argparse.ArgumentParser(description="Plan array jobs of about the same cost for Output.")
+    arg_parser.add_argument("-c",
+                            "--contjson",
+                            type=str,
+                            help="Name of the continent JSON file",
+                            default="continent.json")
+    arg_parser.add_argument("-m",
+                            "--modules",
+                            nargs="+",
+                            default=[],
+                            help="List of modules executed in current workflow.")
+    arg_parser.add_argument("-n",
+                            "--jobs",
+                            type=int,
+                            required=True,
+                            help="Number of array jobs to plan")
+    arg_parser.add_argument("-p",
+                            "--plan",
+                            type=Path,
+                            default=INPUT / "plan.json",
+                            help="Path to write the plan JSON file to")
+    return arg_parser
+
+def main():
+    logger = get_logger()
+    args = create_args().parse_args()
+
+    dirs = {
+        "input": INPUT,
+        "flpe": FLPE,
+        "moi": MOI,
+        "offline": OFFLINE,
+        "postdiagnostics": DIAGNOSTICS / "postdiagnostics",
+        "prediagnostics": DIAGNOSTICS / "prediagnostics",
+        "validation": VALIDATION / "stats"
+    }
+    priors = lambda continent: INPUT / "sos" / f"{continent}_{Append.PRIORS_SUFFIX}.nc"
+    plan = Planner(INPUT / args.contjson, dirs, args.modules, priors, logger).write(args.plan, args.jobs)
+    for job, tasks in enumerate(plan["jobs"]):
+        names = [ f"{task['continent']} shard {task['shard']} of {task['shards']}" if task["shards"] else task["continent"] for task in tasks ]
+        logger.info(f"Job {job}: {', '.join(names)}.")
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ config_py: Name of file that contains AWS login information in JSON format.
 # Standard imports
 import argparse
 from datetime import datetime
+import json
 import logging
 import os
 from pathlib import Path
@@ -24,6 +25,7 @@ import sys
 
 # Third-party imports
 import botocore
+import numpy as np
 
 # Local imports
 from output.Append import Append
@@ -79,8 +81,78 @@ def create_args():
                             type=str,
                             default="confluence-sos",
                             help="Name of SoS S3 bucket to upload to")
+    arg_parser.add_argument("--nodeobs",
+                            type=str,
+                            choices=["string", "index"],
+                            default="string",
+                            help="Store node observations as 'string' (pass list per node) or 'index' (row of reach observations)")
+    arg_parser.add_argument("--prediagflags",
+                            type=str,
+                            choices=["int32", "packed"],
+                            default="int32",
+                            help="Store prediagnostic flags as 'int32' (one variable per flag) or 'packed' (bit field of 0/1 flags, int8 for others)")
+    arg_parser.add_argument("--validationlegacy",
+                            action="store_true",
+                            help="Write Validation algo_names and gageid as character matrices (previous layout)")
+    arg_parser.add_argument("--streamblock",
+                            type=int,
+                            default=0,
+                            help="Write moi, momma, offline, swot and validation in blocks of this many reaches (0 holds the continent in memory)")
+    arg_parser.add_argument("--variables",
+                            type=str,
+                            default="",
+                            help="Comma separated SoS variables or groups to write, e.g. 'moi/sad/q,prediagnostics' (default writes every variable)")
+    arg_parser.add_argument("--cachedir",
+                            type=str,
+                            default="",
+                            help="Directory to cache extracted module data in so retries only write results (default does not cache)")
+    arg_parser.add_argument("--workers",
+                            type=int,
+                            default=0,
+                            help="Append modules in this many processes (at most one per available core) that each write a module file merged into the results file (0 appends modules one after the other)")
+    arg_parser.add_argument("--reaches",
+                            type=str,
+                            default="",
+                            help="File or comma separated list of reach identifiers to reprocess in place in the existing results file (default writes a new results file)")
+    arg_parser.add_argument("--shards",
+                            type=int,
+                            default=0,
+                            help="Number of shards the continent's reaches are split into across jobs (default 0 processes every reach in one job)")
+    arg_parser.add_argument("--shard",
+                            type=int,
+                            default=0,
+                            help="Shard processed by this job when --shards is set, from 0 to shards - 1; its partial results file is not uploaded")
+    arg_parser.add_argument("--merge",
+                            action="store_true",
+                            help="Merge the partial results files of --shards shards (or of the plan's merge at --index) into the continent results file and upload it")
+    arg_parser.add_argument("--plan",
+                            type=Path,
+                            help="Plan JSON file written by plan_output.py; --index selects the job's tasks (or the merge with --merge) instead of a continent")
     return arg_parser
 
+def get_options(args):
+    """Return dictionary of output options passed to each module."""
+    
+    return {
+        "nodeobs": args.nodeobs,
+        "prediagflags": args.prediagflags,
+        "validationlegacy": args.validationlegacy,
+        "streamblock": args.streamblock,
+        "variables": [ variable for variable in args.variables.split(',') if variable ],
+        "cachedir": args.cachedir,
+        "workers": args.workers
+    }
+
+def get_reaches(reaches):
+    """Return array of reach identifiers from a file or comma separated list.
+
+    Identifiers in a file are separated by commas or whitespace.
+    """
+
+    if not reaches: return np.array([], dtype=np.int64)
+    if Path(reaches).is_file(): reaches = Path(reaches).read_text()
+    return np.array(reaches.replace(',', ' ').split(), dtype=np.int64)
+
 def get_logger():
     """Return a formatted logger object."""
     
@@ -101,6 +173,59 @@ def get_logger():
     # Return logger
     return logger
 
+def get_tasks(args, index):
+    """Return list of tasks for a job index.
+
+    A task is a continent index with the shard and number of shards to
+    process. With --plan the job index selects the tasks (or with --merge
+    the merge) of the plan, otherwise it selects a continent.
+    """
+
+    if not args.plan:
+        return [ { "index": index, "shard": args.shard, "shards": args.shards } ]
+    with open(args.plan) as jf:
+        plan = json.load(jf)
+    if args.merge: return [ plan["merges"][index] ]
+    return plan["jobs"][index]
+
+def run_task(args, task, logger):
+    """Append results of a task's continent and upload them.
+
+    Shard tasks write a partial results file that is uploaded after the
+    merge of every shard.
+    """
+
+    # Append SoS data
+    append = Append(INPUT / args.contjson, task["index"], INPUT, OUTPUT, args.modules, \
+        logger, args.metadatajson)
+    if args.merge:
+        append.create_new_version()
+        append.merge_shards(task["shards"])
+    else:
+        reaches = get_reaches(args.reaches)
+        if reaches.shape[0]: append.select_reaches(reaches)
+        if task["shards"]: append.select_shard(task["shard"], task["shards"])
+        append.create_new_version()
+        append.create_modules(args.runtype, INPUT, DIAGNOSTICS, FLPE, MOI, OFFLINE, \
+            VALIDATION / "stats", get_options(args))
+        append.append_data()
+        append.update_time_coverage()
+        if reaches.shape[0]: append.patch_results()
+        if task["shards"]:
+            logger.info(f"Wrote shard results file {append.sos_file.name}; upload after --merge.")
+            return
+    
+    # Upload SoS data
+    upload = Upload(append.sos_file, args.sosbucket, args.podaacupload, args.podaacbucket, \
+        list(append.cont.keys())[0], append.run_date, args.runtype, logger, \
+        append.prior_sos)
+    try:
+        upload.upload_data(OUTPUT, VALIDATION / "figs", args.runtype, args.modules)
+    except botocore.exceptions.ClientError as error:
+        logger.error("Error encountered when trying to upload results file and figures.")
+        logger.error(error)
+        sys.exit(1)
+
 def main():
     start = datetime.now()
 
@@ -110,6 +235,8 @@ def main():
     # Command line arguments
     arg_parser = create_args()
     args = arg_parser.parse_args()
+    if args.merge and not (args.shards or args.plan): arg_parser.error("--merge requires --shards or --plan")
+    if args.reaches and (args.shards or args.plan): arg_parser.error("--reaches cannot be combined with --shards or --plan")
     for arg in vars(args):
         logger.info("%s: %s", arg, getattr(args, arg))
 
@@ -117,24 +244,9 @@ def main():
     index = args.index if args.index != -235 else int(os.environ.get("AWS_BATCH_JOB_ARRAY_INDEX"))
     logger.info(f"Job index: {index}.")
 
-    # Append SoS data
-    append = Append(INPUT / args.contjson, index, INPUT, OUTPUT, args.modules, \
-        logger, args.metadatajson)
-    append.create_new_version()
-    append.create_modules(args.runtype, INPUT, DIAGNOSTICS, FLPE, MOI, OFFLINE, \
-        VALIDATION / "stats")
-    append.append_data()
-    append.update_time_coverage()
-    
-    # Upload SoS data
-    upload = Upload(append.sos_file, args.sosbucket, args.podaacupload, args.podaacbucket, \
-        list(append.cont.keys())[0], append.run_date, args.runtype, logger)
-    try:
-        upload.upload_data(OUTPUT, VALIDATION / "figs", args.runtype, args.modules)
-    except botocore.exceptions.ClientError as error:
-        logger.error("Error encountered when trying to upload results file and figures.")
-        logger.error(error)
-        sys.exit(1)
+    for task in get_tasks(args, index):
+        logger.info(f"Task: {task}.")
+        run_task(args, task, logger)
     
     end = datetime.now()
     logger.info(f"Execution time: {end - start}")
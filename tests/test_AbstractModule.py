@@ -0,0 +1,69 @@
+# Standard imports
+import unittest
+
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+
+# Local imports
+from output.modules.AbstractModule import AbstractModule
+from output.modules.Offline import Offline
+
+class test_AbstractModule(unittest.TestCase):
+    """Test AbstractModule helper methods shared by the modules."""
+    
+    FILL = {
+        "f8": -999999999999.0,
+        "i4": -999
+    }
+    
+    def test_read_var(self):
+        """Test read_var replaces the same values as a masked read."""
+        
+        ds = Dataset("read_var.nc", 'w', diskless=True)
+        ds.createDimension("nt", 6)
+        var = ds.createVariable("q", "f8", ("nt",), fill_value=-1.0)
+        var.missing_value = np.array([-2.0, -3.0])
+        var.valid_min = 0.0
+        var.valid_max = 10.0
+        var[:] = [-1.0, -2.0, -3.0, -0.5, 11.0, 5.0]
+        flag = ds.createVariable("flag", "i4", ("nt",))
+        flag[:] = np.ma.masked_array(np.arange(6), mask=np.arange(6) % 2 == 0)
+        
+        for variable, fill in ((var, np.nan), (var, self.FILL["f8"]), (flag, self.FILL["i4"])):
+            expected = variable[:].filled(fill)
+            data = AbstractModule.read_var(variable, fill)
+            self.assertEqual(expected.dtype, data.dtype)
+            np.testing.assert_array_equal(expected, data)
+        np.testing.assert_array_equal([np.nan] * 5 + [5.0], AbstractModule.read_var(var, np.nan))
+        self.assertEqual(5.0, AbstractModule.read_var(var, np.nan, 5))
+        
+        out = np.zeros(6)
+        self.assertIs(out, AbstractModule.read_var(flag, self.FILL["i4"], out=out))
+        np.testing.assert_array_equal([-999, 1, -999, 3, -999, 5], out)
+        ds.close()
+
+    def test_write_rows(self):
+        """Test write_rows writes the same rows in blocks of WRITE_SIZE values."""
+        
+        ds = Dataset("write_rows.nc", 'w', diskless=True)
+        ds.createDimension("num_reaches", 7)
+        ds.createDimension("num_algos", 3)
+        vlen_f = ds.createVLType(np.float64, "vlen_float")
+        data = np.arange(21, dtype=np.float64).reshape(7, 3)
+        data[1, 2] = np.nan
+        data[4:6] = np.nan
+        rows = np.empty(7, dtype=object)
+        for i in range(7): rows[i] = np.arange(i, dtype=np.float64) + 0.5
+        
+        # Offline stands in for a concrete module
+        off = Offline([7], None, None, None, vlen_f, None, None, np.arange(7), None, None)
+        off.WRITE_SIZE = 4
+        var = off.write_var(ds, "stats", "f8", ("num_reaches", "num_algos"), { "stats": data, "attrs": { "stats": {} } })
+        var_nt = off.write_var_nt(ds, "q", vlen_f, ("num_reaches",), { "q": rows, "attrs": { "q": { "_FillValue": -1.0 } } })
+        
+        np.testing.assert_array_equal(np.nan_to_num(data, nan=self.FILL["f8"]), var[:].filled(self.FILL["f8"]))
+        self.assertTrue(np.isnan(data[1, 2]))
+        for row, written in zip(rows, var_nt[:]):
+            np.testing.assert_array_equal(row, written)
+        ds.close()
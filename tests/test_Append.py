@@ -0,0 +1,158 @@
+# Standard imports
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+from numpy.testing import assert_array_equal
+
+# Local imports
+from output.Append import Append, shard_rows
+
+class Area:
+    """Module stand-in that writes its worker's process identifier to a group."""
+
+    CACHE_STATE = ("pid",)
+
+    def __init__(self, sos_new):
+        self.sos_new = sos_new
+        self.pid = None
+
+    def append_module(self, metadata_json):
+        self.pid = os.getpid()
+        with Dataset(self.sos_new, 'a') as sos:
+            grp = sos.createGroup(self.__class__.__name__.lower())
+            grp.createVariable("pid", "i8", ("num_reaches",))[:] = np.full(sos.dimensions["num_reaches"].size, self.pid)
+            q = grp.createVariable("q", sos.vltypes["vlen_float"], ("num_nodes",))
+            for i in range(sos.dimensions["num_nodes"].size): q[i] = np.arange(i + 1, dtype=np.float64)
+
+class Width(Area):
+    """Second module stand-in."""
+
+class Failing(Area):
+    """Module stand-in that fails."""
+
+    def append_module(self, metadata_json):
+        raise ValueError("failed")
+
+class Time:
+    """Module stand-in that writes SWOT-like fill rows for every node."""
+
+    CACHE_STATE = ()
+
+    def __init__(self, sos_new):
+        self.sos_new = sos_new
+
+    def append_module(self, metadata_json):
+        with Dataset(self.sos_new, 'a') as sos:
+            num_nodes = sos.dimensions["num_nodes"].size
+            time = sos["nodes"].createVariable("time", sos.vltypes["vlen_float"], ("num_nodes",))
+            observations = sos["nodes"].createVariable("observations", str, ("num_nodes",))
+            for i in range(num_nodes):
+                time[i] = np.array([-999999999999.0])
+                observations[i] = "xxxxxxxxxx"
+
+class test_Append(unittest.TestCase):
+    """Test Append module functions."""
+
+    def test_shard_rows(self):
+        """Test shards are consecutive slices that cover every reach once."""
+
+        rows = [ shard_rows(10, shard, 4) for shard in range(4) ]
+        assert_array_equal([0, 1], rows[0])
+        assert_array_equal([7, 8, 9], rows[3])
+        assert_array_equal(np.arange(10), np.concatenate(rows))
+        self.assertEqual(0, shard_rows(2, 0, 3).shape[0])
+
+    def write_priors(self, temp_dir, node_reach_ids=(71, 71, 72)):
+        """Write a priors SoS of two reaches and continent JSON.
+
+        Nodes are numbered from their reach identifier.
+        """
+
+        temp_dir = Path(temp_dir)
+        (temp_dir / "sos").mkdir(exist_ok=True)
+        num_nodes = len(node_reach_ids)
+        with Dataset(temp_dir / "sos" / f"na_{Append.PRIORS_SUFFIX}.nc", 'w') as ds:
+            ds.continent, ds.run_type, ds.product_version = "na", "constrained", "1"
+            ds.createDimension("num_reaches", 2)
+            ds.createDimension("num_nodes", num_nodes)
+            reaches = ds.createGroup("reaches")
+            reaches.createVariable("reach_id", "i8", ("num_reaches",))[:] = [71, 72]
+            reaches.createVariable("river_name", str, ("num_reaches",))[:] = np.array(["a", "b"], dtype=object)
+            nodes = ds.createGroup("nodes")
+            nodes.createVariable("reach_id", "i8", ("num_nodes",))[:] = node_reach_ids
+            nodes.createVariable("node_id", "i8", ("num_nodes",))[:] = [ 10 * rid + i for i, rid in enumerate(node_reach_ids) ]
+            for name in ("x", "y"): nodes.createVariable(name, "f8", ("num_nodes",))[:] = np.zeros(num_nodes)
+            nodes.createVariable("river_name", str, ("num_nodes",))[:] = np.array(["a"] * num_nodes, dtype=object)
+        (temp_dir / "continent.json").write_text(json.dumps([{ "na": [7] }]))
+
+    def new_append(self, temp_dir):
+        """Return an Append of the priors SoS written by write_priors."""
+
+        temp_dir = Path(temp_dir)
+        return Append(temp_dir / "continent.json", 0, temp_dir, temp_dir, [], logging.getLogger(__name__),
+                      Path(__file__).parent.parent / "metadata" / "metadata.json")
+
+    def create_append(self, temp_dir):
+        """Write a priors SoS and continent JSON and return an Append with a new SoS."""
+
+        self.write_priors(temp_dir)
+        append = self.new_append(temp_dir)
+        append.create_new_version()
+        append.workers = 2
+        return append
+
+    def test_append_parallel(self):
+        """Test modules appended by workers are merged into the new SoS."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            append = self.create_append(temp_dir)
+            append.modules = [ Area(append.sos_file), Width(append.sos_file) ]
+            append.append_data()
+
+            self.assertEqual(["na_sword_v16_SOS_results.nc"], sorted(path.name for path in (Path(temp_dir) / "sos").glob("*results*")))
+            with Dataset(append.sos_file, 'r') as ds:
+                self.assertEqual(["reaches", "nodes", "area", "width"], list(ds.groups))
+                for module in append.modules:
+                    self.assertNotEqual(os.getpid(), module.pid)
+                    self.assertEqual(append.sos_file, module.sos_new)
+                    assert_array_equal([module.pid, module.pid], ds[module.__class__.__name__.lower()]["pid"][:])
+                assert_array_equal([0.0, 1.0, 2.0], ds["width"]["q"][2])
+                self.assertEqual("vlen_float", ds["width"]["q"].datatype.name)
+
+    def test_append_parallel_error(self):
+        """Test a module that fails in a worker fails the run and module files are removed."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            append = self.create_append(temp_dir)
+            append.modules = [ Area(append.sos_file), Failing(append.sos_file) ]
+            with self.assertRaises(ValueError):
+                append.append_data()
+            self.assertEqual([append.sos_file], list((Path(temp_dir) / "sos").glob("*results*")))
+
+    def test_merge_shards_orphan_nodes(self):
+        """Test nodes of a reach not in the priors SoS are merged as in a single job."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.write_priors(temp_dir, (71, 71, 79, 72, 79))
+            for shard in range(2):
+                append = self.new_append(temp_dir)
+                append.select_shard(shard, 2)
+                append.create_new_version()
+                append.modules = [ Time(append.sos_file) ]
+                append.append_data()
+            self.assertEqual(3, append.prior_sos.node_rows.shape[0])
+            append = self.new_append(temp_dir)
+            append.create_new_version()
+            append.merge_shards(2)
+
+            with Dataset(append.sos_file, 'r') as ds:
+                for i in range(5):
+                    assert_array_equal([-999999999999.0], ds["nodes"]["time"][i])
+                    self.assertEqual("xxxxxxxxxx", ds["nodes"]["observations"][i])
@@ -0,0 +1,94 @@
+# Standard imports
+import os
+from pathlib import Path
+import tempfile
+import unittest
+
+# Third-party imports
+import numpy as np
+from numpy.testing import assert_array_equal
+
+# Local imports
+from output.ExtractCache import ExtractCache
+from output.modules.Sad import Sad
+from output.modules.SparseRows import SparseRows
+
+class test_ExtractCache(unittest.TestCase):
+    """Test ExtractCache class methods."""
+
+    def test_save_load(self):
+        """Test data dictionary and module state round trip through a cache file."""
+
+        sparse = SparseRows(4, np.array([-999.0]))
+        sparse[2] = np.array([1.0, 2.0])
+        ragged = np.empty(3, dtype=object)
+        ragged[:] = [ np.array([1, 2], dtype=np.int32), np.array([], dtype=np.int32), np.array([3], dtype=np.int32) ]
+        data_dict = {
+            "nt": 3,
+            "A0": np.array([1.0, np.nan]),
+            "stats": np.broadcast_to(np.array(np.nan), (2, 5)),
+            "obs": ragged,
+            "q": sparse,
+            "attrs": { "A0": { "units": "m^2", "valid_min": np.float64(0) } }
+        }
+        state = { "time_min": 1.5, "algo_names": np.array(["sad", "moi"]) }
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ExtractCache(Path(temp_dir) / "cache", "na")
+            cache.save("sad", "key", data_dict, state)
+            self.assertIsNone(cache.load("sad", "other"))
+            self.assertIsNone(cache.load("moi", "key"))
+            cached_dict, cached_state = cache.load("sad", "key")
+
+        self.assertEqual(3, cached_dict["nt"])
+        assert_array_equal(data_dict["A0"], cached_dict["A0"])
+        assert_array_equal(data_dict["stats"], cached_dict["stats"])
+        self.assertEqual(ragged.shape, cached_dict["obs"].shape)
+        for expected, actual in zip(ragged, cached_dict["obs"]):
+            self.assertEqual(np.int32, actual.dtype)
+            assert_array_equal(expected, actual)
+        self.assertIsInstance(cached_dict["q"], SparseRows)
+        assert_array_equal([2], cached_dict["q"].rows)
+        assert_array_equal([1.0, 2.0], cached_dict["q"][2])
+        assert_array_equal([-999.0], cached_dict["q"][0])
+        self.assertEqual(data_dict["attrs"], cached_dict["attrs"])
+        self.assertEqual(1.5, cached_state["time_min"])
+        assert_array_equal(state["algo_names"], cached_state["algo_names"])
+
+    def test_fingerprint(self):
+        """Test fingerprint changes with input files and extraction settings."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = Path(temp_dir)
+            (input_dir / "sad").mkdir()
+            nc_file = input_dir / "sad" / "1_sad.nc"
+            nc_file.write_bytes(b"data")
+            key = ExtractCache.fingerprint(input_dir, [nc_file], ["sad", np.arange(2).tobytes()])
+
+            self.assertEqual(key, ExtractCache.fingerprint(input_dir, [nc_file], ["sad", np.arange(2).tobytes()]))
+            self.assertNotEqual(key, ExtractCache.fingerprint(input_dir, [nc_file], ["sad", np.arange(3).tobytes()]))
+            self.assertNotEqual(key, ExtractCache.fingerprint(input_dir, [], ["sad", np.arange(2).tobytes()]))
+            stat = os.stat(nc_file)
+            os.utime(nc_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            self.assertNotEqual(key, ExtractCache.fingerprint(input_dir, [nc_file], ["sad", np.arange(2).tobytes()]))
+
+    def test_fingerprint_module_files(self):
+        """Test only the files a module reads are fingerprinted."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_dir = Path(temp_dir)
+            (input_dir / "sad").mkdir()
+            (input_dir / "hivdi").mkdir()
+            (input_dir / "sad" / "71234_sad.nc").write_bytes(b"data")
+            sad = Sad([7], input_dir, None, None, None, None, None, None, None, None)
+            self.assertEqual([input_dir / "sad" / "71234_sad.nc"], sad.input_files())
+            key = ExtractCache.fingerprint(input_dir, sad.input_files(), ["sad"])
+
+            # Other modules' files and other continents do not invalidate the cache
+            (input_dir / "hivdi" / "71234_hivdi.nc").write_bytes(b"data")
+            (input_dir / "sad" / "81234_sad.nc").write_bytes(b"data")
+            (input_dir / "sad" / "notes.txt").write_text("not an input file")
+            self.assertEqual(key, ExtractCache.fingerprint(input_dir, sad.input_files(), ["sad"]))
+
+            (input_dir / "sad" / "71235_sad.nc").write_bytes(b"data")
+            self.assertNotEqual(key, ExtractCache.fingerprint(input_dir, sad.input_files(), ["sad"]))
@@ -0,0 +1,103 @@
+# Standard imports
+import json
+from pathlib import Path
+import unittest
+
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+
+# Local imports
+from output.MetadataPlan import MetadataPlan
+from output.modules.Offline import Offline
+
+class test_MetadataPlan(unittest.TestCase):
+    """Test MetadataPlan class methods."""
+
+    METADATA = {
+        "global_attributes": { "title": "SoS" },
+        "sad": {
+            "A0": { "long_name": "Cross-sectional area", "valid_min": 0, "valid_max": 10000 },
+            "Qa": { "long_name": "Mean discharge" }
+        },
+        "moi": {
+            "sad": { "q": { "units": "m^3/s" }, "n": { "units": "1" } }
+        }
+    }
+
+    def test_compile(self):
+        """Test metadata is compiled into variables and groups."""
+
+        plan = MetadataPlan(self.METADATA)
+
+        self.assertEqual({ "title": "SoS" }, plan.attrs("global_attributes"))
+        self.assertEqual({ "units": "1" }, plan.attrs("moi", "sad", "n"))
+        self.assertEqual({}, plan.attrs("sad", "Q_u"))
+        self.assertTrue(plan.has("sad", "Qa"))
+        self.assertFalse(plan.has("sad"))
+        self.assertEqual(["A0", "Qa"], plan.names("sad"))
+        self.assertEqual(["q", "n"], plan.names("moi", "sad"))
+        self.assertIs(self.METADATA["sad"], plan["sad"])
+        self.assertIs(plan, MetadataPlan.of(plan))
+
+    def test_typed_attrs(self):
+        """Test range attributes are cast to the variable data type."""
+
+        plan = MetadataPlan(self.METADATA)
+        ds = Dataset("typed_attrs.nc", 'w', diskless=True)
+        ds.createDimension("num_reaches", 2)
+        var = ds.createVariable("A0", "f8", ("num_reaches",))
+        var.setncatts(MetadataPlan.typed_attrs(var, plan.attrs("sad", "A0")))
+
+        self.assertEqual(np.float64, var.getncattr("valid_min").dtype)
+        self.assertEqual(10000.0, var.valid_max)
+        self.assertEqual("Cross-sectional area", var.long_name)
+        self.assertEqual(0, plan.attrs("sad", "A0")["valid_min"])
+        ds.close()
+
+    def test_plan_specs(self):
+        """Test only variables with metadata are read and written."""
+
+        with open(Path(__file__).parent.parent / "metadata" / "metadata.json") as jf:
+            metadata_json = json.load(jf)
+        del metadata_json["offline"]["d_x_area_u"]
+
+        off = Offline([7], None, None, None, None, None, None, np.arange(2), None, None)
+        self.assertEqual(Offline.VARIABLES, off.plan_specs(Offline.VARIABLES))
+        off.metadata = MetadataPlan(metadata_json)
+        off_dict = off.create_data_dict()
+        self.assertNotIn("d_x_area_u", off_dict)
+        self.assertIn("d_x_area", off_dict)
+        self.assertEqual(len(Offline.VARIABLES) - 1, len(off.plan_specs(Offline.VARIABLES)))
+
+    def test_select(self):
+        """Test select restricts the plan to variables under paths."""
+
+        plan = MetadataPlan(self.METADATA).select(["moi/sad/q", "nothing"])
+
+        self.assertEqual([("global_attributes",), ("moi", "sad", "q")], list(plan.variables))
+        self.assertEqual(["q"], plan.names("moi", "sad"))
+        self.assertEqual([], plan.names("sad"))
+        self.assertTrue(plan.includes("moi"))
+        self.assertFalse(plan.includes("sad"))
+        self.assertFalse(plan.includes("nothing"))
+        self.assertIn("sad", plan)
+
+    def test_select_packed_flags(self):
+        """Test a packed flags variable and the 0/1 flags it packs are selected together."""
+
+        flags = {
+            "ice_clim_f": { "flag_values": "0 1" },
+            "ice_dyn_f": { "flag_values": "0 1" },
+            "xtrk_dist": { "flag_values": "0 1 2" },
+            "flags": { "long_name": "packed prediagnostic flags" }
+        }
+        plan = MetadataPlan({ "prediagnostics": { "reach": flags, "node": dict(flags) } })
+
+        selected = plan.select(["prediagnostics/reach/flags"])
+        self.assertEqual(["ice_clim_f", "ice_dyn_f", "flags"], selected.names("prediagnostics", "reach"))
+        self.assertEqual([], selected.names("prediagnostics", "node"))
+        selected = plan.select(["prediagnostics/node/ice_dyn_f"])
+        self.assertEqual(["ice_clim_f", "ice_dyn_f", "flags"], selected.names("prediagnostics", "node"))
+        selected = plan.select(["prediagnostics/reach/xtrk_dist"])
+        self.assertEqual(["xtrk_dist"], selected.names("prediagnostics", "reach"))
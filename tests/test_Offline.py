@@ -1,6 +1,9 @@
 # Standard imports
+import json
+import logging
 from pathlib import Path
 from shutil import copyfile
+import tempfile
 import unittest
 
 # Third-party imports
@@ -102,4 +105,63 @@ class test_Offline(unittest.TestCase):
         
         # Clean up
         sos.close()
-        self.OFF_SOS.unlink()
\ No newline at end of file
+        self.OFF_SOS.unlink()
+        
+    def write_offline_files(self, off_dir):
+        """Write Offline input files for the second and third of four reaches."""
+        
+        for k, rid in enumerate([71234, 71235]):
+            off_ds = Dataset(Path(off_dir) / f"{rid}_offline.nc", 'w')
+            off_ds.createDimension("nt", 3 + k)
+            for spec in Offline.VARIABLES:
+                if spec.optional: continue
+                var = off_ds.createVariable(spec.source, "f8", ("nt",), fill_value=-9999.0)
+                var[:] = np.ma.masked_array(np.arange(3 + k, dtype=np.float64), mask=np.arange(3 + k) == 1)
+            off_ds.close()
+        return np.array([71230, 71234, 71235, 71236])
+
+    def test_get_module_data_spec(self):
+        """Test get_module_data reads renamed and optional variables."""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            rids = self.write_offline_files(tmp)
+            off = Offline([7], Path(tmp), None, None, None, None, None, rids, None, None)
+            off_dict = off.get_module_data()
+        
+        assert_array_almost_equal([self.FILL["f8"]], off_dict["metro_q_c"][0])
+        assert_array_almost_equal([0.0, self.FILL["f8"], 2.0], off_dict["metro_q_c"][1])
+        assert_array_almost_equal([self.FILL["f8"]], off_dict["d_x_area_u"][1])
+        self.assertEqual(-9999.0, off_dict["attrs"]["consensus_q_uc"]["_FillValue"])
+        self.assertEqual({}, off_dict["attrs"]["d_x_area_u"])
+
+    def test_stream_module_data(self):
+        """Test streaming in blocks writes the same SoS as in memory."""
+        
+        with open(Path(__file__).parent.parent / "metadata" / "metadata.json") as jf:
+            metadata_json = json.load(jf)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            rids = self.write_offline_files(tmp)
+            results = []
+            for options in ({}, { "streamblock": 3 }):
+                sos_file = Path(tmp) / "sos.nc"
+                sos = Dataset(sos_file, 'w')
+                sos.createDimension("num_reaches", rids.shape[0])
+                vlen_f = sos.createVLType(np.float64, "vlen_float")
+                off = Offline([7], Path(tmp), sos_file, logging.getLogger(), vlen_f, None, None, \
+                    rids, None, None)
+                off.options = options
+                sos.close()
+                off.append_module(metadata_json)
+                
+                sos = Dataset(sos_file, 'r')
+                results.append({ name: (sos["offline"][name][:], sos["offline"][name].__dict__) \
+                    for name in sos["offline"].variables })
+                sos.close()
+                sos_file.unlink()
+        
+        self.assertEqual(results[0].keys(), results[1].keys())
+        for name, (data, attrs) in results[0].items():
+            self.assertEqual(attrs, results[1][name][1])
+            for row, stream_row in zip(data, results[1][name][0]):
+                assert_array_almost_equal(row, stream_row)
@@ -0,0 +1,143 @@
+# Standard imports
+from pathlib import Path
+import tempfile
+import unittest
+
+# Third-party imports
+from netCDF4 import Dataset
+import numpy as np
+from numpy.testing import assert_array_equal
+
+# Local imports
+from output.Patch import Patch
+
+class test_Patch(unittest.TestCase):
+    """Test Patch class methods."""
+
+    RIDS = np.array([11, 21, 31, 41], dtype=np.int64)
+    NRIDS = np.array([11, 11, 21, 31, 31, 41], dtype=np.int64)
+    NIDS = np.array([111, 112, 211, 311, 312, 411], dtype=np.int64)
+
+    def write_sos(self, sos_file, reach_rows, node_rows, value):
+        """Write a results file of reach and node rows filled with value."""
+
+        ds = Dataset(sos_file, 'w')
+        ds.history = "created"
+        ds.createDimension("num_reaches", reach_rows.shape[0])
+        ds.createDimension("num_nodes", node_rows.shape[0])
+        vlen_f = ds.createVLType(np.float64, "vlen_float")
+        reaches = ds.createGroup("reaches")
+        reaches.createVariable("reach_id", "i8", ("num_reaches",))[:] = self.RIDS[reach_rows]
+        nodes = ds.createGroup("nodes")
+        nodes.createVariable("node_id", "i8", ("num_nodes",))[:] = self.NIDS[node_rows]
+        grp = ds.createGroup("sad")
+        grp.createDimension("num_algos", 2)
+        grp.createVariable("A0", "f8", ("num_reaches",), fill_value=-999999999999.0)[:] = np.full(reach_rows.shape[0], value)
+        grp.createVariable("mean", "f8", ("num_nodes",), fill_value=-999999999999.0)[:] = np.full(node_rows.shape[0], value)
+        grp.createVariable("stats", "f8", ("num_reaches", "num_algos"))[:] = np.full((reach_rows.shape[0], 2), value)
+        q = grp.createVariable("Q", vlen_f, ("num_reaches",))
+        for i in range(reach_rows.shape[0]):
+            q[i] = np.full(i + 1, value)
+        return ds
+
+    def test_apply(self):
+        """Test rows of a partial file overwrite rows of a results file."""
+
+        reach_rows = np.array([1, 2])
+        node_rows = np.array([2, 3, 4])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_file = Path(temp_dir) / "results.nc"
+            partial_file = Path(temp_dir) / "partial.nc"
+            self.write_sos(results_file, np.arange(4), np.arange(6), 1.0).close()
+            partial = self.write_sos(partial_file, reach_rows, node_rows, 2.0)
+            partial["sad"].createVariable("Qa", "f8", ("num_reaches",), fill_value=-1.0)[:] = [5.0, 6.0]
+            partial.close()
+
+            Patch(reach_rows, node_rows).apply(partial_file, results_file, "patched")
+
+            with Dataset(results_file, 'r') as ds:
+                grp = ds["sad"]
+                assert_array_equal([1.0, 2.0, 2.0, 1.0], grp["A0"][:])
+                assert_array_equal([1.0, 1.0, 2.0, 2.0, 2.0, 1.0], grp["mean"][:])
+                assert_array_equal([[1.0, 1.0], [2.0, 2.0], [2.0, 2.0], [1.0, 1.0]], grp["stats"][:])
+                assert_array_equal([1.0], grp["Q"][0])
+                assert_array_equal([2.0], grp["Q"][1])
+                assert_array_equal([2.0, 2.0], grp["Q"][2])
+                assert_array_equal([1.0, 1.0, 1.0, 1.0], grp["Q"][3])
+                self.assertEqual(-1.0, grp["Qa"]._FillValue)
+                assert_array_equal([True, False, False, True], np.ma.getmaskarray(grp["Qa"][:]))
+                assert_array_equal([5.0, 6.0], grp["Qa"][1:3])
+                self.assertEqual("created\npatched", ds.history)
+
+    def test_check(self):
+        """Test a partial file of other reaches is not applied."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_file = Path(temp_dir) / "results.nc"
+            partial_file = Path(temp_dir) / "partial.nc"
+            self.write_sos(results_file, np.arange(4), np.arange(6), 1.0).close()
+            self.write_sos(partial_file, np.array([1]), np.array([2]), 2.0).close()
+
+            with self.assertRaises(ValueError):
+                Patch(np.array([0]), np.array([0])).apply(partial_file, results_file, "patched")
+            with Dataset(results_file, 'r') as ds:
+                assert_array_equal(np.ones(4), ds["sad"]["A0"][:])
+                self.assertEqual("created", ds.history)
+
+    def test_merge(self):
+        """Test shard files are merged into a results file without module groups."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_file = Path(temp_dir) / "results.nc"
+            with Dataset(results_file, 'w') as ds:
+                ds.createDimension("num_reaches", 4)
+                ds.createDimension("num_nodes", 6)
+                ds.createGroup("reaches").createVariable("reach_id", "i8", ("num_reaches",))[:] = self.RIDS
+                ds.createGroup("nodes").createVariable("node_id", "i8", ("num_nodes",))[:] = self.NIDS
+            shards = [ (np.array([0, 1]), np.array([0, 1, 2])), (np.array([2, 3]), np.array([3, 4, 5])) ]
+            with Dataset(results_file, 'a') as results:
+                for shard, (reach_rows, node_rows) in enumerate(shards):
+                    shard_file = Path(temp_dir) / f"shard{shard}.nc"
+                    self.write_sos(shard_file, reach_rows, node_rows, float(shard)).close()
+                    with Dataset(shard_file, 'r') as partial:
+                        patch = Patch(reach_rows, node_rows)
+                        patch.check(partial, results)
+                        patch.copy_group(partial, results)
+
+            with Dataset(results_file, 'r') as ds:
+                grp = ds["sad"]
+                self.assertEqual(2, grp.dimensions["num_algos"].size)
+                self.assertEqual(-999999999999.0, grp["A0"]._FillValue)
+                assert_array_equal([0.0, 0.0, 1.0, 1.0], grp["A0"][:])
+                assert_array_equal([0.0, 0.0, 0.0, 1.0, 1.0, 1.0], grp["mean"][:])
+                assert_array_equal([0.0, 0.0], grp["Q"][1])
+                assert_array_equal([1.0], grp["Q"][2])
+                self.assertEqual("vlen_float", grp["Q"].datatype.name)
+
+    def test_copy_blocks(self):
+        """Test rows are copied in blocks smaller than a run of rows."""
+
+        reach_rows = np.array([0, 2, 3])
+        node_rows = np.array([0, 1, 3, 4, 5])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_file = Path(temp_dir) / "results.nc"
+            partial_file = Path(temp_dir) / "partial.nc"
+            self.write_sos(results_file, np.arange(4), np.arange(6), 1.0).close()
+            partial = self.write_sos(partial_file, reach_rows, node_rows, 2.0)
+            partial["sad"].createDimension("num_days", 5)
+            partial["sad"].createVariable("num_days", "i4", ("num_days",))[:] = np.arange(1, 6)
+            partial["sad"]["mean"][:] = np.arange(5.0)
+            partial.close()
+
+            patch = Patch(reach_rows, node_rows)
+            patch.WRITE_SIZE = 2
+            patch.apply(partial_file, results_file, "patched")
+
+            with Dataset(results_file, 'r') as ds:
+                grp = ds["sad"]
+                assert_array_equal([2.0, 1.0, 2.0, 2.0], grp["A0"][:])
+                assert_array_equal([0.0, 1.0, 1.0, 2.0, 3.0, 4.0], grp["mean"][:])
+                assert_array_equal([[2.0, 2.0], [1.0, 1.0], [2.0, 2.0], [2.0, 2.0]], grp["stats"][:])
+                assert_array_equal([2.0, 2.0, 2.0], grp["Q"][3])
+                assert_array_equal([1.0, 1.0], grp["Q"][1])
+                assert_array_equal([1, 2, 3, 4, 5], grp["num_days"][:])
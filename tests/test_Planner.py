@@ -0,0 +1,64 @@
+# Standard imports
+import json
+import logging
+from pathlib import Path
+import tempfile
+import unittest
+
+# Third-party imports
+from netCDF4 import Dataset
+
+# Local imports
+from output.Planner import Planner
+
+class test_Planner(unittest.TestCase):
+    """Test Planner class methods."""
+
+    # Continent name: (continent identifiers, number of reaches, files per module directory)
+    CONTS = { "na": ([7], 40, 40), "sa": ([6], 4, 4), "eu": ([2], 6, 6), "oc": ([5], 2, 2) }
+
+    def create_planner(self, temp_dir):
+        """Write continent JSON, priors and module files and return a Planner."""
+
+        temp_dir = Path(temp_dir)
+        dirs = { key: temp_dir / key for key in ("input", "flpe", "moi") }
+        for directory in dirs.values(): directory.mkdir()
+        (dirs["input"] / "sos").mkdir()
+        (dirs["flpe"] / "sad").mkdir()
+        for name, (cont_ids, num_reaches, num_files) in self.CONTS.items():
+            with Dataset(dirs["input"] / "sos" / f"{name}_priors.nc", 'w') as ds:
+                ds.createDimension("num_reaches", num_reaches)
+            for i in range(num_files):
+                (dirs["flpe"] / "sad" / f"{cont_ids[0]}{i:010d}_sad.nc").write_bytes(b"0" * 1000)
+                (dirs["moi"] / f"{cont_ids[0]}{i:010d}_integrator.nc").write_bytes(b"0" * 1000)
+        (dirs["moi"] / "notes.txt").write_text("not an input file")
+        cont_json = temp_dir / "continent.json"
+        cont_json.write_text(json.dumps([ { name: cont[0] } for name, cont in self.CONTS.items() ]))
+        return Planner(cont_json, dirs, ["sad", "moi", "swot"], lambda name: dirs["input"] / "sos" / f"{name}_priors.nc",
+                       logging.getLogger(__name__))
+
+    def test_estimate(self):
+        """Test files, bytes and reaches are counted for each continent."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            costs = self.create_planner(temp_dir).estimate()
+
+        self.assertEqual(["na", "sa", "eu", "oc"], [ cost["continent"] for cost in costs ])
+        self.assertEqual({ "flpe": 40, "input": 0, "moi": 40 }, costs[0]["files"])
+        self.assertEqual(40000, costs[0]["bytes"]["moi"])
+        self.assertEqual(6, costs[2]["reaches"])
+        self.assertEqual(40000 * 2 + 80 * Planner.COST_PER_FILE + 40 * Planner.COST_PER_REACH, costs[0]["cost"])
+
+    def test_plan(self):
+        """Test large continents are sharded and small continents packed."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            plan = self.create_planner(temp_dir).plan(4)
+
+        self.assertEqual([{ "index": 0, "continent": "na", "shards": 4 }], plan["merges"])
+        self.assertEqual(4, len(plan["jobs"]))
+        tasks = sorted((task["index"], task["shard"], task["shards"]) for job in plan["jobs"] for task in job)
+        self.assertEqual([(0, 0, 4), (0, 1, 4), (0, 2, 4), (0, 3, 4), (1, 0, 0), (2, 0, 0), (3, 0, 0)], tasks)
+        costs = { cost["index"]: cost["cost"] for cost in plan["costs"] }
+        loads = [ sum(costs[task["index"]] / max(task["shards"], 1) for task in job) for job in plan["jobs"] ]
+        self.assertLess(max(loads), 1.5 * sum(costs.values()) / 4)
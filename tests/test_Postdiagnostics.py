@@ -1,6 +1,8 @@
 # Standard imports
+import json
 from pathlib import Path
 from shutil import copyfile
+import tempfile
 import unittest
 
 # Third-party imports
@@ -99,4 +101,58 @@ class test_Postdiagnostics(unittest.TestCase):
         
         # Clean up
         sos.close()
-        self.PD_SOS.unlink()
\ No newline at end of file
+        self.PD_SOS.unlink()
+        
+    def test_get_module_data_missing_algos(self):
+        """Test flags are aligned by algorithm name when algorithms are missing."""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            pd_dir = Path(tmp)
+            (pd_dir / "basin").mkdir()
+            (pd_dir / "reach").mkdir()
+            for rid, algos, flags in ((77449100071, ["sad", "hivdi"], [1, 0]), \
+                (77449100081, ["metroman"], [1])):
+                for level, suffix in (("basin", "moi_diag"), ("reach", "flpe_diag")):
+                    ds = Dataset(pd_dir / level / f"{rid}_{suffix}.nc", 'w')
+                    ds.createDimension("num_algos", len(algos))
+                    names = ds.createVariable("algo_names", str, ("num_algos",))
+                    names[:] = np.array(algos, dtype=object)
+                    for flag in Postdiagnostics.BASIN_FLAGS:
+                        var = ds.createVariable(flag, "i4", ("num_algos",), fill_value=-999)
+                        var[:] = flags
+                    ds.close()
+            
+            rids = np.array([77449100061, 77449100071, 77449100081])
+            pd = Postdiagnostics([7], pd_dir, None, None, rids, None, None)
+            pd_dict = pd.get_module_data()
+        
+        self.assertEqual(["hivdi", "metroman", "sad"], pd_dict["basin_algo_names"])
+        assert_array_equal([[-127, -127, -127], [0, -127, 1], [-127, 1, -127]], \
+            pd_dict["basin"]["prepost_flags"])
+        assert_array_equal([[-127, -127, -127], [0, -127, 1], [-127, 1, -127]], \
+            pd_dict["reach"]["realism_flags"])
+        self.assertEqual(np.int8, pd_dict["reach"]["realism_flags"].dtype)
+        
+    def test_append_module_data_attrs(self):
+        """Test flag metadata is typed as int8 when flag variables are created."""
+        
+        with open(Path(__file__).parent.parent / "metadata" / "metadata.json") as jf:
+            metadata_json = json.load(jf)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            sos_file = Path(tmp) / "sos.nc"
+            with Dataset(sos_file, 'w') as ds:
+                ds.createDimension("num_reaches", 3)
+            pd = Postdiagnostics([7], Path(tmp), sos_file, None, np.array([1, 2, 3]), None, None)
+            pd.append_module_data(pd.get_module_data(), metadata_json)
+            
+            with Dataset(sos_file, 'r') as ds:
+                for level, flags in (("basin", Postdiagnostics.BASIN_FLAGS), ("reach", Postdiagnostics.REACH_FLAGS)):
+                    for flag in flags:
+                        var = ds["postdiagnostics"][level][flag]
+                        self.assertEqual(metadata_json["postdiagnostics"][level][flag]["flag_meanings"], var.flag_meanings)
+                        self.assertEqual(np.int8, var.flag_values.dtype)
+                        assert_array_equal([0, 1], var.flag_values)
+                        self.assertEqual(np.int8, var.valid_min.dtype)
+                        self.assertEqual(np.int8, var.valid_max.dtype)
+                self.assertEqual("number_of_basin_algorithms", ds["postdiagnostics"]["basin"]["basin_num_algos"].long_name)
@@ -1,4 +1,5 @@
 # Standard imports
+import logging
 from pathlib import Path
 from shutil import copyfile
 import unittest
@@ -9,6 +10,7 @@ import numpy as np
 from numpy.testing import assert_array_equal
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.Prediagnostics import Prediagnostics
 
 class test_Prediagnostics(unittest.TestCase):
@@ -22,6 +24,7 @@ class test_Prediagnostics(unittest.TestCase):
         "i4": -999,
         "S1": "x"
     }
+    FILL_I1 = -127
     
     def get_sos_data(self):
         """Retrieve and return dictionary of SoS data."""
@@ -195,4 +198,91 @@ class test_Prediagnostics(unittest.TestCase):
         
         # Clean up
         sos.close()
-        self.PREDIAGS_SOS.unlink()
\ No newline at end of file
+        self.PREDIAGS_SOS.unlink()
+        
+    def test_insert_nx(self):
+        """Test _insert_nx method scatters node columns to SoS node rows."""
+        
+        # In-memory prediagnostics file with 3 time steps and 2 nodes
+        pre_ds = Dataset("prediags.nc", 'w', diskless=True)
+        pre_ds.createDimension("time_steps", 3)
+        pre_ds.createDimension("num_nodes", 2)
+        node_grp = pre_ds.createGroup("node")
+        flag = node_grp.createVariable("dark_frac", "i4", ("time_steps", "num_nodes"), fill_value=self.FILL["i4"])
+        flag[:] = np.ma.masked_array([[0, 1], [1, 1], [0, 0]], mask=[[0, 0], [1, 0], [0, 0]])
+        
+        pre = Prediagnostics([7,8,9], self.PREDIAGS_DIR, None, None, None, None, None, \
+            None, None, np.zeros(4))
+        pre_dict = { "node": { "dark_frac": np.empty(4, dtype=object) } }
+        pre_dict["node"]["dark_frac"].fill(np.array([self.FILL["i4"]]))
+        pre._insert_nx(pre_dict, pre_ds, (np.array([1, 3]),))
+        pre_ds.close()
+        
+        assert_array_equal([0, self.FILL["i4"], 0], pre_dict["node"]["dark_frac"][1])
+        assert_array_equal([1, 1, 0], pre_dict["node"]["dark_frac"][3])
+        assert_array_equal([self.FILL["i4"]], pre_dict["node"]["dark_frac"][0])
+
+    def test_write_packed(self):
+        """Test _write_packed method packs 0/1 flags from metadata and stores others as int8."""
+        
+        sos_ds = Dataset("sos.nc", 'w', diskless=True)
+        sos_ds.createDimension("num_reaches", 2)
+        grp = sos_ds.createGroup("reach")
+        data_dict = { "attrs": { "dark_frac": {}, "ice_clim_f": {}, "reach_q": {}, "node_q": {} } }
+        for name, rows in (("dark_frac", [[0, 1, -999], [1]]), ("ice_clim_f", [[1, 1, 0], [-999]]), \
+            ("reach_q", [[0, 2, 3], [-999]]), ("node_q", [[0, 300, -999], [2]])):
+            data_dict[name] = np.empty(2, dtype=object)
+            data_dict[name][:] = [ np.array(row, dtype=np.int32) for row in rows ]
+        metadata = { name: { "flag_values": "0 1" } for name in ("dark_frac", "ice_clim_f", "reach_q", "obs_frac_n") }
+        metadata["node_q"] = { "flag_values": "0 1 2 3" }
+        metadata["flags"] = { "long_name": "packed prediagnostic flags" }
+        
+        pre = Prediagnostics([7,8,9], self.PREDIAGS_DIR, None, logging.getLogger(), None, None, None, \
+            None, None, None)
+        with self.assertLogs(level="WARNING") as logs:
+            pre._write_packed(sos_ds, grp, "num_reaches", data_dict, metadata)
+        self.assertEqual(2, len(logs.output))
+        
+        # Flags absent from the data and values other than 0 and 1 are missing
+        flags = grp["flags"]
+        self.assertEqual("dark_frac ice_clim_f reach_q obs_frac_n dark_frac_missing ice_clim_f_missing "
+                         "reach_q_missing obs_frac_n_missing", flags.flag_meanings)
+        assert_array_equal(1 << np.arange(8), flags.flag_masks)
+        assert_array_equal([130, 195, 208], flags[0])
+        assert_array_equal([225], flags[1])
+        self.assertNotIn("reach_q", grp.variables)
+        assert_array_equal([0, self.FILL_I1, self.FILL_I1], grp["node_q"][0])
+        assert_array_equal([2], grp["node_q"][1])
+        sos_ds.close()
+
+    def test_create_data_dict_plan(self):
+        """Test only variables in the metadata plan are held for reading."""
+        
+        pre_ds = Dataset("prediags.nc", 'w', diskless=True)
+        for level in ("reach", "node"):
+            grp = pre_ds.createGroup(level)
+            for name in ("dark_frac", "ice_clim_f", "not_written"):
+                grp.createVariable(name, "i4")
+        plan = MetadataPlan({ "prediagnostics": { "reach": { "dark_frac": {}, "ice_clim_f": {} },
+                                                  "node": { "dark_frac": {}, "ice_clim_f": {} } } })
+        
+        pre = Prediagnostics([7,8,9], self.PREDIAGS_DIR, None, None, None, None, None, \
+            np.zeros(2), None, np.zeros(3))
+        self.assertEqual(["dark_frac", "ice_clim_f", "not_written", "attrs"],
+                         sorted(pre.create_data_dict(pre_ds)["reach"], key=lambda name: name == "attrs"))
+        pre.metadata = plan.select(["prediagnostics/reach/dark_frac", "prediagnostics/node"])
+        pre_dict = pre.create_data_dict(pre_ds)
+        pre_ds.close()
+        
+        self.assertEqual(["attrs", "dark_frac"], sorted(pre_dict["reach"]))
+        self.assertEqual(["attrs", "dark_frac", "ice_clim_f"], sorted(pre_dict["node"]))
+        
+    def test_append_module_stream(self):
+        """Test streaming is rejected as Prediagnostics has no stream hook."""
+        
+        pre = Prediagnostics([7], self.PREDIAGS_DIR, self.PREDIAGS_SOS, None, None, None, None, \
+            np.array([1]), np.array([1]), np.array([1]))
+        pre.options = { "streamblock": 10 }
+        self.assertFalse(pre.streams)
+        with self.assertRaises(ValueError):
+            pre.append_module({})
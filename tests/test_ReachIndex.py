@@ -0,0 +1,58 @@
+# Standard imports
+from pathlib import Path
+import tempfile
+import unittest
+
+# Third-party imports
+import numpy as np
+from numpy.testing import assert_array_equal
+
+# Local imports
+from output.ReachIndex import ReachIndex
+
+class test_ReachIndex(unittest.TestCase):
+    """Test ReachIndex class methods."""
+
+    RIDS = np.array([74269800011, 74269800001, 74269800021, 74269800031])
+    NRIDS = np.array([74269800001, 74269800011, 74269800001, 74269800021,
+                      74269800011, 74269800001])
+    NIDS = np.array([742698000010011, 742698000110011, 742698000010021,
+                     742698000210011, 742698000110021, 742698000010031])
+
+    def test_reach_rows(self):
+        """Test reach_rows method."""
+
+        index = ReachIndex(self.RIDS, self.NRIDS, self.NIDS)
+        rows = index.reach_rows([74269800021, 74269800011, 74269800041])
+        assert_array_equal([2, 0, -1], rows)
+
+    def test_node_rows(self):
+        """Test node_rows method."""
+
+        index = ReachIndex(self.RIDS, self.NRIDS, self.NIDS)
+        rows = index.node_rows([742698000110021, 1])
+        assert_array_equal([4, -1], rows)
+
+    def test_reach_node_rows(self):
+        """Test reach_node_rows method against np.where."""
+
+        index = ReachIndex(self.RIDS, self.NRIDS, self.NIDS)
+        for rid in self.RIDS:
+            assert_array_equal(np.where(self.NRIDS == rid)[0],
+                               index.reach_node_rows(rid))
+        self.assertEqual(0, index.reach_node_rows(1).shape[0])
+
+    def test_save_load(self):
+        """Test save and load methods."""
+
+        index = ReachIndex(self.RIDS, self.NRIDS, self.NIDS)
+        with tempfile.TemporaryDirectory() as tmp:
+            sidecar = Path(tmp) / "priors.nc.index.npz"
+            index.save(sidecar, (1, 2))
+
+            loaded = ReachIndex.load(sidecar, (1, 2), self.RIDS, self.NRIDS, self.NIDS)
+            for name in ReachIndex.INDEXES:
+                assert_array_equal(getattr(index, name), getattr(loaded, name))
+
+            # Stale key
+            self.assertIsNone(ReachIndex.load(sidecar, (1, 3), self.RIDS, self.NRIDS, self.NIDS))
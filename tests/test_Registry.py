@@ -0,0 +1,44 @@
+# Standard imports
+from pathlib import Path
+import subprocess
+import sys
+from types import SimpleNamespace
+import unittest
+
+# Local imports
+from output.modules.AbstractModule import AbstractModule
+from output.Registry import create_module, get_module_class, MODULES, UnknownModuleError
+
+class test_Registry(unittest.TestCase):
+    """Test Registry functions."""
+
+    ROOT = Path(__file__).parent.parent
+
+    def test_get_module_class(self):
+        """Test get_module_class function."""
+
+        for name, (module_path, class_name, dir_key) in MODULES.items():
+            module_class, module_dir_key = get_module_class(name)
+            self.assertEqual(class_name, module_class.__name__)
+            self.assertEqual(dir_key, module_dir_key)
+            self.assertTrue(issubclass(module_class, AbstractModule))
+            self.assertTrue(callable(module_class.from_context))
+
+        with self.assertRaises(UnknownModuleError):
+            get_module_class("not_a_module")
+
+    def test_create_module(self):
+        """Test a missing input directory is not reported as an unknown module."""
+
+        with self.assertRaises(KeyError) as error:
+            create_module("sad", SimpleNamespace(dirs={}))
+        self.assertNotIsInstance(error.exception, UnknownModuleError)
+
+    def test_lazy_import(self):
+        """Test that importing Append does not import module classes."""
+
+        code = "import sys; import output.Append; " \
+            + "print(any(m.startswith('output.modules.') for m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], cwd=self.ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual("False", result.stdout.strip())
@@ -0,0 +1,42 @@
+# Standard imports
+import unittest
+
+# Third-party imports
+import numpy as np
+from numpy.testing import assert_array_equal
+
+# Local imports
+from output.modules.SparseRows import SparseRows
+
+class test_SparseRows(unittest.TestCase):
+    """Test SparseRows class methods."""
+
+    FILL = np.array([-999999999999.0])
+
+    def test_set_get(self):
+        """Test setting and getting single rows and arrays of rows."""
+
+        sparse = SparseRows(5, self.FILL)
+        sparse[3] = np.array([1.0, 2.0])
+        sparse[np.array([0, 1])] = [np.array([3.0]), np.array([4.0, 5.0, 6.0])]
+
+        assert_array_equal([3, 0, 1], sparse.rows)
+        assert_array_equal([1.0, 2.0], sparse[3])
+        assert_array_equal([4.0, 5.0, 6.0], sparse[-4])
+        self.assertIs(self.FILL, sparse[2])
+        assert_array_equal([1.0, 2.0], sparse[np.where(np.arange(5) == 3)][0])
+        with self.assertRaises(IndexError):
+            sparse[5]
+
+    def test_to_array(self):
+        """Test to_array method."""
+
+        sparse = SparseRows(3, self.FILL)
+        sparse[1] = np.array([1.0, 2.0])
+        dense = sparse.to_array()
+
+        self.assertEqual((3,), dense.shape)
+        self.assertEqual(object, dense.dtype)
+        assert_array_equal(self.FILL, dense[0])
+        assert_array_equal([1.0, 2.0], dense[1])
+        assert_array_equal(self.FILL, dense[2])
@@ -1,14 +1,17 @@
 # Standard imports
+import json
 from pathlib import Path
 from shutil import copyfile
+import tempfile
 import unittest
 
 # Third-party imports
 from netCDF4 import Dataset
 import numpy as np
-from numpy.testing import assert_array_almost_equal
+from numpy.testing import assert_array_almost_equal, assert_array_equal
 
 # Local imports
+from output.MetadataPlan import MetadataPlan
 from output.modules.Swot import Swot
 
 class test_Swot(unittest.TestCase):
@@ -91,4 +94,112 @@ class test_Swot(unittest.TestCase):
         
         # Clean up
         sos.close()
-        self.SW_SOS.unlink()
\ No newline at end of file
+        self.SW_SOS.unlink()
+        
+    def test_update_time_range(self):
+        """Test _update_time_range method."""
+        
+        sw = Swot([7,8,9], self.SW_DIR, self.SW_SOS, None, None, None, None, \
+            None, None, None)
+        sw._update_time_range(np.array([self.FILL["f8"]]))
+        self.assertIsNone(sw.time_min)
+        
+        sw._update_time_range(np.array([-9999.0, 335212829.5, np.nan, 336205120.0]))
+        sw._update_time_range(np.array([337015526.0, self.FILL["f8"]]))
+        self.assertEqual(335212829.5, sw.time_min)
+        self.assertEqual(337015526.0, sw.time_max)
+        
+    def write_swot_files(self, tmp, rids, nrids):
+        """Write SWOT files of the first and last reach and an empty SoS.
+        
+        Returns path to the SoS and its variable length float type.
+        """
+        
+        (Path(tmp) / "swot").mkdir()
+        for rid in (rids[0], rids[-1]):
+            nx = np.count_nonzero(nrids == rid)
+            with Dataset(Path(tmp) / "swot" / f"{rid}_SWOT.nc", 'w') as ds:
+                ds.createDimension("nt", 2)
+                ds.createDimension("nx", nx)
+                ds.createDimension("nchar", 3)
+                ds.createVariable("observations", "S1", ("nt", "nchar"))[:] = np.array([b"101", b"102"]).view("S1").reshape(2, 3)
+                ds.createGroup("reach").createVariable("time", "f8", ("nt",))[:] = [335212829.0, 336205120.0]
+                ds.createGroup("node").createVariable("time", "f8", ("nx", "nt"))[:] = np.tile([335212829.0, 336205120.0], (nx, 1))
+        sw_sos = Path(tmp) / "sos.nc"
+        with Dataset(sw_sos, 'w') as ds:
+            ds.createDimension("num_reaches", rids.shape[0])
+            ds.createDimension("num_nodes", nrids.shape[0])
+            vlen_f = ds.createVLType(np.float64, "vlen_float")
+            ds.createGroup("reaches")
+            ds.createGroup("nodes")
+        return sw_sos, vlen_f
+        
+    def test_get_module_data_index(self):
+        """Test node observations are stored as rows of the reach observations."""
+        
+        # Reach without a SWOT file between two observed reaches
+        rids = np.array([74269800011, 74269800021, 74269800031], dtype=np.int64)
+        nrids = np.repeat(rids, [3, 2, 2])
+        nids = np.arange(nrids.shape[0], dtype=np.int64)
+        with tempfile.TemporaryDirectory() as tmp:
+            sw_sos, vlen_f = self.write_swot_files(tmp, rids, nrids)
+            sw = Swot([7], Path(tmp), sw_sos, None, vlen_f, None, None, \
+                rids, nrids, nids)
+            sw.options = { "nodeobs": "index" }
+            sw_dict = sw.get_module_data()
+            
+            self.assertNotIn("observations", sw_dict["node"])
+            assert_array_equal([0, 0, 0, -999, -999, 2, 2], sw_dict["node"]["observations_index"])
+            
+            with open(Path(__file__).parent.parent / "metadata" / "metadata.json") as jf:
+                sw.append_module_data(sw_dict, MetadataPlan(json.load(jf)))
+            with Dataset(sw_sos, 'r') as ds:
+                self.assertNotIn("observations", ds["nodes"].variables)
+                self.assertIn("observations", ds["reaches"].variables)
+                observations_index = ds["nodes"]["observations_index"]
+                self.assertEqual(self.FILL["i4"], observations_index._FillValue)
+                assert_array_equal([False, False, False, True, True, False, False], np.ma.getmaskarray(observations_index[:]))
+                assert_array_equal([0, 0, 0], observations_index[:3])
+                self.assertEqual("101,102", ds["reaches"]["observations"][observations_index[5]])
+        
+    def test_stream_module_data(self):
+        """Test streaming in blocks writes the same SoS as in memory."""
+        
+        with open(Path(__file__).parent.parent / "metadata" / "metadata.json") as jf:
+            metadata_json = json.load(jf)
+        
+        # Nodes of a reach out of order and a node of a reach not in the SoS
+        rids = np.array([74269800011, 74269800021, 74269800031], dtype=np.int64)
+        nrids = np.array([74269800011, 74269800031, 74269800011, 74269800021, 74269800041, 
+                          74269800021, 74269800031, 74269800011], dtype=np.int64)
+        nids = np.arange(nrids.shape[0], dtype=np.int64)
+        for node_obs in ("string", "index"):
+            with tempfile.TemporaryDirectory() as tmp:
+                sw_sos, vlen_f = self.write_swot_files(tmp, rids, nrids)
+                results = []
+                for block in (0, 2, 1):
+                    with Dataset(sw_sos, 'w') as ds:
+                        ds.createDimension("num_reaches", rids.shape[0])
+                        ds.createDimension("num_nodes", nrids.shape[0])
+                        vlen_f = ds.createVLType(np.float64, "vlen_float")
+                        ds.createGroup("reaches")
+                        ds.createGroup("nodes")
+                    sw = Swot([7], Path(tmp), sw_sos, None, vlen_f, None, None, \
+                        rids, nrids, nids)
+                    sw.options = { "nodeobs": node_obs, "streamblock": block }
+                    sw.append_module(metadata_json)
+                    self.assertEqual((335212829.0, 336205120.0), (sw.time_min, sw.time_max))
+                    with Dataset(sw_sos, 'r') as ds:
+                        results.append({ f"{level}/{name}": (np.ma.filled(ds[level][name][:], self.FILL["i4"]), ds[level][name].__dict__) \
+                            for level in ("reaches", "nodes") for name in ds[level].variables })
+            
+            if node_obs == "index":
+                assert_array_equal([0, 2, 0, -999, -999, -999, 2, 0], results[0]["nodes/observations_index"][0])
+            else:
+                self.assertEqual("xxxxxxxxxx", results[0]["nodes/observations"][0][4])
+            for result in results[1:]:
+                self.assertEqual(results[0].keys(), result.keys())
+                for name, (data, attrs) in results[0].items():
+                    self.assertEqual(attrs, result[name][1])
+                    for row, stream_row in zip(data, result[name][0]):
+                        assert_array_equal(row, stream_row)
@@ -1,6 +1,9 @@
 # Standard imports
+import json
+import logging
 from pathlib import Path
 from shutil import copyfile
+import tempfile
 import unittest
 
 # Third-party imports
@@ -9,7 +12,7 @@ import numpy as np
 from numpy.testing import assert_array_almost_equal, assert_array_equal
 
 # Local imports
-from output.modules.Validation import Validation
+from output.modules.Validation import STATS, Validation
 
 class test_Validation(unittest.TestCase):
     """Test Validation class methods."""
@@ -17,6 +20,7 @@ class test_Validation(unittest.TestCase):
     SOS_NEW = Path(__file__).parent / "sos_new" / "na_apriori_rivers_v07_SOS_results.nc"
     V_DIR = Path(__file__).parent / "validation"
     V_SOS = Path(__file__).parent / "validation" / "na_apriori_rivers_v07_SOS_results.nc"
+    METADATA = Path(__file__).parent.parent / "metadata" / "metadata.json"
     
     def get_sos_data(self):
         """Retrieve and return dictionary of SoS data."""
@@ -90,4 +94,197 @@ class test_Validation(unittest.TestCase):
         
         # Clean up
         sos.close()
-        self.V_SOS.unlink()
\ No newline at end of file
+        self.V_SOS.unlink()
+        
+    def write_validation(self, sos_file, options, gageids=None, num_reaches=3):
+        """Write Validation data to a new SoS file and return module."""
+        
+        sos = Dataset(sos_file, 'w')
+        sos.createDimension("num_reaches", num_reaches)
+        sos.close()
+        
+        val = Validation([7,8,9], self.V_DIR, sos_file, None, np.arange(1, num_reaches + 1), \
+            None, None)
+        val.options = options
+        with open(self.METADATA) as jf:
+            metadata_json = json.load(jf)
+        data_dict = val.create_data_dict()
+        for index, gageid in (gageids or {}).items():
+            table = data_dict["flpe"]["gageid_table"]
+            data_dict["flpe"]["gageid"][index] = table.setdefault(gageid, len(table))
+        val.append_module_data(data_dict, metadata_json)
+        return val
+    
+    def test_append_algo_names(self):
+        """Test algo_names is written once per group and in legacy layout."""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            sos_file = Path(tmp) / "sos.nc"
+            self.write_validation(sos_file, {})
+            sos = Dataset(sos_file, 'r')
+            algo_names = sos["validation"]["moi"]["algo_names"]
+            self.assertEqual(("num_algos",), algo_names.dimensions)
+            self.assertEqual("consensus", algo_names[6])
+            self.assertEqual("dschg_c", sos["validation"]["offline"]["algo_names"][13])
+            sos.close()
+            
+            # More reaches than algorithms
+            self.write_validation(sos_file, { "validationlegacy": True }, num_reaches=20)
+            sos = Dataset(sos_file, 'r')
+            algo_names = sos["validation"]["moi"]["algo_names"]
+            self.assertEqual(("num_reaches", "num_algos", "nchar"), algo_names.dimensions)
+            for reach in range(20):
+                self.assertEqual("consensus", chartostring(algo_names[reach])[6])
+            sos.close()
+
+    def test_append_gageid(self):
+        """Test gageid is written from codes and in legacy layout."""
+        
+        gageids = { 0: "USGS-0001", 2: "USGS-0001" }
+        with tempfile.TemporaryDirectory() as tmp:
+            sos_file = Path(tmp) / "sos.nc"
+            self.write_validation(sos_file, {}, gageids)
+            sos = Dataset(sos_file, 'r')
+            gageid = sos["validation"]["flpe"]["gageid"]
+            self.assertEqual(("num_reaches",), gageid.dimensions)
+            assert_array_equal(["USGS-0001", "", "USGS-0001"], gageid[:])
+            sos.close()
+            
+            self.write_validation(sos_file, { "validationlegacy": True }, gageids)
+            sos = Dataset(sos_file, 'r')
+            gageid = sos["validation"]["flpe"]["gageid"]
+            self.assertEqual(("num_reaches", "nchar"), gageid.dimensions)
+            assert_array_equal(["USGS-0001", "", "USGS-0001"], chartostring(gageid[:].filled(b'')))
+            sos.close()
+
+    def test_get_module_data_stats(self):
+        """Test statistics are read in blocks with fill values as NaN."""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            val_ds = Dataset(Path(tmp) / "71234_validation.nc", 'w')
+            val_ds.createDimension("nchar", 16)
+            val_ds.createDimension("one", 1)
+            for suffix, num_algos in (("_flpe", 7), ("_moi", 6), ("_o", 14)):
+                val_ds.createDimension(f"num_algos{suffix}", num_algos)
+                setattr(val_ds, f"has_validation{suffix}", 1)
+                var = val_ds.createVariable(f"gageID{suffix}", "S1", ("one", "nchar"))
+                var[0, :4] = np.array(list("1234"), dtype="S1")
+                for _, prefix in STATS:
+                    var = val_ds.createVariable(f"{prefix}{suffix}", "f8", (f"num_algos{suffix}",), fill_value=-9999.0)
+                    var[:] = np.ma.masked_array(np.arange(num_algos), mask=np.arange(num_algos) == 1)
+            val_ds.close()
+            
+            val = Validation([7], Path(tmp), None, logging.getLogger(), np.array([71230, 71234]), \
+                None, None)
+            val_dict = val.get_module_data()
+        
+        for group, num_algos in (("flpe", 7), ("moi", 6), ("offline", 14)):
+            expected = np.full(14, np.nan)
+            expected[:num_algos] = np.arange(num_algos)
+            expected[1] = np.nan
+            for name, _ in STATS:
+                assert_array_equal(np.full(14, np.nan), val_dict[group][name][0])
+                assert_array_equal(expected, val_dict[group][name][1])
+            assert_array_equal([np.nan, 1], val_dict[group]["has_validation"])
+            assert_array_equal([-1, 0], val_dict[group]["gageid"])
+            self.assertEqual({ "1234": 0 }, val_dict[group]["gageid_table"])
+
+    def test_get_module_data_stats_lengths(self):
+        """Test statistics shorter than the others do not keep values of a previous read."""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            for rid, value in ((71231, 100.0), (71234, 0.0)):
+                val_ds = Dataset(Path(tmp) / f"{rid}_validation.nc", 'w')
+                val_ds.createDimension("nchar", 16)
+                val_ds.createDimension("one", 1)
+                for suffix in ("_flpe", "_moi", "_o"):
+                    setattr(val_ds, f"has_validation{suffix}", 1)
+                    val_ds.createVariable(f"gageID{suffix}", "S1", ("one", "nchar"))
+                    for i, (_, prefix) in enumerate(STATS):
+                        # First statistic has 6 algorithms, the others 3 (all 7 in the first file)
+                        num_algos = 7 if value else (6 if i == 0 else 3)
+                        val_ds.createDimension(f"num_algos_{prefix}{suffix}", num_algos)
+                        var = val_ds.createVariable(f"{prefix}{suffix}", "f8", (f"num_algos_{prefix}{suffix}",))
+                        var[:] = value + np.arange(num_algos)
+                val_ds.close()
+            
+            val = Validation([7], Path(tmp), None, logging.getLogger(), np.array([71231, 71234]), \
+                None, None)
+            val_dict = val.get_module_data()
+        
+        for group in ("flpe", "moi", "offline"):
+            assert_array_equal(np.concatenate((100.0 + np.arange(7), np.full(7, np.nan))), val_dict[group]["nse"][0])
+            assert_array_equal(np.concatenate((np.arange(6), np.full(8, np.nan))), val_dict[group]["nse"][1])
+            for name, _ in STATS[1:]:
+                assert_array_equal(np.concatenate((np.arange(3), np.full(11, np.nan))), val_dict[group][name][1])
+
+    def test_append_empty(self):
+        """Test a run without validation files writes statistics as fill."""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            sos_file = Path(tmp) / "sos.nc"
+            sos = Dataset(sos_file, 'w')
+            sos.createDimension("num_reaches", 3)
+            sos.close()
+            
+            val = Validation([7], Path(tmp), sos_file, logging.getLogger(), np.array([1, 2, 3]), \
+                None, None)
+            val_dict = val.get_module_data()
+            self.assertFalse(val_dict["moi"]["nse"].flags.writeable)
+            with open(self.METADATA) as jf:
+                val.append_module_data(val_dict, json.load(jf))
+            
+            sos = Dataset(sos_file, 'r')
+            nse = sos["validation"]["moi"]["nse"]
+            self.assertEqual((3, 14), nse.shape)
+            self.assertTrue(nse[:].mask.all())
+            assert_array_equal(np.full((3, 14), -999999999999.0), nse[:].data)
+            self.assertTrue(sos["validation"]["moi"]["has_validation"][:].mask.all())
+            sos.close()
+            
+    def test_stream_module_data(self):
+        """Test streaming in blocks writes the same SoS as in memory."""
+        
+        with open(self.METADATA) as jf:
+            metadata_json = json.load(jf)
+        
+        rids = np.array([71231, 71232, 71233, 71234, 71235])
+        with tempfile.TemporaryDirectory() as tmp:
+            for rid, gageid in ((71231, "USGS-0001"), (71233, "USGS-0002"), (71234, "USGS-0001")):
+                val_ds = Dataset(Path(tmp) / f"{rid}_validation.nc", 'w')
+                val_ds.createDimension("nchar", 16)
+                val_ds.createDimension("one", 1)
+                val_ds.createDimension("num_algos", 7)
+                for suffix in ("_flpe", "_moi", "_o"):
+                    setattr(val_ds, f"has_validation{suffix}", 1)
+                    var = val_ds.createVariable(f"gageID{suffix}", "S1", ("one", "nchar"))
+                    var[0, :len(gageid)] = np.array(list(gageid), dtype="S1")
+                    for _, prefix in STATS:
+                        val_ds.createVariable(f"{prefix}{suffix}", "f8", ("num_algos",))[:] = rid + np.arange(7)
+                val_ds.close()
+            
+            for options in ({}, { "validationlegacy": True }):
+                results = []
+                for block in (0, 2):
+                    sos_file = Path(tmp) / "sos.nc"
+                    sos = Dataset(sos_file, 'w')
+                    sos.createDimension("num_reaches", rids.shape[0])
+                    sos.close()
+                    val = Validation([7], Path(tmp), sos_file, logging.getLogger(), rids, None, None)
+                    val.options = { **options, "streamblock": block }
+                    val.append_module(metadata_json)
+                    
+                    sos = Dataset(sos_file, 'r')
+                    results.append({ f"{group}/{name}": (sos["validation"][group][name][:], sos["validation"][group][name].__dict__) \
+                        for group in val.out_groups for name in sos["validation"][group].variables })
+                    sos.close()
+                    sos_file.unlink()
+                
+                self.assertEqual(results[0].keys(), results[1].keys())
+                for name, (data, attrs) in results[0].items():
+                    self.assertEqual(attrs, results[1][name][1])
+                    assert_array_equal(np.ma.getmaskarray(data), np.ma.getmaskarray(results[1][name][0]))
+                    assert_array_equal(np.ma.getdata(data), np.ma.getdata(results[1][name][0]))
+                gageid = results[0]["moi/gageid"][0]
+                if options: gageid = chartostring(gageid.filled(b""))
+                assert_array_equal(["USGS-0001", "", "USGS-0002", "USGS-0001", ""], gageid)